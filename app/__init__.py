@@ -1,82 +1,64 @@
 import os
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_bootstrap import Bootstrap
 from .extensions import bcrypt, db, login_manager
-from .admin import setup_admin
-from .commands import init_db
-from app.models import User
-from app.routes.authentication import auth_bp
-from app.routes.profile import profile_bp
-from app.routes.main import main_bp
-from app.routes.admin.company import admin_company_bp
-from app.routes.admin.user import admin_user_bp
-from app.routes.admin.farm import admin_farm_bp
-from app.routes.admin.field import admin_field_bp
-from app.routes.admin.harvest import admin_harvest_bp
-from app.routes.admin.harvest_per_field import admin_harvest_per_field_bp
-from app.routes.admin.truck import admin_truck_bp
-from app.routes.admin.truckload import admin_truckload_bp
-from app.routes.admin.harvest_rig import admin_harvest_rig_bp
-from app.routes.auth.user import auth_user_bp
-from app.routes.auth.farm import auth_farm_bp
-from app.routes.auth.field import auth_field_bp
-from app.routes.auth.harvest import auth_harvest_bp
-from app.routes.auth.harvest_per_field import auth_harvest_per_field_bp
-from app.routes.auth.truck import auth_truck_bp
-from app.routes.auth.truckload import auth_truckload_bp
-from app.routes.auth.harvest_rig import auth_harvest_rig_bp
-from app.routes.trucker.trucker import trucker_bp
-from app.routes.operator.rig import operator_rig_bp
-from app.routes.operator.truckload  import operator_truckload_bp
-from app.routes.office.truckloads import office_truckloads_bp
-from app.routes.trucker.truckload import trucker_truckloads_bp
-
-migrate = Migrate()
+from .commands import init_db, rebuild_yield_totals_command, rebuild_cycle_stats_command, import_scale_tickets_command, run_jobs_command, archive_harvests_command, build_assets_command
+from . import analytics, assets, compression, conditional, database, events, identity_cache, instrumentation, passwords, reference_cache
+from .lazy import LazyAdmin, LazySetup
 
-def create_app():
-    app = Flask(__name__, instance_relative_config=True)
-    app.config.from_pyfile('../config.py')
+# Extensions that hold per-process state and are shared with the admin app
+SHARED_EXTENSIONS = ('event_broker', 'identity_cache', 'reference_cache', 'request_profiler')
 
-    # Ensure the 'instance' directory exists
-    instance_path = app.instance_path
-    if not os.path.exists(instance_path):
-        os.makedirs(instance_path)
-
-    # Add debug statements
-    print(f"Base Directory: {os.path.abspath(os.path.dirname(__file__))}")
-    print(f"Instance Directory: {instance_path}")
-    db_path = os.path.join(instance_path, "yourdatabase.db")
-    print(f"Database Path: {db_path}")
-    print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
-
-    # Verify directory and file permissions
-    if not os.access(instance_path, os.W_OK):
-        raise PermissionError(f"Cannot write to directory: {instance_path}")
-
-    if not os.access(db_path, os.F_OK):
-        print("Database file does not exist yet.")
-    elif not os.access(db_path, os.W_OK):
-        raise PermissionError(f"Cannot write to database file: {db_path}")
-    
-    Bootstrap(app)
+
+def init_extensions(app):
     bcrypt.init_app(app)
+    database.configure_engine(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    database.init_app(app)
     login_manager.init_app(app)
-    
-    # Setup LoginManager
-    login_manager.login_view = 'authentication.login'
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
 
+def register_blueprints(app):
+    # Imported here so CLI commands that never serve a request skip them
+    from flask_bootstrap import Bootstrap
+    from app.routes.authentication import auth_bp
+    from app.routes.profile import profile_bp
+    from app.routes.main import main_bp
+    from app.routes.admin.company import admin_company_bp
+    from app.routes.admin.user import admin_user_bp
+    from app.routes.admin.farm import admin_farm_bp
+    from app.routes.admin.field import admin_field_bp
+    from app.routes.admin.harvest import admin_harvest_bp
+    from app.routes.admin.harvest_per_field import admin_harvest_per_field_bp
+    from app.routes.admin.truck import admin_truck_bp
+    from app.routes.admin.truckload import admin_truckload_bp
+    from app.routes.admin.harvest_rig import admin_harvest_rig_bp
+    from app.routes.admin.profiler import admin_profiler_bp
+    from app.routes.admin.analytics import admin_analytics_bp
+    from app.routes.admin.cycle_times import admin_cycle_times_bp
+    from app.routes.auth.user import auth_user_bp
+    from app.routes.auth.farm import auth_farm_bp
+    from app.routes.auth.field import auth_field_bp
+    from app.routes.auth.harvest import auth_harvest_bp
+    from app.routes.auth.harvest_per_field import auth_harvest_per_field_bp
+    from app.routes.auth.truck import auth_truck_bp
+    from app.routes.auth.truckload import auth_truckload_bp
+    from app.routes.auth.harvest_rig import auth_harvest_rig_bp
+    from app.routes.auth.analytics import auth_analytics_bp
+    from app.routes.auth.cycle_times import auth_cycle_times_bp
+    from app.routes.trucker.trucker import trucker_bp
+    from app.routes.operator.rig import operator_rig_bp
+    from app.routes.operator.truckload  import operator_truckload_bp
+    from app.routes.office.truckloads import office_truckloads_bp
+    from app.routes.trucker.truckload import trucker_truckloads_bp
+    from app.routes.sync import sync_bp
+    from app.routes.fleet import fleet_bp
+    from app.routes.jobs import jobs_bp
+
+    Bootstrap(app)
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(profile_bp)
-    
+
     app.register_blueprint(admin_company_bp)
     app.register_blueprint(admin_user_bp)
     app.register_blueprint(admin_farm_bp)
@@ -86,7 +68,10 @@ def create_app():
     app.register_blueprint(admin_truck_bp)
     app.register_blueprint(admin_harvest_rig_bp)
     app.register_blueprint(admin_truckload_bp)
-    
+    app.register_blueprint(admin_profiler_bp)
+    app.register_blueprint(admin_analytics_bp)
+    app.register_blueprint(admin_cycle_times_bp)
+
     app.register_blueprint(auth_user_bp)
     app.register_blueprint(auth_farm_bp)
     app.register_blueprint(auth_field_bp)
@@ -95,17 +80,79 @@ def create_app():
     app.register_blueprint(auth_truck_bp)
     app.register_blueprint(auth_harvest_rig_bp)
     app.register_blueprint(auth_truckload_bp)
-    
+    app.register_blueprint(auth_analytics_bp)
+    app.register_blueprint(auth_cycle_times_bp)
+
     app.register_blueprint(trucker_bp)
     app.register_blueprint(trucker_truckloads_bp)
     app.register_blueprint(operator_rig_bp)
     app.register_blueprint(operator_truckload_bp)
     app.register_blueprint(office_truckloads_bp)
-    
-    app.cli.add_command(init_db)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(fleet_bp)
+    app.register_blueprint(jobs_bp)
+
+
+def create_admin_app(parent):
+    # Flask-Admin's model views on an app of their own, built on the first
+    # /admin request; it reads the same session cookie and database
+    from .admin import setup_admin
+
+    app = Flask(__name__, instance_relative_config=True)
+    app.config.from_mapping(parent.config)
+    init_extensions(app)
+    instrumentation.init_app(app)
+    compression.init_app(app)
+    app.extensions.update({name: parent.extensions[name] for name in SHARED_EXTENSIONS if name in parent.extensions})
     setup_admin(app, db)
     return app
 
+
+def create_app():
+    app = Flask(__name__, instance_relative_config=True)
+    app.config.from_pyfile('../config.py')
+
+    # Ensure the 'instance' directory exists
+    os.makedirs(app.instance_path, exist_ok=True)
+    app.logger.debug(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+
+    init_extensions(app)
+    events.init_app(app)
+    identity_cache.init_app(app)
+    reference_cache.init_app(app)
+    analytics.init_app(app)
+    assets.init_app(app)
+    conditional.init_app(app)
+    passwords.init_app(app)
+    instrumentation.init_app(app)
+    compression.init_app(app)
+
+    # Setup LoginManager
+    login_manager.login_view = 'authentication.login'
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return identity_cache.load_user(int(user_id))
+
+    app.cli.add_command(init_db)
+    app.cli.add_command(rebuild_yield_totals_command)
+    app.cli.add_command(rebuild_cycle_stats_command)
+    app.cli.add_command(import_scale_tickets_command)
+    app.cli.add_command(run_jobs_command)
+    app.cli.add_command(archive_harvests_command)
+    app.cli.add_command(build_assets_command)
+
+    app.wsgi_app = LazyAdmin(app.wsgi_app, app, lambda: create_admin_app(app))
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        # Under the flask command only migrations are set up front; the web
+        # stack is built if a request ever arrives (flask run)
+        from flask_migrate import Migrate
+        Migrate(app, db)
+        app.wsgi_app = LazySetup(app.wsgi_app, lambda: register_blueprints(app))
+    else:
+        register_blueprints(app)
+    return app
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True)
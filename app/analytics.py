@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from datetime import MAXYEAR, datetime
+from flask import current_app
+from app.archive import truckloads_for
+from app.extensions import db
+from app.models import HarvestRig
+from app.reference_cache import company_reference_data
+from app.rollups import normalize_yield
+from app.versions import current_versions, reference_scope, yield_scope
+
+FACT_COLUMNS = ['day', 'harvest_id', 'field_id', 'harvest_rig_id', 'yield_type', 'yield_amount', 'load_count']
+
+
+def parse_season(args):
+    # ?season=<year>, or None for every season; years without a following
+    # one (the season runs up to the next New Year) are ignored
+    season = args.get('season', type=int)
+    return season if season is not None and 1 <= season < MAXYEAR else None
+
+
+def daily_facts(company_id, harvest_id=None, season=None):
+    # Loads with a yield, summed per day, harvest, field, rig and unit as
+    # entered. The database makes the one pass over the loads, so a season of
+    # them comes back as a few thousand rows. Archived seasons and harvests
+    # are read from the archive as well.
+    filters = {'harvest_id': harvest_id}
+    if season:
+        filters.update(date_from=datetime(season, 1, 1), date_to=datetime(season, 12, 31))
+    loads = truckloads_for(filters)
+    day = db.func.date(loads.load_date_time)
+    statement = db.select(
+        day, loads.harvest_id, loads.field_id, loads.harvest_rig_id, loads.yield_type,
+        db.func.sum(loads.yield_amount), db.func.count()
+    ).join(HarvestRig, loads.harvest_rig_id == HarvestRig.id).where(
+        HarvestRig.company_id == company_id,
+        loads.yield_amount.isnot(None)
+    )
+    if harvest_id:
+        statement = statement.where(loads.harvest_id == harvest_id)
+    if season:
+        statement = statement.where(
+            loads.load_date_time >= datetime(season, 1, 1),
+            loads.load_date_time < datetime(season + 1, 1, 1)
+        )
+    return statement.group_by(day, loads.harvest_id, loads.field_id, loads.harvest_rig_id, loads.yield_type)
+
+
+def _records(frame):
+    # Plain Python values, missing ones as None, for templates and JSON
+    frame = frame.round(2)
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def compute(rows, reference):
+    # Column operations only: units are converted, acreage parsed and every
+    # breakdown grouped over whole columns, never row by row in Python
+    import numpy as np
+    import pandas as pd
+
+    facts = pd.DataFrame(rows, columns=FACT_COLUMNS)
+
+    # Units and days repeat endlessly, so they are parsed once per distinct
+    # value and spread back over the column by code
+    codes, entered = pd.factorize(facts['yield_type'].fillna(''))
+    conversions = [normalize_yield(1.0, unit) for unit in entered]
+    unit_codes, units = pd.factorize(np.array([unit for unit, factor in conversions], dtype=object))
+    factors = np.array([factor for unit, factor in conversions], dtype=float)
+    facts['unit'] = pd.Categorical.from_codes(unit_codes[codes], units)
+    facts['yield_amount'] = facts['yield_amount'].astype(float) * factors[codes]
+    codes, days = pd.factorize(facts['day'])
+    facts['day'] = pd.to_datetime(days)[codes]
+    facts = facts[facts['unit'] != '']
+
+    # acreage is free text ('160', '160 ac'); unparseable or zero gives no per-acre figure
+    fields = pd.DataFrame(reference['fields'], columns=['id', 'name', 'farm_id', 'acreage']).set_index('id')
+    acres = pd.to_numeric(fields['acreage'].astype(str).str.extract(r'(\d+(?:\.\d+)?)')[0], errors='coerce')
+    acres = acres.where(acres > 0)
+    harvest_names = pd.Series({harvest['id']: harvest['name'] for harvest in reference['harvests']}, dtype=object)
+    rig_names = pd.Series({rig['id']: rig['name'] for rig in reference['harvest_rigs']}, dtype=object)
+    sums = ['yield_amount', 'load_count']
+
+    totals = facts.groupby('unit', as_index=False, observed=True)[sums].sum()
+    totals['fields'] = facts.groupby('unit', observed=True)['field_id'].nunique().reindex(totals['unit']).to_numpy()
+    harvested = facts[['unit', 'field_id']].drop_duplicates()
+    harvested['acres'] = harvested['field_id'].map(acres)
+    totals['acres'] = harvested.groupby('unit', observed=True)['acres'].sum(min_count=1).reindex(totals['unit']).to_numpy()
+    totals['per_acre'] = totals['yield_amount'] / totals['acres']
+
+    by_field = facts.groupby(['field_id', 'unit'], as_index=False, observed=True)[sums].sum()
+    by_field['field'] = by_field['field_id'].map(fields['name'])
+    by_field['acres'] = by_field['field_id'].map(acres)
+    by_field['per_acre'] = by_field['yield_amount'] / by_field['acres']
+
+    by_harvest = facts.groupby(['harvest_id', 'unit'], as_index=False, observed=True)[sums].sum()
+    harvested = facts[['harvest_id', 'unit', 'field_id']].drop_duplicates()
+    harvested['acres'] = harvested['field_id'].map(acres)
+    by_harvest = by_harvest.merge(
+        harvested.groupby(['harvest_id', 'unit'], as_index=False, observed=True)['acres'].sum(min_count=1), on=['harvest_id', 'unit']
+    )
+    by_harvest['harvest'] = by_harvest['harvest_id'].map(harvest_names)
+    by_harvest['per_acre'] = by_harvest['yield_amount'] / by_harvest['acres']
+
+    by_rig = facts.groupby(['harvest_rig_id', 'unit'], as_index=False, observed=True).agg(
+        yield_amount=('yield_amount', 'sum'), load_count=('load_count', 'sum'), days=('day', 'nunique')
+    )
+    by_rig['harvest_rig'] = by_rig['harvest_rig_id'].map(rig_names)
+    by_rig['per_day'] = by_rig['yield_amount'] / by_rig['days']
+    by_rig['per_load'] = by_rig['yield_amount'] / by_rig['load_count']
+
+    by_day = facts.groupby(['day', 'unit'], as_index=False, observed=True)[sums].sum()
+    by_day['day'] = by_day['day'].dt.strftime('%Y-%m-%d')
+
+    return {
+        'totals': _records(totals.sort_values('unit')),
+        'by_harvest': _records(by_harvest.sort_values(['harvest', 'unit'])),
+        'by_field': _records(by_field.sort_values(['field', 'unit'])),
+        'by_rig': _records(by_rig.sort_values(['harvest_rig', 'unit'])),
+        'by_day': _records(by_day.sort_values(['day', 'unit'])),
+    }
+
+
+class AnalyticsCache:
+    # Computed analytics per company and filter for this worker, tagged with
+    # the company's yield and reference versions: any new load, yield edit or
+    # acreage change is seen on the next request, otherwise nothing is re-read
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, company_id, harvest_id=None, season=None):
+        scopes = (yield_scope(company_id), reference_scope(company_id))
+        versions = current_versions(*scopes)
+        tag = tuple(versions[scope] for scope in scopes)
+        key = (company_id, harvest_id, season)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == tag:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        rows = db.session.execute(daily_facts(company_id, harvest_id, season)).all()
+        data = compute(rows, company_reference_data(company_id))
+        with self._lock:
+            self._entries[key] = (tag, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return data
+
+
+def init_app(app):
+    app.extensions['analytics_cache'] = AnalyticsCache(app.config['ANALYTICS_CACHE_SIZE'])
+
+
+def company_analytics(company_id, harvest_id=None, season=None):
+    return current_app.extensions['analytics_cache'].get(company_id, harvest_id, season)
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models import (
+    Farm, Harvest, HarvestPerField, HarvestPerFieldArchive, HarvestRig, HarvestYieldTotal, HarvestYieldTotalArchive,
+    Truckload, TruckloadArchive
+)
+from app.rollups import add_to_total
+from app.versions import bump, company_scopes, harvest_per_field_scope, truckload_scope, yield_scope
+
+# Hot table -> archive table whose rows move row for row, ids kept
+MOVED = ((Truckload, TruckloadArchive), (HarvestPerField, HarvestPerFieldArchive))
+
+
+def archive_cutoff(before=None):
+    return before or datetime.utcnow() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+
+
+def closed_harvests(before=None):
+    # Ids of harvests not yet archived that are done with: dated before the
+    # cutoff, with no live load from then on and none still open (awaiting
+    # unload, confirmation or a yield)
+    cutoff = archive_cutoff(before)
+    blocking = db.select(Truckload.id).where(
+        Truckload.harvest_id == Harvest.id,
+        Truckload.deleted_at.is_(None),
+        db.or_(
+            Truckload.load_date_time >= cutoff,
+            Truckload.unload_date_time.is_(None),
+            Truckload.trucker_confirmation == 0,
+            Truckload.yield_amount.is_(None),
+            Truckload.yield_type.is_(None)
+        )
+    )
+    return db.session.scalars(
+        db.select(Harvest.id).where(Harvest.archived_at.is_(None), Harvest.date < cutoff, ~blocking.exists())
+        .order_by(Harvest.date, Harvest.id).execution_options(include_deleted=True)
+    ).all()
+
+
+def _move(model, archive, harvest_id):
+    # INSERT ... SELECT then DELETE, deleted rows included
+    table = model.__table__
+    columns = [column.name for column in table.columns]
+    db.session.execute(archive.__table__.insert().from_select(
+        columns, db.select(*table.columns).where(table.c.harvest_id == harvest_id)
+    ))
+    return db.session.execute(table.delete().where(table.c.harvest_id == harvest_id)).rowcount
+
+
+def archive_harvest(harvest_id):
+    # Moves a harvest's loads, yield entries and totals in one transaction
+    # and marks it archived; returns {table: rows moved}
+    harvest = db.session.get(Harvest, harvest_id, execution_options={'include_deleted': True})
+    rig_ids = db.select(Truckload.harvest_rig_id).where(Truckload.harvest_id == harvest_id).distinct()
+    truckload_companies = db.session.scalars(
+        db.select(HarvestRig.company_id).where(HarvestRig.id.in_(rig_ids)).execution_options(include_deleted=True)
+    ).all()
+    farm_company = db.session.scalar(
+        db.select(Farm.company_id).where(Farm.id == harvest.farm_id).execution_options(include_deleted=True)
+    )
+
+    moved = {model.__tablename__: _move(model, archive, harvest_id) for model, archive in MOVED}
+
+    # Totals are added to, so loads that turn up after an earlier archival
+    # still count once
+    totals = HarvestYieldTotal.__table__
+    rows = db.session.execute(db.select(totals).where(totals.c.harvest_id == harvest_id)).all()
+    for row in rows:
+        add_to_total(
+            db.session, (row.harvest_id, row.field_id, row.yield_unit), row.yield_amount, row.load_count,
+            table=HarvestYieldTotalArchive.__table__
+        )
+    db.session.execute(totals.delete().where(totals.c.harvest_id == harvest_id))
+    moved[HarvestYieldTotal.__tablename__] = len(rows)
+
+    harvest.archived_at = datetime.utcnow()
+    bump(db.session, [
+        *company_scopes(truckload_scope, truckload_companies),
+        *company_scopes(yield_scope, truckload_companies),
+        *company_scopes(harvest_per_field_scope, [farm_company]),
+    ])
+    db.session.commit()
+    return moved
+
+
+def archive_harvests(before=None, dry_run=False):
+    # Archives every closed harvest, one transaction each so the hot tables
+    # are never locked for long; returns [(harvest_id, {table: rows moved})]
+    archived = []
+    for harvest_id in closed_harvests(before):
+        archived.append((harvest_id, None if dry_run else archive_harvest(harvest_id)))
+    return archived
+
+
+def _history(model, archive):
+    # model's rows and archive's, as one subquery with model's columns. The
+    # soft-delete filter does not reach into it, so deleted rows are left out
+    # here.
+    columns = [column.name for column in model.__table__.columns]
+    selects = [db.select(*(table.c[name] for name in columns)) for table in (model.__table__, archive.__table__)]
+    if 'deleted_at' in columns:
+        selects = [select.where(select.selected_columns.deleted_at.is_(None)) for select in selects]
+    return db.union_all(*selects).subquery(f'{model.__tablename__}_history')
+
+
+def is_archived(harvest_id):
+    return harvest_id is not None and db.session.scalar(
+        db.select(Harvest.archived_at).where(Harvest.id == harvest_id).execution_options(include_deleted=True)
+    ) is not None
+
+
+def reaches_archive(filters):
+    # Whether a report with these truckload filters (see parse_filters) needs
+    # archived rows: it names an archived harvest, or its date range overlaps
+    # the archived loads. Reports without either read current seasons only,
+    # the others pay one query (an index lookup per table) to find out.
+    harvest_id = filters.get('harvest_id')
+    if not harvest_id and 'date_from' not in filters and 'date_to' not in filters:
+        return False
+
+    archived_at = db.select(Harvest.archived_at).where(Harvest.id == harvest_id).scalar_subquery()
+    archived_at, oldest, newest = db.session.execute(db.select(
+        archived_at, db.func.min(TruckloadArchive.load_date_time), db.func.max(TruckloadArchive.load_date_time)
+    ).execution_options(include_deleted=True)).one()
+    if archived_at is not None:
+        return True
+    if oldest is None or ('date_from' not in filters and 'date_to' not in filters):
+        return False
+    return (
+        filters.get('date_from', oldest) <= newest
+        and filters.get('date_to', newest) + timedelta(days=1) > oldest
+    )
+
+
+def all_truckloads():
+    # Alias of Truckload over hot and archived loads; use its attributes
+    # throughout the query
+    return db.aliased(Truckload, _history(Truckload, TruckloadArchive))
+
+
+def truckloads_for(filters):
+    # Truckload, or all_truckloads() for filters that reach into the archive
+    return all_truckloads() if reaches_archive(filters) else Truckload
+
+
+def yield_totals_for(filters):
+    # HarvestYieldTotal, or when filters name an archived harvest an alias of
+    # it over hot and archived totals summed per key
+    if not is_archived(filters.get('harvest_id')):
+        return HarvestYieldTotal
+    totals = _history(HarvestYieldTotal, HarvestYieldTotalArchive)
+    summed = db.select(
+        totals.c.harvest_id, totals.c.field_id, totals.c.yield_unit,
+        db.func.sum(totals.c.yield_amount).label('yield_amount'), db.func.sum(totals.c.load_count).label('load_count')
+    ).group_by(totals.c.harvest_id, totals.c.field_id, totals.c.yield_unit).subquery('harvest_yield_total_summed')
+    return db.aliased(HarvestYieldTotal, summed, adapt_on_names=True)
@@ -0,0 +1,144 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import urlsplit
+from flask import abort, current_app, send_file, url_for
+from werkzeug.security import safe_join
+from app.compression import STATIC_LEVELS, SUFFIXES, compress, encodings, negotiate
+
+# Fingerprinted copies of app/static, with their .br and .gz variants, are
+# written here; it is skipped when app/static is read
+BUILD_DIR = 'dist'
+
+# Text assets get compressed variants; fonts and images are compact already
+PRECOMPRESSED = ('.css', '.js', '.svg', '.json', '.txt')
+
+# The name changes with the content, so browsers keep a copy for a year
+# without ever asking again
+MAX_AGE = 365 * 24 * 60 * 60
+
+CSS_URL = re.compile(r'''url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]*))\s*\)''')
+
+
+def _sources(static_folder):
+    # Paths under static_folder, '/'-separated, build output left out
+    paths = []
+    for directory, dirs, files in os.walk(static_folder):
+        if directory == static_folder:
+            dirs[:] = [name for name in dirs if name != BUILD_DIR]
+        for name in files:
+            paths.append(os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def _rewrite_css(path, data, manifest):
+    # Points url()s at the fingerprinted files, so fonts and images are
+    # cached as long as the stylesheet; upstream ?v= cache busters go
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        url = next(group for group in match.groups() if group is not None)
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc or url.startswith('/'):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(directory, parts.path))
+        if target not in manifest:
+            return match.group(0)
+        fragment = f'#{parts.fragment}' if parts.fragment else ''
+        return f'url("{posixpath.relpath(manifest[target], directory)}{fragment}")'
+
+    return CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+
+def _write(path, data):
+    # Into place in one step, so a worker never serves half a file
+    partial = f'{path}.{os.getpid()}.partial'
+    with open(partial, 'wb') as output:
+        output.write(data)
+    os.replace(partial, path)
+
+
+def build(static_folder):
+    # {path: fingerprinted path} for every file in static_folder. Copies and
+    # compressed variants are written once: a file already there under its
+    # fingerprinted name is up to date.
+    build_dir = os.path.join(static_folder, BUILD_DIR)
+    manifest = {}
+    # Stylesheets last, so what they point at has its name by then
+    for path in sorted(_sources(static_folder), key=lambda path: (path.endswith('.css'), path)):
+        with open(os.path.join(static_folder, path), 'rb') as source:
+            data = source.read()
+        if path.endswith('.css'):
+            data = _rewrite_css(path, data, manifest)
+        stem, extension = posixpath.splitext(path)
+        manifest[path] = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+
+        target = os.path.join(build_dir, *manifest[path].split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.exists(target):
+            _write(target, data)
+        if not path.endswith(PRECOMPRESSED):
+            continue
+        for encoding in encodings():
+            if not os.path.exists(target + SUFFIXES[encoding]):
+                _write(target + SUFFIXES[encoding], compress(data, encoding, STATIC_LEVELS))
+    return manifest
+
+
+def prune(static_folder, manifest):
+    # Removes build output the manifest no longer names; returns the count
+    build_dir = os.path.join(static_folder, BUILD_DIR)
+    current = {os.path.join(build_dir, *name.split('/')) for name in manifest.values()}
+    removed = 0
+    for directory, dirs, files in os.walk(build_dir):
+        for name in files:
+            path = os.path.join(directory, name)
+            original = path
+            for suffix in SUFFIXES.values():
+                if path.endswith(suffix):
+                    original = path[:-len(suffix)]
+            if original not in current:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def asset_url(path):
+    # URL of static/<path> under its fingerprinted name; the plain static
+    # URL for a file the build does not know
+    name = current_app.extensions['asset_manifest'].get(path)
+    if name is None:
+        return url_for('static', filename=path)
+    return url_for('assets', filename=name)
+
+
+def serve_asset(filename):
+    # Stored br or gzip variant when the browser takes it, never compressed
+    # on the fly
+    path = safe_join(os.path.join(current_app.static_folder, BUILD_DIR), filename)
+    if path is None or filename.endswith(tuple(SUFFIXES.values())) or not os.path.isfile(path):
+        abort(404)
+
+    encoding = negotiate([encoding for encoding, suffix in SUFFIXES.items() if os.path.isfile(path + suffix)])
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_file(path + SUFFIXES[encoding] if encoding else path, mimetype=mimetype, max_age=MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    # Pages link the bundled Bootstrap, icons and jQuery through asset_url()
+    try:
+        manifest = build(app.static_folder)
+    except OSError as error:
+        app.logger.warning(f'Static assets are served without fingerprints: {error}')
+        manifest = {}
+    app.extensions['asset_manifest'] = manifest
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.add_template_global(asset_url)
@@ -1,7 +1,15 @@
+import sys
 import click
+from flask import current_app
 from flask.cli import with_appcontext
 from app.extensions import db, bcrypt
 from app.models import User
+from app.importer import import_scale_tickets
+from app.rollups import rebuild_yield_totals
+from app.cycle_stats import rebuild_cycle_stats
+from app.jobs import JOB_TYPES, run_workers
+from app.archive import archive_harvests
+from app.assets import build, prune
 
 @click.command('init-db')
 @with_appcontext
@@ -28,3 +36,72 @@ def init_db():
             
     except Exception as e:
         print(f"An error occurred: {e}")
+
+
+@click.command('rebuild-yield-totals')
+@with_appcontext
+def rebuild_yield_totals_command():
+    print("Rebuilding harvest yield totals from truckloads...")
+    count = rebuild_yield_totals()
+    print(f"{count} harvest yield totals written.")
+
+
+@click.command('rebuild-cycle-stats')
+@with_appcontext
+def rebuild_cycle_stats_command():
+    print("Rebuilding rig and truck cycle statistics from truckloads...")
+    rigs, trucks = rebuild_cycle_stats()
+    print(f"{rigs} rig hours and {trucks} truck hours written.")
+
+
+@click.command('archive-harvests')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), help='Cutoff date instead of ARCHIVE_AFTER_DAYS ago, e.g. the first day of this season.')
+@click.option('--dry-run', is_flag=True, help='Only list the harvests that would be archived.')
+@with_appcontext
+def archive_harvests_command(before, dry_run):
+    print("Archiving closed harvests...")
+    archived = archive_harvests(before, dry_run)
+    for harvest_id, moved in archived:
+        if dry_run:
+            print(f"Harvest {harvest_id} would be archived.")
+        else:
+            print(f"Harvest {harvest_id}: " + ', '.join(f"{count} {table}" for table, count in moved.items()) + " rows archived.")
+    print(f"{len(archived)} harvests {'to archive' if dry_run else 'archived'}.")
+
+
+@click.command('import-scale-tickets')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--company-id', type=int, help='Only match truckloads of this company.')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False), help='Write rejected rows here instead of stdout.')
+@with_appcontext
+def import_scale_tickets_command(path, company_id, errors_path):
+    with open(path, 'rb') as stream:
+        if errors_path:
+            with open(errors_path, 'w', newline='') as error_stream:
+                counts = import_scale_tickets(stream, path, error_stream, company_id=company_id)
+        else:
+            counts = import_scale_tickets(stream, path, sys.stdout, company_id=company_id)
+    print(f"{counts['rows']} rows read, {counts['imported']} imported, {counts['errors']} rejected.", file=sys.stderr)
+
+
+@click.command('run-jobs')
+@click.option('--threads', type=click.IntRange(min=1), default=1, show_default=True, help='Jobs run at once by this process.')
+@click.option('--kind', 'kinds', multiple=True, type=click.Choice(sorted(JOB_TYPES)), help='Only run jobs of this kind; repeatable.')
+@click.option('--once', is_flag=True, help='Exit when no job is ready instead of waiting for more.')
+@with_appcontext
+def run_jobs_command(threads, kinds, once):
+    print(f"Running background jobs on {threads} thread(s)...", file=sys.stderr)
+    run_workers(current_app._get_current_object(), threads, kinds, once)
+    print("Job worker stopped.", file=sys.stderr)
+
+
+@click.command('build-assets')
+@click.option('--prune', 'prune_stale', is_flag=True, help='Also remove fingerprinted files of earlier builds.')
+@with_appcontext
+def build_assets_command(prune_stale):
+    # The app builds them as it starts; this is for images whose app
+    # directory is read-only at runtime, and for cleaning up
+    manifest = build(current_app.static_folder)
+    print(f"{len(manifest)} static assets built.")
+    if prune_stale:
+        print(f"{prune(current_app.static_folder, manifest)} stale files removed.")
@@ -0,0 +1,69 @@
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    # gzip only
+    brotli = None
+
+# Response types worth compressing; fonts and images are compact already,
+# and files and streams (exports, the event stream) go out as they are
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Static assets are compressed once, as hard as the codec goes; responses on
+# every request, at a level that costs a millisecond or two per page
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+RESPONSE_LEVELS = {'br': 4, 'gzip': 6}
+
+# Stored variant of a static file per content coding
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def encodings():
+    # Content codings this process can produce, preferred first
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, levels=RESPONSE_LEVELS):
+    if encoding == 'br':
+        return brotli.compress(data, quality=levels['br'])
+    # mtime=0 keeps the output the same for the same input
+    return gzip.compress(data, compresslevel=levels['gzip'], mtime=0)
+
+
+def negotiate(available):
+    # The first of available that the request's Accept-Encoding allows, or
+    # None to send the body as it is
+    for encoding in available:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress_response(response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype not in COMPRESSIBLE_TYPES
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    encoding = negotiate(encodings())
+    if encoding is not None:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    # Buffered HTML and JSON are compressed as they leave, once per response
+    if app.config['COMPRESS_RESPONSES']:
+        app.after_request(compress_response)
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import time
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from app.versions import ALL_COMPANIES, current_versions, harvest_per_field_scope, reference_scope, truckload_scope, yield_scope
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _build_id(asset_manifest):
+    # Changes with every deploy of code, templates or static assets, so a
+    # page kept by a browser never outlives the markup that rendered it or
+    # the fingerprinted assets it links
+    digest = hashlib.sha1(repr(sorted(asset_manifest.items())).encode())
+    for directory, _, files in sorted(os.walk(APP_ROOT)):
+        for name in sorted(files):
+            if name.endswith(('.py', '.html')):
+                stat = os.stat(os.path.join(directory, name))
+                digest.update(f'{os.path.relpath(os.path.join(directory, name), APP_ROOT)}:{stat.st_size}:{int(stat.st_mtime)}'.encode())
+    return digest.hexdigest()[:12]
+
+
+def init_app(app):
+    app.extensions['etag_build_id'] = _build_id(app.extensions.get('asset_manifest', {}))
+
+
+def _csrf_part():
+    # Pages embed a CSRF token that expires WTF_CSRF_TIME_LIMIT seconds after
+    # it was issued. Rolling the tag over every half limit keeps the forms of
+    # a page answered with 304 valid.
+    limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    window = int(time.time() // max(limit // 2, 1)) if limit else 0
+    return session.get('csrf_token', ''), window
+
+
+def etag(scopes):
+    # Everything a page depends on besides its data: who is asking, what they
+    # asked, their session's CSRF token and the deployed code; plus the
+    # version of each scope it reads. One indexed query.
+    versions = current_versions(*scopes)
+    parts = (
+        current_user.id, current_user.permission, current_user.company_id, request.full_path,
+        _csrf_part(), current_app.extensions['etag_build_id'], [versions[scope] for scope in scopes]
+    )
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+
+
+def conditional(scopes):
+    # For GET views whose output only changes with the DataVersion scopes that
+    # scopes() names: a request whose If-None-Match holds the current tag gets
+    # 304 Not Modified without the view running; 200 responses carry the tag.
+    # Goes below @login_required.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are rendered into the page, so it differs
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            tag = etag(scopes())
+            if request.if_none_match.contains_weak(tag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # Weak: the body may be compressed on the way out
+            response.set_etag(tag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def company_reference_scopes():
+    return [reference_scope(current_user.company_id)]
+
+
+def company_truckload_scopes():
+    return [reference_scope(current_user.company_id), truckload_scope(current_user.company_id)]
+
+
+def all_reference_scopes():
+    return [reference_scope(ALL_COMPANIES)]
+
+
+def all_truckload_scopes():
+    return [reference_scope(ALL_COMPANIES), truckload_scope(ALL_COMPANIES)]
+
+
+def company_yield_scopes():
+    company_id = current_user.company_id
+    return [reference_scope(company_id), harvest_per_field_scope(company_id), yield_scope(company_id)]
+
+
+def all_yield_scopes():
+    return [reference_scope(ALL_COMPANIES), harvest_per_field_scope(ALL_COMPANIES), yield_scope(ALL_COMPANIES)]
@@ -0,0 +1,436 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import inspect
+from app.archive import all_truckloads
+from app.database import upsert_insert
+from app.extensions import db
+from app.models import HarvestRig, RigHourlyStat, Truck, TruckHourlyStat, Truckload
+
+RIG_COUNTS = ('load_count', 'gap_count', 'gap_seconds')
+TRUCK_COUNTS = ('trip_count', 'trip_seconds', 'turnaround_count', 'turnaround_seconds')
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _interval(later, earlier, limit):
+    # Seconds between two stamps, or None when either is missing, they are out
+    # of order, or the wait is longer than a break (CYCLE_GAP_LIMIT)
+    if later is None or earlier is None:
+        return None
+    seconds = (later - earlier).total_seconds()
+    if seconds < 0 or (limit is not None and seconds > limit):
+        return None
+    return seconds
+
+
+def _upsert(session, table, key, counts, maxima):
+    # Add counts to, and raise maxima of, the bucket at key
+    insert = upsert_insert(session, table)
+    if insert is not None:
+        # Two-argument max() is SQLite's spelling of greatest()
+        greatest = db.func.max if session.get_bind().dialect.name == 'sqlite' else db.func.greatest
+        statement = insert.values(**key, **counts, **maxima)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={
+                **{name: table.c[name] + statement.excluded[name] for name in counts},
+                **{name: greatest(table.c[name], statement.excluded[name]) for name in maxima},
+            }
+        ))
+        return
+
+    updated = session.execute(table.update().where(*(table.c[name] == value for name, value in key.items())).values(
+        **{name: table.c[name] + value for name, value in counts.items()},
+        **{name: db.case((table.c[name] < value, value), else_=table.c[name]) for name, value in maxima.items()},
+    ))
+    if updated.rowcount == 0:
+        session.execute(table.insert().values(**key, **counts, **maxima))
+
+
+def _just_unloaded(truckload):
+    # A live load whose unload time is being set for the first time
+    if truckload.deleted_at is not None or truckload.load_date_time is None or truckload.unload_date_time is None:
+        return False
+    state = inspect(truckload)
+    if state.pending:
+        return True
+    history = state.attrs['unload_date_time'].history
+    return bool(history.added) and not any(history.deleted)
+
+
+def apply_cycle_stats(session, truckloads):
+    # Adds freshly unloaded truckloads to their rig's and truck's hourly
+    # buckets: two indexed lookups per load for the rig's previous load and
+    # the truck's previous trip, then one upsert per bucket touched
+    limit = current_app.config['CYCLE_GAP_LIMIT'] * 60
+    rigs = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    trucks = defaultdict(lambda: [0, 0.0, 0, 0.0, 0.0])
+
+    truckloads = sorted(truckloads, key=lambda truckload: truckload.load_date_time)
+    with session.no_autoflush:
+        for number, truckload in enumerate(truckloads):
+            loaded = truckload.load_date_time
+            earlier = truckloads[:number]
+
+            previous_load = session.scalar(db.select(db.func.max(Truckload.load_date_time)).where(
+                Truckload.harvest_rig_id == truckload.harvest_rig_id,
+                Truckload.load_date_time < loaded
+            ))
+            # Loads of the same batch (an in-cab sync) are not in the table yet
+            for other in earlier:
+                if other.harvest_rig_id == truckload.harvest_rig_id and other.load_date_time < loaded:
+                    previous_load = max(previous_load or other.load_date_time, other.load_date_time)
+
+            previous_trip = session.execute(db.select(Truckload.load_date_time, Truckload.unload_date_time).where(
+                Truckload.truck_id == truckload.truck_id,
+                Truckload.load_date_time < loaded,
+                Truckload.unload_date_time.isnot(None)
+            ).order_by(Truckload.load_date_time.desc()).limit(1)).first()
+            batch_trips = [other for other in earlier if other.truck_id == truckload.truck_id and other.load_date_time < loaded]
+            if batch_trips and (previous_trip is None or batch_trips[-1].load_date_time >= previous_trip.load_date_time):
+                previous_unload = batch_trips[-1].unload_date_time
+            else:
+                previous_unload = previous_trip.unload_date_time if previous_trip else None
+
+            hour = hour_of(loaded)
+            rig = rigs[(truckload.harvest_rig_id, hour)]
+            rig[0] += 1
+            gap = _interval(loaded, previous_load, limit)
+            if gap is not None:
+                rig[1] += 1
+                rig[2] += gap
+                rig[3] = max(rig[3], gap)
+
+            truck = trucks[(truckload.truck_id, hour)]
+            trip = _interval(truckload.unload_date_time, loaded, None)
+            if trip is not None:
+                truck[0] += 1
+                truck[1] += trip
+            turnaround = _interval(loaded, previous_unload, limit)
+            if turnaround is not None:
+                truck[2] += 1
+                truck[3] += turnaround
+                truck[4] = max(truck[4], turnaround)
+
+    for (harvest_rig_id, hour), values in rigs.items():
+        _upsert(session, RigHourlyStat.__table__, {'harvest_rig_id': harvest_rig_id, 'hour': hour},
+                dict(zip(RIG_COUNTS, values[:3])), {'max_gap_seconds': values[3]})
+    for (truck_id, hour), values in trucks.items():
+        _upsert(session, TruckHourlyStat.__table__, {'truck_id': truck_id, 'hour': hour},
+                dict(zip(TRUCK_COUNTS, values[:4])), {'max_turnaround_seconds': values[4]})
+
+
+# Truckload columns whose change moves a load between buckets or changes
+# its neighbours' gaps
+CYCLE_COLUMNS = ('load_date_time', 'unload_date_time', 'harvest_rig_id', 'truck_id', 'deleted_at')
+
+
+def _before(truckload, state, name):
+    # Value as it was loaded, before this flush
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(truckload, name)
+
+
+def _touch(session, truckload, before=False, counted=True):
+    # Remember where a load sat (or sits) for refresh_touched(). counted: its
+    # own buckets changed; otherwise only the loads after it are affected.
+    state = inspect(truckload)
+    value = (lambda name: _before(truckload, state, name)) if before else (lambda name: getattr(truckload, name))
+    if value('load_date_time') is None or value('deleted_at') is not None:
+        return
+    touched = session.info.setdefault('cycle_stats_touched', {'rigs': set(), 'trucks': set()})
+    touched['rigs'].add((value('harvest_rig_id'), value('load_date_time'), counted))
+    # Trucks only count trips that are over
+    if value('unload_date_time') is not None:
+        touched['trucks'].add((value('truck_id'), value('load_date_time'), counted))
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def track_cycle_stats(session, flush_context, instances):
+    # finish_truckload, the in-cab sync and admin edits all stamp
+    # unload_date_time through the session, so the buckets follow every one.
+    # Loads that arrive out of time order, deletes and edits of a load's
+    # times, rig or truck also change other loads' gaps; those buckets are
+    # recomputed after the flush.
+    finished = []
+    for truckload in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(truckload, Truckload):
+            continue
+        if truckload in session.deleted:
+            _touch(session, truckload, before=True)
+            continue
+
+        state = inspect(truckload)
+        changed = {name for name in CYCLE_COLUMNS if state.attrs[name].history.has_changes()}
+        just_unloaded = _just_unloaded(truckload)
+        if state.pending or (changed == {'unload_date_time'} and just_unloaded):
+            if just_unloaded:
+                finished.append(truckload)
+            # Its own buckets are added to incrementally; one put in before
+            # later loads changes their gaps
+            _touch(session, truckload, counted=False)
+        elif changed:
+            _touch(session, truckload, before=True)
+            _touch(session, truckload)
+    if finished:
+        apply_cycle_stats(session, finished)
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def refresh_touched(session, flush_context):
+    touched = session.info.pop('cycle_stats_touched', None)
+    if touched:
+        with session.no_autoflush:
+            refresh_cycle_stats(session, touched['rigs'], touched['trucks'])
+
+
+def _next_load(session, column, key, loaded, finished):
+    # Load time of the rig's or truck's next live load after loaded
+    query = db.select(db.func.min(Truckload.load_date_time)).where(column == key, Truckload.load_date_time > loaded)
+    if finished:
+        query = query.where(Truckload.unload_date_time.isnot(None))
+    return session.scalar(query)
+
+
+def _hour_ranges(session, column, touched, finished):
+    # {key: (first hour, last hour)} to recompute: the touched load's own
+    # hour when it counted, and the hour of the next load, whose gap hangs
+    # on it
+    ranges = {}
+    for key, loaded, counted in touched:
+        hours = [loaded] if counted else []
+        next_load = _next_load(session, column, key, loaded, finished)
+        if next_load is not None:
+            hours.append(next_load)
+        if not hours:
+            continue
+        first, last = ranges.get(key, (hour_of(min(hours)), hour_of(max(hours))))
+        ranges[key] = (min(first, hour_of(min(hours))), max(last, hour_of(max(hours))))
+    return ranges
+
+
+def refresh_cycle_stats(session, rigs, trucks):
+    # Recomputes the buckets around touched loads ({(rig or truck id, load
+    # time, counted)}) from the table, the way rebuild_cycle_stats() does for
+    # all of them; one delete and one INSERT ... SELECT per rig and truck
+    dialect = session.get_bind().dialect.name
+    limit = current_app.config['CYCLE_GAP_LIMIT'] * 60
+    rig_table, truck_table = RigHourlyStat.__table__, TruckHourlyStat.__table__
+
+    for rig_id, (first, last) in _hour_ranges(session, Truckload.harvest_rig_id, rigs, False).items():
+        until = last + timedelta(hours=1)
+        session.execute(rig_table.delete().where(
+            rig_table.c.harvest_rig_id == rig_id, rig_table.c.hour >= first, rig_table.c.hour < until
+        ))
+        session.execute(rig_table.insert().from_select(
+            ['harvest_rig_id', 'hour', *RIG_COUNTS, 'max_gap_seconds'], _rig_totals(dialect, limit, rig_id, first, until)
+        ))
+
+    for truck_id, (first, last) in _hour_ranges(session, Truckload.truck_id, trucks, True).items():
+        until = last + timedelta(hours=1)
+        session.execute(truck_table.delete().where(
+            truck_table.c.truck_id == truck_id, truck_table.c.hour >= first, truck_table.c.hour < until
+        ))
+        session.execute(truck_table.insert().from_select(
+            ['truck_id', 'hour', *TRUCK_COUNTS, 'max_turnaround_seconds'], _truck_totals(dialect, limit, truck_id, first, until)
+        ))
+
+
+def _window(hours, until=None):
+    until = until or datetime.utcnow()
+    return hour_of(until) - timedelta(hours=hours - 1), until
+
+
+def _minutes(seconds, count):
+    return round(seconds / count / 60, 1) if count else None
+
+
+def rig_cycle_stats(company_id, since, until):
+    # Per rig over [since, until]: finished loads, loads per active hour and
+    # the idle gaps between loads, longest average gap first
+    rows = db.session.execute(db.select(
+        HarvestRig.id, HarvestRig.name,
+        db.func.sum(RigHourlyStat.load_count), db.func.count(),
+        db.func.sum(RigHourlyStat.gap_count), db.func.sum(RigHourlyStat.gap_seconds),
+        db.func.max(RigHourlyStat.max_gap_seconds)
+    ).join(RigHourlyStat, RigHourlyStat.harvest_rig_id == HarvestRig.id).where(
+        HarvestRig.company_id == company_id,
+        RigHourlyStat.hour >= hour_of(since),
+        RigHourlyStat.hour <= until
+    ).group_by(HarvestRig.id, HarvestRig.name)).all()
+
+    stats = [{
+        'harvest_rig_id': rig_id,
+        'harvest_rig': name,
+        'loads': loads,
+        'active_hours': active_hours,
+        'loads_per_hour': round(loads / active_hours, 2),
+        'avg_gap_minutes': _minutes(gap_seconds, gap_count),
+        'max_gap_minutes': round(max_gap_seconds / 60, 1) if gap_count else None,
+    } for rig_id, name, loads, active_hours, gap_count, gap_seconds, max_gap_seconds in rows]
+    return sorted(stats, key=lambda rig: (-(rig['avg_gap_minutes'] or 0), rig['harvest_rig']))
+
+
+def truck_cycle_stats(company_id, since, until):
+    # Per truck over [since, until]: trips, average haul (load to unload),
+    # turnaround (unload to next load) and their sum, the round trip
+    rows = db.session.execute(db.select(
+        Truck.id, Truck.name,
+        db.func.sum(TruckHourlyStat.trip_count), db.func.sum(TruckHourlyStat.trip_seconds),
+        db.func.sum(TruckHourlyStat.turnaround_count), db.func.sum(TruckHourlyStat.turnaround_seconds),
+        db.func.max(TruckHourlyStat.max_turnaround_seconds)
+    ).join(TruckHourlyStat, TruckHourlyStat.truck_id == Truck.id).where(
+        Truck.company_id == company_id,
+        TruckHourlyStat.hour >= hour_of(since),
+        TruckHourlyStat.hour <= until
+    ).group_by(Truck.id, Truck.name)).all()
+
+    stats = []
+    for truck_id, name, trips, trip_seconds, turnarounds, turnaround_seconds, max_turnaround_seconds in rows:
+        haul = _minutes(trip_seconds, trips)
+        turnaround = _minutes(turnaround_seconds, turnarounds)
+        stats.append({
+            'truck_id': truck_id,
+            'truck': name,
+            'trips': trips,
+            'avg_trip_minutes': haul,
+            'avg_turnaround_minutes': turnaround,
+            'round_trip_minutes': round(haul + turnaround, 1) if haul is not None and turnaround is not None else None,
+            'max_turnaround_minutes': round(max_turnaround_seconds / 60, 1) if turnarounds else None,
+        })
+    return sorted(stats, key=lambda truck: truck['truck'])
+
+
+def rig_hourly_loads(company_id, since, until):
+    # {harvest_rig_id: {hour: loads}} for the hour-by-hour grid
+    rows = db.session.execute(db.select(
+        RigHourlyStat.harvest_rig_id, RigHourlyStat.hour, RigHourlyStat.load_count
+    ).join(HarvestRig, RigHourlyStat.harvest_rig_id == HarvestRig.id).where(
+        HarvestRig.company_id == company_id,
+        RigHourlyStat.hour >= hour_of(since),
+        RigHourlyStat.hour <= until
+    ))
+    hourly = defaultdict(dict)
+    for harvest_rig_id, hour, loads in rows:
+        hourly[harvest_rig_id][hour] = loads
+    return hourly
+
+
+def company_cycle_stats(company_id, hours, until=None):
+    # Everything the dashboard shows for the last `hours` hours, JSON-ready
+    since, until = _window(hours, until)
+    hourly = rig_hourly_loads(company_id, since, until)
+    rigs = rig_cycle_stats(company_id, since, until)
+    hour_list = [hour_of(since) + timedelta(hours=offset) for offset in range(hours)]
+    for rig in rigs:
+        loads = hourly.get(rig['harvest_rig_id'], {})
+        rig['hourly_loads'] = [loads.get(hour, 0) for hour in hour_list]
+    return {
+        'since': since.isoformat(),
+        'until': until.isoformat(),
+        'hours': [hour.isoformat() for hour in hour_list],
+        'rigs': rigs,
+        'trucks': truck_cycle_stats(company_id, since, until),
+    }
+
+
+def _hour_expression(dialect, column):
+    # Same bucket values hour_of() writes: SQLite stores DateTime as text
+    if dialect == 'sqlite':
+        return db.func.strftime('%Y-%m-%d %H:00:00.000000', column)
+    return db.func.date_trunc('hour', column)
+
+
+def _seconds_expression(dialect, later, earlier):
+    if dialect == 'sqlite':
+        return (db.func.julianday(later) - db.func.julianday(earlier)) * 86400
+    return db.func.extract('epoch', later - earlier)
+
+
+def _rig_totals(dialect, limit, harvest_rig_id=None, since=None, until=None):
+    # Rows of rig_hourly_stat from the loads, with LAG over each rig's loads:
+    # every bucket, or one rig's buckets for loads in [since, until). A load
+    # before since - limit only ever leaves a gap too long to count, so the
+    # window starts there.
+    history = all_truckloads()
+    live = [history.deleted_at.is_(None)]
+    if harvest_rig_id is not None:
+        live += [
+            history.harvest_rig_id == harvest_rig_id,
+            history.load_date_time >= since - timedelta(seconds=limit),
+            history.load_date_time < until
+        ]
+    loads = db.select(
+        history.harvest_rig_id, history.load_date_time, history.unload_date_time,
+        db.func.lag(history.load_date_time).over(
+            partition_by=history.harvest_rig_id, order_by=(history.load_date_time, history.id)
+        ).label('previous_load')
+    ).where(*live).subquery()
+    counted = [loads.c.unload_date_time.isnot(None)]
+    if since is not None:
+        counted.append(loads.c.load_date_time >= since)
+
+    gap = _seconds_expression(dialect, loads.c.load_date_time, loads.c.previous_load)
+    gap_valid = db.and_(loads.c.previous_load.isnot(None), gap >= 0, gap <= limit)
+    hour = _hour_expression(dialect, loads.c.load_date_time)
+    return db.select(
+        loads.c.harvest_rig_id, hour, db.func.count(),
+        db.func.sum(db.case((gap_valid, 1), else_=0)),
+        db.func.coalesce(db.func.sum(db.case((gap_valid, gap))), 0),
+        db.func.coalesce(db.func.max(db.case((gap_valid, gap))), 0)
+    ).where(*counted).group_by(loads.c.harvest_rig_id, hour)
+
+
+def _truck_totals(dialect, limit, truck_id=None, since=None, until=None):
+    # Rows of truck_hourly_stat, like _rig_totals(); a trip unloaded before
+    # since - limit only ever leaves a turnaround too long to count
+    history = all_truckloads()
+    live = [history.unload_date_time.isnot(None), history.deleted_at.is_(None)]
+    if truck_id is not None:
+        live += [
+            history.truck_id == truck_id,
+            history.unload_date_time >= since - timedelta(seconds=limit),
+            history.load_date_time < until
+        ]
+    trips = db.select(
+        history.truck_id, history.load_date_time, history.unload_date_time,
+        db.func.lag(history.unload_date_time).over(
+            partition_by=history.truck_id, order_by=(history.load_date_time, history.id)
+        ).label('previous_unload')
+    ).where(*live).subquery()
+    counted = [trips.c.load_date_time >= since] if since is not None else []
+
+    trip = _seconds_expression(dialect, trips.c.unload_date_time, trips.c.load_date_time)
+    turnaround = _seconds_expression(dialect, trips.c.load_date_time, trips.c.previous_unload)
+    turnaround_valid = db.and_(trips.c.previous_unload.isnot(None), turnaround >= 0, turnaround <= limit)
+    hour = _hour_expression(dialect, trips.c.load_date_time)
+    return db.select(
+        trips.c.truck_id, hour,
+        db.func.sum(db.case((trip >= 0, 1), else_=0)),
+        db.func.coalesce(db.func.sum(db.case((trip >= 0, trip))), 0),
+        db.func.sum(db.case((turnaround_valid, 1), else_=0)),
+        db.func.coalesce(db.func.sum(db.case((turnaround_valid, turnaround))), 0),
+        db.func.coalesce(db.func.max(db.case((turnaround_valid, turnaround))), 0)
+    ).where(*counted).group_by(trips.c.truck_id, hour)
+
+
+def rebuild_cycle_stats():
+    # Recompute both bucket tables from Truckload with window functions, for
+    # the initial fill and after loads are changed outside the session (bulk
+    # SQL, imports of old data). Archived loads are read too, so their hours
+    # are kept.
+    dialect = db.session.get_bind().dialect.name
+    limit = current_app.config['CYCLE_GAP_LIMIT'] * 60
+    db.session.execute(RigHourlyStat.__table__.delete())
+    db.session.execute(TruckHourlyStat.__table__.delete())
+    db.session.execute(RigHourlyStat.__table__.insert().from_select(
+        ['harvest_rig_id', 'hour', *RIG_COUNTS, 'max_gap_seconds'], _rig_totals(dialect, limit)
+    ))
+    db.session.execute(TruckHourlyStat.__table__.insert().from_select(
+        ['truck_id', 'hour', *TRUCK_COUNTS, 'max_turnaround_seconds'], _truck_totals(dialect, limit)
+    ))
+    db.session.commit()
+    return RigHourlyStat.query.count(), TruckHourlyStat.query.count()
@@ -0,0 +1,99 @@
+import csv
+import io
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from app.extensions import db
+
+# Drivers whose COPY support copy_rows uses
+COPY_DRIVERS = ('psycopg2', 'psycopg')
+
+
+def _is_file_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def _is_postgresql(uri):
+    return make_url(uri).get_backend_name() == 'postgresql'
+
+
+def configure_engine(app):
+    # Engine options for PostgreSQL and the SQLite file database; call before
+    # db.init_app
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if _is_postgresql(app.config['SQLALCHEMY_DATABASE_URI']):
+        # Pooled connections are checked before use, so a restarted or
+        # failed-over server costs a reconnect instead of a failed request
+        options.setdefault('pool_size', app.config['POSTGRES_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['POSTGRES_MAX_OVERFLOW'])
+        options.setdefault('pool_pre_ping', True)
+        return
+
+    if not app.config['SQLITE_TUNING'] or not _is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    # pysqlite's timeout is its busy handler, so writers queue for the lock
+    # instead of failing straight away with "database is locked"
+    options.setdefault('connect_args', {}).setdefault('timeout', app.config['SQLITE_PRAGMAS']['busy_timeout'] / 1000)
+    options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['SQLITE_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', app.config['SQLITE_POOL_TIMEOUT'])
+
+
+def set_sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+    return on_connect
+
+
+def init_app(app):
+    # Pragmas are per connection (journal_mode=wal also sticks to the file),
+    # so they are set as each pooled connection is opened
+    if not app.config['SQLITE_TUNING'] or not _is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    with app.app_context():
+        db.event.listen(db.engine, 'connect', set_sqlite_pragmas(app.config['SQLITE_PRAGMAS']))
+
+
+def upsert_insert(session, table):
+    # An INSERT that takes on_conflict_do_update() on the databases that have
+    # one (SQLite, PostgreSQL); None elsewhere, where callers update then insert
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    return None
+
+
+def can_copy(session):
+    bind = session.get_bind()
+    return bind.dialect.name == 'postgresql' and bind.dialect.driver in COPY_DRIVERS
+
+
+def copy_rows(session, table, columns, rows):
+    # Bulk load rows (tuples in columns order) with COPY FROM STDIN on the
+    # session's connection and transaction; check can_copy() first
+    preparer = session.get_bind().dialect.identifier_preparer
+    statement = 'COPY {} ({}) FROM STDIN'.format(
+        preparer.format_table(table), ', '.join(preparer.quote(column) for column in columns)
+    )
+    cursor = session.connection().connection.dbapi_connection.cursor()
+    try:
+        if session.get_bind().dialect.driver == 'psycopg':
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            return
+
+        # psycopg2 reads a CSV stream; None is the unquoted empty field
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f"{statement} WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
@@ -0,0 +1,204 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import Response, current_app, request, stream_with_context
+from app.extensions import db
+from app.models import Event
+
+KEEP_ALIVE_SECONDS = 15
+
+
+def trucker_channel(user_id):
+    return f'trucker:{user_id}'
+
+
+def company_channel(company_id):
+    return f'company:{company_id}'
+
+
+def truckload_channel(truckload_id):
+    return f'truckload:{truckload_id}'
+
+
+class DatabaseBroker:
+    # Events are written to the event table inside the caller's transaction, so
+    # they only become visible once the change they describe is committed and
+    # every worker process polling the table picks them up.
+
+    def __init__(self, app):
+        self.poll_interval = app.config['EVENT_POLL_INTERVAL']
+        self.retention = timedelta(minutes=app.config['EVENT_RETENTION_MINUTES'])
+        self.overlap = timedelta(seconds=app.config['EVENT_COMMIT_OVERLAP'])
+        self._last_prune = datetime.utcnow()
+
+    def publish(self, channel, name, data):
+        db.session.add(Event(channel=channel, name=name, payload=json.dumps(data)))
+
+        now = datetime.utcnow()
+        if now - self._last_prune > self.retention:
+            self._last_prune = now
+            Event.query.filter(Event.created_at < now - self.retention).delete(synchronize_session=False)
+
+    def latest_id(self):
+        latest = db.session.query(db.func.max(Event.id)).scalar()
+        db.session.rollback()
+        return latest or 0
+
+    def listen(self, channels, last_id, timeout):
+        # PostgreSQL hands out ids at insert, not at commit, so an event can
+        # become visible after a higher id was already read past. There the
+        # last EVENT_COMMIT_OVERLAP seconds are read again on every poll, and
+        # events already sent, or already there when the stream started from
+        # last_id, are skipped. SQLite commits one writer at a time, in id order.
+        overlap = self.overlap if db.session.get_bind().dialect.name != 'sqlite' else None
+        seen = {}
+        if overlap:
+            seen = dict(db.session.execute(db.select(Event.id, Event.created_at).where(
+                Event.id <= last_id,
+                Event.created_at >= datetime.utcnow() - overlap,
+                Event.channel.in_(channels)
+            )).all())
+
+        deadline = time.monotonic() + timeout
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            newer = Event.id > last_id
+            if overlap:
+                cutoff = datetime.utcnow() - overlap
+                newer = db.or_(newer, Event.created_at >= cutoff)
+            events = Event.query.filter(newer, Event.channel.in_(channels)).order_by(Event.id).all()
+            # End the read transaction so SQLite can checkpoint between polls
+            db.session.rollback()
+
+            for event in events:
+                if event.id in seen:
+                    continue
+                if overlap:
+                    seen[event.id] = event.created_at
+                # A late event keeps the stream's id where it was, so a
+                # reconnect does not send the ones after it again
+                last_id = max(last_id, event.id)
+                last_sent = time.monotonic()
+                yield last_id, event.name, json.loads(event.payload)
+            if overlap:
+                seen = {event_id: created_at for event_id, created_at in seen.items() if created_at >= cutoff}
+
+            if time.monotonic() - last_sent > KEEP_ALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield None, None, None
+            time.sleep(self.poll_interval)
+
+
+class MemoryBroker:
+    # Single-process fan-out, for `flask run` and one-worker deployments.
+    # Published events are held back until the surrounding transaction commits.
+
+    def __init__(self, app):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._last_id = 0
+
+        @db.event.listens_for(db.session, 'after_commit')
+        def dispatch_pending(session):
+            for channel, name, data in session.info.pop('pending_events', []):
+                self._dispatch(channel, name, data)
+
+        @db.event.listens_for(db.session, 'after_soft_rollback')
+        def discard_pending(session, previous_transaction):
+            session.info.pop('pending_events', None)
+
+    def publish(self, channel, name, data):
+        db.session.info.setdefault('pending_events', []).append((channel, name, data))
+
+    def _dispatch(self, channel, name, data):
+        with self._lock:
+            self._last_id += 1
+            for subscriber in self._subscribers.get(channel, ()):
+                subscriber.put((self._last_id, name, data))
+
+    def latest_id(self):
+        return self._last_id
+
+    def listen(self, channels, last_id, timeout):
+        subscriber = queue.Queue()
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    yield subscriber.get(timeout=min(remaining, KEEP_ALIVE_SECONDS))
+                except queue.Empty:
+                    yield None, None, None
+        finally:
+            with self._lock:
+                for channel in channels:
+                    self._subscribers.get(channel, set()).discard(subscriber)
+
+
+BROKERS = {
+    'database': DatabaseBroker,
+    'memory': MemoryBroker,
+}
+
+
+def init_app(app):
+    app.extensions['event_broker'] = BROKERS[app.config['EVENT_BROKER']](app)
+    app.extensions['event_stream_slots'] = threading.BoundedSemaphore(app.config['EVENT_MAX_STREAMS'])
+
+
+def publish(channel, name, data):
+    # Call before db.session.commit(); the event is delivered with the commit
+    current_app.extensions['event_broker'].publish(channel, name, data)
+
+
+def event_stream(channels, initial=None):
+    # Server-sent event response. The stream closes after EVENT_STREAM_TIMEOUT,
+    # and EventSource reconnects on its own and resumes from the Last-Event-ID
+    # header. Each open stream holds a worker thread (see gunicorn.conf.py), so
+    # a worker keeps at most EVENT_MAX_STREAMS open; past that the browser is
+    # told to come back in EVENT_BUSY_RETRY seconds and the threads stay free
+    # for page requests.
+    #
+    # A new stream starts at the latest event, so whatever happened between
+    # rendering the page and connecting is not in it. initial() is called
+    # once that start is fixed and returns [(name, data)] to send first, from
+    # the current state.
+    broker = current_app.extensions['event_broker']
+    slots = current_app.extensions['event_stream_slots']
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = broker.latest_id()
+    backlog = initial() if initial else []
+    timeout = current_app.config['EVENT_STREAM_TIMEOUT']
+    busy_retry = current_app.config['EVENT_BUSY_RETRY'] * 1000
+
+    def generate():
+        # The id line makes the reconnect resume from here even when no event
+        # was sent on this connection
+        if not slots.acquire(blocking=False):
+            yield f'retry: {busy_retry}\nid: {last_id}\n\n'
+            return
+        try:
+            yield f'retry: 1000\nid: {last_id}\n\n'
+            for name, data in backlog:
+                yield f'id: {last_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n'
+            for event_id, name, data in broker.listen(channels, last_id, timeout):
+                if event_id is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n'
+        finally:
+            slots.release()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
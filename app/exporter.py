@@ -0,0 +1,132 @@
+import csv
+import io
+import os
+import tempfile
+from flask import Response, current_app, stream_with_context
+from app.archive import truckloads_for, yield_totals_for
+from app.extensions import db
+from app.models import HarvestRig, Truck, User, Harvest, FarmField, Farm
+from app.truckload_listing import apply_filters
+
+TRUCKLOAD_HEADER = [
+    'truckload_id', 'load_date_time', 'unload_date_time', 'harvest', 'field', 'harvest_rig',
+    'truck', 'operator', 'trucker', 'yield_amount', 'yield_type'
+]
+YIELD_HEADER = ['harvest', 'field', 'yield_unit', 'yield_amount', 'load_count']
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def truckload_export_query(filters, company_id=None):
+    # Plain column tuples, names joined in, so no ORM objects are built per row
+    source = truckloads_for(filters)
+    operator = db.aliased(User)
+    trucker = db.aliased(User)
+    statement = db.select(
+        source.id, source.load_date_time, source.unload_date_time,
+        Harvest.name, FarmField.name, HarvestRig.name, Truck.name,
+        operator.username, trucker.username, source.yield_amount, source.yield_type
+    ).join(Harvest, source.harvest_id == Harvest.id) \
+        .join(FarmField, source.field_id == FarmField.id) \
+        .join(HarvestRig, source.harvest_rig_id == HarvestRig.id) \
+        .join(Truck, source.truck_id == Truck.id) \
+        .join(operator, source.operator_id == operator.id) \
+        .join(trucker, source.trucker_id == trucker.id)
+    if company_id:
+        statement = statement.where(HarvestRig.company_id == company_id)
+    return apply_filters(statement, filters, source).order_by(source.load_date_time, source.id)
+
+
+def yield_export_query(filters, company_id=None):
+    totals = yield_totals_for(filters)
+    statement = db.select(
+        Harvest.name, FarmField.name, totals.yield_unit,
+        totals.yield_amount, totals.load_count
+    ).join(Harvest, totals.harvest_id == Harvest.id) \
+        .join(FarmField, totals.field_id == FarmField.id)
+    if company_id:
+        statement = statement.join(Farm, Harvest.farm_id == Farm.id).where(Farm.company_id == company_id)
+    if 'harvest_id' in filters:
+        statement = statement.where(totals.harvest_id == filters['harvest_id'])
+    if 'field_id' in filters:
+        statement = statement.where(totals.field_id == filters['field_id'])
+    return statement.order_by(Harvest.name, FarmField.name, totals.yield_unit)
+
+
+# Exports a background job can produce: name -> (header, query builder)
+EXPORTS = {
+    'truckloads': (TRUCKLOAD_HEADER, truckload_export_query),
+    'harvest_yields': (YIELD_HEADER, yield_export_query),
+}
+
+
+def iter_rows(statement):
+    # Server-side cursor read EXPORT_CHUNK_SIZE rows at a time. On PostgreSQL
+    # that is a named cursor, so the server holds the result and the worker
+    # only ever has one chunk in memory; SQLite steps through it lazily.
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    result = db.session.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+    for partition in result.partitions():
+        yield from partition
+
+
+def stream_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_xlsx(header, rows):
+    # Write-only workbooks flush each row to disk, the finished file is then
+    # sent in fixed-size pieces
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(list(row))
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+def export_body(header, statement, file_format):
+    # (format, chunks of the file); anything but xlsx is csv
+    if file_format == 'xlsx':
+        return 'xlsx', stream_xlsx(header, iter_rows(statement))
+    return 'csv', stream_csv(header, iter_rows(statement))
+
+
+def write_export(path, header, statement, file_format):
+    # The same file a download gets, written next to path and moved into
+    # place once complete; returns its size in bytes
+    file_format, body = export_body(header, statement, file_format)
+    partial = f'{path}.partial'
+    with open(partial, 'wb') as output:
+        for chunk in body:
+            output.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    os.replace(partial, path)
+    return os.path.getsize(path)
+
+
+def export_response(filename, header, statement, file_format):
+    file_format, body = export_body(header, statement, file_format)
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[file_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{file_format}'}
+    )
@@ -0,0 +1,72 @@
+from datetime import datetime
+from app.extensions import db
+from app.models import HarvestRig, Truck, User
+from app.versions import bump, company_scopes, current_versions, fleet_scope, reference_scope
+
+# Equipment a user signs on to, and the column holding who has it
+HOLDERS = {Truck: 'current_driver_id', HarvestRig: 'current_operator_id'}
+
+SELECTED = 'selected'
+DESELECTED = 'deselected'
+TAKEN = 'taken'
+
+
+def toggle_assignment(model, record_id, company_id, user_id):
+    # Releases the truck or rig when user_id holds it, otherwise claims it if
+    # nobody does. Each step is a single UPDATE whose WHERE clause is the
+    # check, so of two users clicking the same truck at once exactly one
+    # changes a row; the other gets TAKEN. Returns None when there is no such
+    # truck or rig in the company. The caller commits.
+    holder = getattr(model, HOLDERS[model])
+    row = (model.id == record_id, model.company_id == company_id, model.deleted_at.is_(None))
+
+    def update(condition, value):
+        statement = db.update(model).where(*row, condition).values({HOLDERS[model]: value, 'updated_at': datetime.utcnow()})
+        return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+    if update(holder == user_id, None):
+        outcome = DESELECTED
+    elif update(holder.is_(None), user_id):
+        outcome = SELECTED
+    elif db.session.scalar(db.select(model.id).where(*row)) is None:
+        return None
+    else:
+        return TAKEN
+
+    # Core updates skip the session's change tracking, so bump by hand
+    bump(db.session, [fleet_scope(company_id), *company_scopes(reference_scope, [company_id])])
+    return outcome
+
+
+def fleet_version(company_id):
+    scope = fleet_scope(company_id)
+    return current_versions(scope)[scope]
+
+
+def _holders(model, company_id):
+    holder = getattr(model, HOLDERS[model])
+    rows = db.session.execute(
+        db.select(model.id, model.name, holder, User.username)
+        .outerjoin(User, User.id == holder)
+        .where(model.company_id == company_id)
+        .order_by(model.name)
+    )
+    return [
+        {'id': record_id, 'name': name, 'user_id': user_id or None, 'username': username if user_id else None}
+        for record_id, name, user_id, username in rows
+    ]
+
+
+def fleet_status(company_id, since=None):
+    # Every truck and rig of the company with who has it. A client passing the
+    # version it already has gets just the version back while nothing moved,
+    # which costs one primary-key read.
+    version = fleet_version(company_id)
+    if since is not None and since == version:
+        return {'version': version, 'changed': False}
+    return {
+        'version': version,
+        'changed': True,
+        'trucks': _holders(Truck, company_id),
+        'harvest_rigs': _holders(HarvestRig, company_id),
+    }
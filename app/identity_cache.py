@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask_login import current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app.extensions import db
+from app.models import User, Customer
+
+
+def _row(instance):
+    if instance is None:
+        return None
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(type(instance)).column_attrs}
+
+
+def _attach(model, row):
+    # Rebuild a cached row as a persistent instance of this request's session
+    # without a SELECT; it behaves like a loaded object, including saves
+    if row is None:
+        return None
+    instance = model(**row)
+    make_transient_to_detached(instance)
+    return db.session.merge(instance, load=False)
+
+
+class IdentityCache:
+    # Bounded, TTL-limited cache of the logged-in user and their company.
+    # Workers share invalidations through the mtime of a stamp file in the
+    # instance folder, checked with one stat() per lookup.
+
+    def __init__(self, app):
+        self.ttl = app.config['IDENTITY_CACHE_TTL']
+        self.max_size = app.config['IDENTITY_CACHE_SIZE']
+        self.stamp_path = os.path.join(app.instance_path, 'identity_cache.stamp')
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stamp = self._read_stamp()
+
+    def _read_stamp(self):
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def get(self, user_id):
+        stamp = self._read_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1], entry[2]
+
+    def put(self, user_id, user_row, company_row=None):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user_row, company_row)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put_company(self, user_id, company_row):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = (entry[0], entry[1], company_row)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            now = time.time_ns()
+            with open(self.stamp_path, 'a'):
+                os.utime(self.stamp_path, ns=(now, now))
+            self._stamp = self._read_stamp()
+
+    def load_user(self, user_id):
+        cached = self.get(user_id)
+        if cached is not None:
+            return _attach(User, cached[0])
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        self.put(user_id, _row(user))
+        return user
+
+    def load_company(self, user_id, company_id):
+        if not company_id:
+            return None
+        cached = self.get(user_id)
+        if cached is not None and cached[1] is not None and cached[1]['id'] == company_id:
+            return _attach(Customer, cached[1])
+
+        company = db.session.get(Customer, company_id)
+        if company is not None:
+            self.put_company(user_id, _row(company))
+        return company
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def track_identity_changes(session, flush_context, instances):
+    changed = (*session.new, *[instance for instance in session.dirty if session.is_modified(instance)], *session.deleted)
+    for instance in changed:
+        if isinstance(instance, (User, Customer)):
+            session.info['identity_changed'] = True
+            return
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidate_identities(session):
+    if session.info.pop('identity_changed', False):
+        current_app.extensions['identity_cache'].invalidate()
+
+
+@db.event.listens_for(db.session, 'after_soft_rollback')
+def discard_identity_changes(session, previous_transaction):
+    session.info.pop('identity_changed', None)
+
+
+def init_app(app):
+    app.extensions['identity_cache'] = IdentityCache(app)
+
+
+def load_user(user_id):
+    return current_app.extensions['identity_cache'].load_user(user_id)
+
+
+def current_company():
+    # The logged-in user's company, served from the identity cache when warm
+    return current_app.extensions['identity_cache'].load_company(current_user.id, current_user.company_id)
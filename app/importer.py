@@ -0,0 +1,237 @@
+import csv
+import io
+import math
+from collections import defaultdict
+from datetime import datetime
+from app.database import can_copy, copy_rows
+from app.extensions import db
+from app.models import Truckload, HarvestPerField, HarvestRig, Truck
+from app.rollups import yield_contribution, apply_yield_deltas
+from app.versions import bump, company_scopes, harvest_per_field_scope, rig_company_ids, truckload_scope, yield_scope
+
+YIELD_TYPES = ('bushels', 'pounds', 'tons')
+BATCH_SIZE = 1000
+ERROR_REPORT_HEADER = ['row', 'truckload_id', 'error']
+ENTRY_COLUMNS = ['harvest_id', 'field_id', 'yield_amount', 'yield_type', 'created_at', 'updated_at']
+
+# Yields of one batch on their way into truckload (COPY path); dropped when
+# the batch commits
+YIELD_STAGING = db.Table(
+    'truckload_yield_import', db.MetaData(),
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('yield_amount', db.Float),
+    db.Column('yield_type', db.String(80)),
+    prefixes=['TEMPORARY'], postgresql_on_commit='DROP'
+)
+
+
+def _column_name(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def read_rows(stream, filename):
+    # Yield (row_number, {column: value}) one row at a time; xlsx sheets are
+    # opened read-only so neither format is loaded into memory as a whole
+    if filename.lower().endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_column_name(name) for name in next(rows, ())]
+            for row_number, row in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in row):
+                    yield row_number, dict(zip(header, row))
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        header = [_column_name(name) for name in next(reader, [])]
+        for row_number, row in enumerate(reader, start=2):
+            if any(value.strip() for value in row):
+                yield row_number, dict(zip(header, row))
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip())
+
+
+def _parse_row(row, rigs, trucks):
+    # Returns (match key, yield_amount, yield_type); raises ValueError
+    try:
+        yield_amount = float(row.get('yield_amount'))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid yield amount: Must be a non-negative number.')
+    # float() also reads nan and inf, which would stay in the totals for good
+    if not math.isfinite(yield_amount) or yield_amount < 0:
+        raise ValueError('Invalid yield amount: Must be a non-negative number.')
+
+    yield_type = str(row.get('yield_type') or '').strip().lower()
+    if yield_type not in YIELD_TYPES:
+        raise ValueError('Invalid yield type: Must be one of "bushels", "pounds", or "tons".')
+
+    truckload_id = str(row.get('truckload_id') or '').strip()
+    if truckload_id:
+        try:
+            return ('id', int(float(truckload_id))), yield_amount, yield_type
+        except ValueError:
+            raise ValueError(f'Invalid truckload id: {truckload_id}')
+
+    rig = str(row.get('harvest_rig') or row.get('harvest_rig_id') or '').strip()
+    truck = str(row.get('truck') or row.get('truck_id') or '').strip()
+    if rig not in rigs:
+        raise ValueError(f'Unknown harvest rig: {rig}')
+    if truck not in trucks:
+        raise ValueError(f'Unknown truck: {truck}')
+    try:
+        load_date_time = _parse_datetime(row.get('load_date_time'))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid load date time: Use YYYY-MM-DD HH:MM.')
+    return ('ticket', (rigs[rig], trucks[truck], load_date_time)), yield_amount, yield_type
+
+
+def _lookup_maps(company_id):
+    # Rigs and trucks can be referenced by id or by name
+    rig_query = HarvestRig.query
+    truck_query = Truck.query
+    if company_id:
+        rig_query = rig_query.filter_by(company_id=company_id)
+        truck_query = truck_query.filter_by(company_id=company_id)
+
+    rigs, trucks = {}, {}
+    for rig in rig_query.all():
+        rigs[str(rig.id)] = rigs[rig.name] = rig.id
+    for truck in truck_query.all():
+        trucks[str(truck.id)] = trucks[truck.name] = truck.id
+    return rigs, trucks
+
+
+def _write_yields(yields, entries, now):
+    table = Truckload.__table__
+    db.session.execute(
+        table.update().where(table.c.id == db.bindparam('truckload_id')).values(
+            yield_amount=db.bindparam('new_yield_amount'),
+            yield_type=db.bindparam('new_yield_type'),
+            updated_at=now
+        ),
+        [
+            {'truckload_id': truckload_id, 'new_yield_amount': yield_amount, 'new_yield_type': yield_type}
+            for truckload_id, yield_amount, yield_type in yields
+        ]
+    )
+    db.session.execute(HarvestPerField.__table__.insert(), [dict(zip(ENTRY_COLUMNS, entry)) for entry in entries])
+
+
+def _copy_yields(yields, entries, now):
+    # PostgreSQL: the batch is streamed in with COPY and the loads updated
+    # from the staged rows by one UPDATE ... FROM, instead of a statement each
+    YIELD_STAGING.create(db.session.connection())
+    copy_rows(db.session, YIELD_STAGING, [column.name for column in YIELD_STAGING.columns], yields)
+    table = Truckload.__table__
+    db.session.execute(table.update().where(table.c.id == YIELD_STAGING.c.id).values(
+        yield_amount=YIELD_STAGING.c.yield_amount,
+        yield_type=YIELD_STAGING.c.yield_type,
+        updated_at=now
+    ))
+    copy_rows(db.session, HarvestPerField.__table__, ENTRY_COLUMNS, entries)
+
+
+def _import_batch(batch, rigs, trucks, company_rig_ids, errors):
+    # Rows are rejected while parsing and again while matching; they are
+    # written out in file order at the end
+    rejected = []
+    parsed = []
+    for row_number, row in batch:
+        try:
+            parsed.append((row_number, *_parse_row(row, rigs, trucks)))
+        except ValueError as error:
+            rejected.append([row_number, row.get('truckload_id') or '', str(error)])
+
+    columns = (
+        Truckload.id, Truckload.harvest_rig_id, Truckload.truck_id, Truckload.load_date_time,
+        Truckload.harvest_id, Truckload.field_id, Truckload.yield_amount, Truckload.yield_type,
+        Truckload.deleted_at
+    )
+    ids = [key for row_number, (kind, key), amount, unit in parsed if kind == 'id']
+    tickets = [key for row_number, (kind, key), amount, unit in parsed if kind == 'ticket']
+    by_id, by_ticket = {}, {}
+    if ids:
+        for match in db.session.execute(db.select(*columns).where(Truckload.id.in_(ids))):
+            by_id[match.id] = match._asdict()
+    if tickets:
+        ticket_key = db.tuple_(Truckload.harvest_rig_id, Truckload.truck_id, Truckload.load_date_time)
+        for match in db.session.execute(db.select(*columns).where(ticket_key.in_(tickets))):
+            state = match._asdict()
+            by_id[match.id] = state
+            by_ticket[(match.harvest_rig_id, match.truck_id, match.load_date_time)] = state
+
+    updates = {}
+    matched = 0
+    deltas = defaultdict(lambda: [0.0, 0])
+    for row_number, (kind, key), yield_amount, yield_type in parsed:
+        state = by_id.get(key) if kind == 'id' else by_ticket.get(key)
+        if state is None or (company_rig_ids is not None and state['harvest_rig_id'] not in company_rig_ids):
+            rejected.append([row_number, key if kind == 'id' else '', 'No matching truckload.'])
+            continue
+
+        for sign, contribution in (
+            (-1, yield_contribution(state['harvest_id'], state['field_id'], state['yield_amount'], state['yield_type'], state['deleted_at'])),
+            (1, yield_contribution(state['harvest_id'], state['field_id'], yield_amount, yield_type, state['deleted_at']))
+        ):
+            if contribution:
+                total_key, amount = contribution
+                deltas[total_key][0] += sign * amount
+                deltas[total_key][1] += sign
+        state['yield_amount'] = yield_amount
+        state['yield_type'] = yield_type
+        updates[state['id']] = state
+        matched += 1
+
+    if updates:
+        now = datetime.utcnow()
+        yields = [(truckload_id, state['yield_amount'], state['yield_type']) for truckload_id, state in updates.items()]
+        # Same per-load HarvestPerField entry the yield forms create
+        entries = [
+            (state['harvest_id'], state['field_id'], state['yield_amount'], state['yield_type'], now, now)
+            for state in updates.values()
+        ]
+        if can_copy(db.session):
+            _copy_yields(yields, entries, now)
+        else:
+            _write_yields(yields, entries, now)
+        apply_yield_deltas(db.session, deltas)
+        companies = rig_company_ids(db.session, {state['harvest_rig_id'] for state in updates.values()})
+        bump(db.session, [
+            *company_scopes(truckload_scope, companies),
+            *company_scopes(yield_scope, companies),
+            *company_scopes(harvest_per_field_scope, companies)
+        ])
+    db.session.commit()
+    errors.writerows(sorted(rejected))
+    return matched
+
+
+def import_scale_tickets(stream, filename, error_stream, company_id=None, batch_size=BATCH_SIZE):
+    # Match scale-ticket rows to truckloads by truckload_id, or by harvest rig,
+    # truck and load date time, and record their yields. Each batch is one
+    # transaction; rejected rows are written to error_stream as CSV.
+    rigs, trucks = _lookup_maps(company_id)
+    company_rig_ids = set(rigs.values()) if company_id else None
+    errors = csv.writer(error_stream)
+    errors.writerow(ERROR_REPORT_HEADER)
+
+    counts = {'rows': 0, 'imported': 0}
+    batch = []
+    for row_number, row in read_rows(stream, filename):
+        counts['rows'] += 1
+        batch.append((row_number, row))
+        if len(batch) >= batch_size:
+            counts['imported'] += _import_batch(batch, rigs, trucks, company_rig_ids, errors)
+            batch = []
+    if batch:
+        counts['imported'] += _import_batch(batch, rigs, trucks, company_rig_ids, errors)
+
+    counts['errors'] = counts['rows'] - counts['imported']
+    return counts
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    # Declare how many SQL statements a view may issue, including the user
+    # loader. Place it below @route so the registered view carries it. Checked
+    # while the profiler is on or QUERY_BUDGET_RAISE is set.
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+class EndpointStats:
+    # Per-endpoint aggregates for this worker process
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.endpoints = {}
+
+    def record(self, endpoint, total_time, query_count, db_time, render_time, slowest_query, slowest_query_time, over_budget):
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                'endpoint': endpoint,
+                'requests': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                'queries': 0,
+                'max_queries': 0,
+                'db_time': 0.0,
+                'render_time': 0.0,
+                'slowest_query': None,
+                'slowest_query_time': 0.0,
+                'over_budget': 0
+            })
+            stats['requests'] += 1
+            stats['total_time'] += total_time
+            stats['max_time'] = max(stats['max_time'], total_time)
+            stats['queries'] += query_count
+            stats['max_queries'] = max(stats['max_queries'], query_count)
+            stats['db_time'] += db_time
+            stats['render_time'] += render_time
+            stats['over_budget'] += int(over_budget)
+            if slowest_query_time > stats['slowest_query_time']:
+                stats['slowest_query'] = slowest_query
+                stats['slowest_query_time'] = slowest_query_time
+
+    def summary(self):
+        with self._lock:
+            rows = []
+            for stats in self.endpoints.values():
+                requests = stats['requests']
+                rows.append(dict(
+                    stats,
+                    avg_time=stats['total_time'] / requests,
+                    avg_queries=stats['queries'] / requests,
+                    avg_db_time=stats['db_time'] / requests,
+                    avg_render_time=stats['render_time'] / requests
+                ))
+        return sorted(rows, key=lambda row: row['total_time'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.endpoints = {}
+
+
+def before_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and conn.info.get('query_start'):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        g.db_time = g.get('db_time', 0.0) + elapsed
+        if elapsed > g.get('slowest_query_time', 0.0):
+            g.slowest_query_time = elapsed
+            g.slowest_query = statement
+
+
+def start_render(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+
+def finish_render(sender, template, context, **extra):
+    if 'render_start' in g:
+        g.render_time = g.get('render_time', 0.0) + time.perf_counter() - g.pop('render_start')
+
+
+def start_request():
+    g.request_start = time.perf_counter()
+
+
+def finish_request(response):
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    count = g.get('query_count', 0)
+    over_budget = budget is not None and count > budget
+    if over_budget:
+        message = f'{request.endpoint} issued {count} queries, budget is {budget}'
+        if current_app.config['QUERY_BUDGET_RAISE']:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    if current_app.config['PROFILE_REQUESTS'] and 'request_start' in g:
+        total_time = time.perf_counter() - g.request_start
+        db_time = g.get('db_time', 0.0)
+        render_time = g.get('render_time', 0.0)
+        current_app.extensions['request_profiler'].record(
+            request.endpoint or 'unmatched',
+            total_time, count, db_time, render_time,
+            g.get('slowest_query'), g.get('slowest_query_time', 0.0),
+            over_budget
+        )
+
+        if current_app.debug:
+            response.headers['X-Query-Count'] = str(count)
+            response.headers['Server-Timing'] = (
+                f'db;dur={db_time * 1000:.1f}, '
+                f'render;dur={render_time * 1000:.1f}, '
+                f'total;dur={total_time * 1000:.1f}'
+            )
+            if budget is not None:
+                response.headers['X-Query-Budget'] = str(budget)
+    return response
+
+
+def init_app(app):
+    # Off unless the profiler is on or budgets raise (development and tests),
+    # since the counters run on every statement
+    if not (app.config['PROFILE_REQUESTS'] or app.config['QUERY_BUDGET_RAISE']):
+        return
+
+    # Engine-wide, so registered once for the app and the admin app
+    if not event.contains(Engine, 'before_cursor_execute', before_query):
+        event.listen(Engine, 'before_cursor_execute', before_query)
+        event.listen(Engine, 'after_cursor_execute', after_query)
+    app.after_request(finish_request)
+
+    if app.config['PROFILE_REQUESTS']:
+        app.extensions['request_profiler'] = EndpointStats()
+        app.before_request(start_request)
+        before_render_template.connect(start_render, app)
+        template_rendered.connect(finish_render, app)
@@ -0,0 +1,270 @@
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app, jsonify, url_for
+from werkzeug.datastructures import MultiDict
+from app.cycle_stats import rebuild_cycle_stats
+from app.exporter import EXPORTS, write_export
+from app.extensions import db
+from app.models import Customer, HarvestRig, Job, Truck, User
+from app.rollups import rebuild_yield_totals
+from app.truckload_listing import parse_filters
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Stale locks and old jobs are looked for this often, in seconds
+MAINTENANCE_INTERVAL = 60
+
+JobType = namedtuple('JobType', 'handler concurrency max_attempts')
+JOB_TYPES = {}
+
+
+def job_type(kind, concurrency=1, max_attempts=3):
+    # Registers handler(payload, job) as the work for jobs of this kind; its
+    # return value is stored as the job's result. A job runs at least once,
+    # and again after a failure or a lost worker, so handlers must be safe to
+    # repeat. concurrency is the default for JOB_CONCURRENCY.
+    def decorator(handler):
+        JOB_TYPES[kind] = JobType(handler, concurrency, max_attempts)
+        return handler
+    return decorator
+
+
+def enqueue(kind, payload=None, user_id=None, company_id=None):
+    # Workers see the job once the caller commits, so it is queued exactly
+    # when the change that asked for it is saved
+    job = Job(
+        kind=kind, payload=json.dumps(payload or {}), status=QUEUED, attempts=0,
+        max_attempts=JOB_TYPES[kind].max_attempts, run_after=datetime.utcnow(),
+        user_id=user_id, company_id=company_id
+    )
+    db.session.add(job)
+    return job
+
+
+def export_dir():
+    path = os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def job_status(job):
+    status = {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'url': url_for('jobs.status', job_id=job.id),
+    }
+    if job.kind == 'export' and job.status == DONE:
+        status['download_url'] = url_for('jobs.download', job_id=job.id)
+    return status
+
+
+def accepted(job):
+    # 202 for a route that queued job and committed; poll the Location
+    return jsonify(job_status(job)), 202, {'Location': url_for('jobs.status', job_id=job.id)}
+
+
+def enqueue_export(name, args, company_id=None, user_id=None):
+    # The export routes' query string is kept as is and parsed again by the
+    # worker, so a background file matches the download exactly
+    payload = {
+        'export': name,
+        'args': {key: value for key, value in args.items() if key != 'background'},
+        'company_id': company_id,
+    }
+    return enqueue('export', payload, user_id=user_id, company_id=company_id)
+
+
+@job_type('rebuild_yield_totals')
+def run_rebuild_yield_totals(payload, job):
+    return {'totals': rebuild_yield_totals()}
+
+
+@job_type('rebuild_cycle_stats')
+def run_rebuild_cycle_stats(payload, job):
+    rigs, trucks = rebuild_cycle_stats()
+    return {'rig_hours': rigs, 'truck_hours': trucks}
+
+
+# Rollups a superadmin can queue from /jobs/rollups/<kind>
+ROLLUPS = ('rebuild_yield_totals', 'rebuild_cycle_stats')
+
+
+@job_type('export', concurrency=2)
+def run_export(payload, job):
+    header, query = EXPORTS[payload['export']]
+    args = MultiDict(payload['args'])
+    statement = query(parse_filters(args), company_id=payload['company_id'])
+    file_format = 'xlsx' if args.get('format') == 'xlsx' else 'csv'
+    filename = f'{job.id}.{file_format}'
+    size = write_export(os.path.join(export_dir(), filename), header, statement, file_format)
+    return {'file': filename, 'name': f"{payload['export']}.{file_format}", 'size': size}
+
+
+@job_type('soft_delete_company', max_attempts=5)
+def run_soft_delete_company(payload, job):
+    # The request has already deleted the company and its users; users added
+    # since are deleted here, and the trucks and rigs they held are freed as
+    # a logout would, all in one commit
+    company = db.session.get(Customer, payload['company_id'], execution_options={'include_deleted': True})
+    if company is None:
+        return {'users': 0, 'trucks': 0, 'rigs': 0}
+    if company.deleted_at is None:
+        company.deleted_at = datetime.utcnow()
+    users = User.query.filter_by(company_id=company.id).all()
+    for user in users:
+        user.deleted_at = company.deleted_at
+    trucks = Truck.query.filter(Truck.company_id == company.id, Truck.current_driver_id.isnot(None)).all()
+    for truck in trucks:
+        truck.current_driver_id = None
+    rigs = HarvestRig.query.filter(HarvestRig.company_id == company.id, HarvestRig.current_operator_id.isnot(None)).all()
+    for rig in rigs:
+        rig.current_operator_id = None
+    db.session.commit()
+    return {'users': len(users), 'trucks': len(trucks), 'rigs': len(rigs)}
+
+
+class Worker:
+    # Runs queued jobs one at a time. Claiming is a single conditional UPDATE
+    # that also checks the kind's running count, so any number of workers
+    # can share the queue and each job starts once per attempt. SQLite
+    # serializes writes, which keeps the count exact; on PostgreSQL claims of
+    # one kind take a transaction-level advisory lock for the same effect.
+
+    def __init__(self, app, name, kinds=None, stopping=None):
+        self.name = name
+        self.kinds = sorted(kinds or JOB_TYPES)
+        self.poll_interval = app.config['JOB_POLL_INTERVAL']
+        self.retry_delay = app.config['JOB_RETRY_DELAY']
+        self.timeout = timedelta(seconds=app.config['JOB_TIMEOUT'])
+        self.retention = timedelta(days=app.config['JOB_RETENTION_DAYS'])
+        self.limits = {kind: app.config['JOB_CONCURRENCY'].get(kind, JOB_TYPES[kind].concurrency) for kind in self.kinds}
+        self.stopping = stopping or threading.Event()
+
+    def _update(self, *criteria, **values):
+        statement = db.update(Job).where(*criteria).values(**values)
+        return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+    def claim(self):
+        # The oldest ready job of each kind, tried oldest first until one is
+        # still queued and its kind has a free slot. Heads other workers took
+        # meanwhile are read again; once they stay the same every kind is full.
+        running = db.aliased(Job)
+        tried = None
+        while True:
+            now = datetime.utcnow()
+            heads = sorted(db.session.execute(
+                db.select(Job.kind, db.func.min(Job.id))
+                .where(Job.status == QUEUED, Job.kind.in_(self.kinds), Job.run_after <= now)
+                .group_by(Job.kind)
+            ).all(), key=lambda head: head[1])
+            if heads == tried:
+                db.session.rollback()
+                return None
+            tried = heads
+
+            for kind, job_id in heads:
+                if db.session.get_bind().dialect.name == 'postgresql':
+                    db.session.execute(db.select(db.func.pg_advisory_xact_lock(db.func.hashtext(f'job:{kind}'))))
+                busy = db.select(db.func.count()).where(running.kind == kind, running.status == RUNNING).scalar_subquery()
+                claimed = self._update(
+                    Job.id == job_id, Job.status == QUEUED, busy < self.limits[kind],
+                    status=RUNNING, locked_by=self.name, locked_at=now, attempts=Job.attempts + 1
+                )
+                db.session.commit()
+                if claimed:
+                    return db.session.get(Job, job_id)
+
+    def process(self, job):
+        job_id, kind, attempts, max_attempts = job.id, job.kind, job.attempts, job.max_attempts
+        mine = (Job.id == job_id, Job.status == RUNNING, Job.locked_by == self.name)
+        try:
+            result = JOB_TYPES[kind].handler(json.loads(job.payload), job)
+            db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            current_app.logger.exception(f'Job {job_id} ({kind}) failed, attempt {attempts} of {max_attempts}')
+            now = datetime.utcnow()
+            if attempts < max_attempts:
+                self._update(
+                    *mine, status=QUEUED, locked_by=None, locked_at=None, error=repr(error),
+                    run_after=now + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+                )
+            else:
+                self._update(*mine, status=FAILED, error=repr(error), finished_at=now)
+        else:
+            # A worker that outlived JOB_TIMEOUT no longer owns the job and
+            # leaves it to the one that took it over
+            self._update(*mine, status=DONE, result=json.dumps(result), error=None, finished_at=datetime.utcnow())
+        db.session.commit()
+
+    def recover(self):
+        # Jobs whose worker died mid-run count the attempt and go back on the queue
+        now = datetime.utcnow()
+        stale = (Job.status == RUNNING, Job.locked_at < now - self.timeout)
+        self._update(*stale, Job.attempts >= Job.max_attempts, status=FAILED, error='Timed out', finished_at=now)
+        self._update(*stale, status=QUEUED, locked_by=None, locked_at=None, error='Timed out', run_after=now)
+        db.session.commit()
+
+    def prune(self):
+        # Finished jobs past retention, with any file they left behind
+        finished = (Job.status.in_((DONE, FAILED)), Job.finished_at < datetime.utcnow() - self.retention)
+        for (result,) in db.session.execute(db.select(Job.result).where(*finished, Job.kind == 'export', Job.status == DONE)):
+            try:
+                os.remove(os.path.join(export_dir(), json.loads(result)['file']))
+            except (FileNotFoundError, TypeError, KeyError, ValueError):
+                pass
+        db.session.execute(db.delete(Job).where(*finished).execution_options(synchronize_session=False))
+        db.session.commit()
+
+    def run(self, once=False):
+        # With once, returns when no job is ready instead of waiting for more
+        last_maintenance = None
+        while not self.stopping.is_set():
+            if last_maintenance is None or time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                self.recover()
+                self.prune()
+                last_maintenance = time.monotonic()
+
+            job = self.claim()
+            if job is not None:
+                self.process(job)
+            elif once:
+                return
+            else:
+                self.stopping.wait(self.poll_interval)
+
+
+def run_workers(app, threads=1, kinds=None, once=False):
+    # threads workers in this process, each with its own app context and
+    # session. SIGTERM or Ctrl-C lets running jobs finish, then returns.
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopping.set())
+
+    def work(index):
+        with app.app_context():
+            Worker(app, f'{socket.gethostname()}:{os.getpid()}:{index}', kinds, stopping).run(once)
+
+    workers = [threading.Thread(target=work, args=(index,), name=f'job-worker-{index}') for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    # Joined in steps so the main thread keeps handling signals
+    while any(worker.is_alive() for worker in workers):
+        for worker in workers:
+            worker.join(0.5)
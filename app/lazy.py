@@ -0,0 +1,58 @@
+import threading
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import RequestRedirect
+
+ADMIN_PREFIX = '/admin'
+
+
+class LazySetup:
+    # Runs setup once, on the first request, before handing requests on
+
+    def __init__(self, wsgi_app, setup):
+        self.wsgi_app = wsgi_app
+        self._setup = setup
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if self._setup is not None:
+            with self._lock:
+                if self._setup is not None:
+                    self._setup()
+                    self._setup = None
+        return self.wsgi_app(environ, start_response)
+
+
+class LazyAdmin:
+    # Sends /admin requests the main app has no route for to the Flask-Admin
+    # app, which is only imported and built when the first one arrives
+
+    def __init__(self, wsgi_app, app, factory):
+        self.wsgi_app = wsgi_app
+        self.app = app
+        self._factory = factory
+        self._admin_app = None
+        self._lock = threading.Lock()
+
+    def _is_admin_request(self, environ):
+        path = environ.get('PATH_INFO', '')
+        if path != ADMIN_PREFIX and not path.startswith(ADMIN_PREFIX + '/'):
+            return False
+        try:
+            self.app.url_map.bind_to_environ(environ).match()
+        except NotFound:
+            return True
+        except (MethodNotAllowed, RequestRedirect):
+            pass
+        return False
+
+    def admin_app(self):
+        if self._admin_app is None:
+            with self._lock:
+                if self._admin_app is None:
+                    self._admin_app = self._factory()
+        return self._admin_app
+
+    def __call__(self, environ, start_response):
+        if self._is_admin_request(environ):
+            return self.admin_app().wsgi_app(environ, start_response)
+        return self.wsgi_app(environ, start_response)
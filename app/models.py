@@ -3,6 +3,10 @@ from flask_login import UserMixin
 from sqlalchemy.orm import validates
 from app.extensions import db, bcrypt
 from werkzeug.security import generate_password_hash, check_password_hash
+
+# Partial index condition for tables whose queries skip soft-deleted rows
+LIVE_ROWS = db.text('deleted_at IS NULL')
+
 class TimestampMixin:
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -15,6 +19,26 @@ class TimestampMixin:
             if isinstance(instance, TimestampMixin):
                 instance.updated_at = datetime.utcnow()
 
+    @staticmethod
+    @db.event.listens_for(db.session, 'do_orm_execute')
+    def receive_do_orm_execute(execute_state):
+        # Leave soft-deleted rows out of every query whose primary entity uses
+        # this mixin. Joined tables and related objects are not filtered, so a
+        # load still shows its truck or driver after they are deleted. Opt out
+        # with .execution_options(include_deleted=True).
+        if (
+            not execute_state.is_select
+            or execute_state.is_column_load
+            or execute_state.is_relationship_load
+            or execute_state.execution_options.get('include_deleted', False)
+        ):
+            return
+        mapper = execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, TimestampMixin):
+            execute_state.statement = execute_state.statement.options(db.with_loader_criteria(
+                mapper.class_, lambda cls: cls.deleted_at.is_(None), propagate_to_loaders=False
+            ))
+
     def soft_delete(self):
         self.deleted_at = datetime.utcnow()
         db.session.commit()
@@ -43,9 +67,12 @@ class Customer(TimestampMixin, db.Model):
     users = db.relationship('User', backref='customer', lazy=True)
 
     def soft_delete(self):
-        super().soft_delete()
+        # The company and its users in one commit
+        self.deleted_at = datetime.utcnow()
         for user in self.users:
-            user.soft_delete()
+            if user.deleted_at is None:
+                user.deleted_at = self.deleted_at
+        db.session.commit()
 
 class Farm(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -62,13 +89,24 @@ class FarmField(TimestampMixin, db.Model):
     name = db.Column(db.String(80), nullable=False)
     acreage = db.Column(db.String(80), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_farm_field_live_farm_id', 'farm_id', sqlite_where=LIVE_ROWS, postgresql_where=LIVE_ROWS),
+    )
+
 class Harvest(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
     farm_id = db.Column(db.Integer, db.ForeignKey('farm.id'), nullable=False)
     date = db.Column(db.DateTime, nullable=False)
+    # Set once the harvest's loads, yields and totals have moved to the
+    # archive tables, see app/archive.py
+    archived_at = db.Column(db.DateTime)
     fields = db.relationship('HarvestPerField', backref='harvest', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_harvest_live_farm_id', 'farm_id', sqlite_where=LIVE_ROWS, postgresql_where=LIVE_ROWS),
+    )
+
 class HarvestPerField(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     harvest_id = db.Column(db.Integer, db.ForeignKey('harvest.id'), nullable=False)
@@ -76,6 +114,64 @@ class HarvestPerField(TimestampMixin, db.Model):
     yield_amount = db.Column(db.Float, nullable=False)
     yield_type = db.Column(db.String(80), nullable=False)
 
+    __table_args__ = (
+        # Yield tables, one row per load
+        db.Index('ix_harvest_per_field_live_harvest_field', 'harvest_id', 'field_id', sqlite_where=LIVE_ROWS, postgresql_where=LIVE_ROWS),
+    )
+
+class HarvestYieldTotal(db.Model):
+    # Running truckload yield per harvest, field and normalized unit, kept in
+    # step with Truckload by app/rollups.py
+    harvest_id = db.Column(db.Integer, db.ForeignKey('harvest.id'), primary_key=True)
+    field_id = db.Column(db.Integer, db.ForeignKey('farm_field.id'), primary_key=True)
+    yield_unit = db.Column(db.String(80), primary_key=True)
+    yield_amount = db.Column(db.Float, nullable=False, default=0)
+    load_count = db.Column(db.Integer, nullable=False, default=0)
+
+class HarvestPerFieldArchive(db.Model):
+    # HarvestPerField rows of archived harvests, column for column
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    deleted_at = db.Column(db.DateTime)
+    harvest_id = db.Column(db.Integer, db.ForeignKey('harvest.id'), nullable=False)
+    field_id = db.Column(db.Integer, db.ForeignKey('farm_field.id'), nullable=False)
+    yield_amount = db.Column(db.Float, nullable=False)
+    yield_type = db.Column(db.String(80), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_harvest_per_field_archive_harvest_field', 'harvest_id', 'field_id'),
+    )
+
+class HarvestYieldTotalArchive(db.Model):
+    # HarvestYieldTotal of archived harvests' loads
+    harvest_id = db.Column(db.Integer, db.ForeignKey('harvest.id'), primary_key=True)
+    field_id = db.Column(db.Integer, db.ForeignKey('farm_field.id'), primary_key=True)
+    yield_unit = db.Column(db.String(80), primary_key=True)
+    yield_amount = db.Column(db.Float, nullable=False, default=0)
+    load_count = db.Column(db.Integer, nullable=False, default=0)
+
+class RigHourlyStat(db.Model):
+    # Finished loads per harvest rig and hour of loading, with the idle gaps
+    # before them; kept in step with Truckload by app/cycle_stats.py
+    harvest_rig_id = db.Column(db.Integer, db.ForeignKey('harvest_rig.id'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    load_count = db.Column(db.Integer, nullable=False, default=0)
+    gap_count = db.Column(db.Integer, nullable=False, default=0)
+    gap_seconds = db.Column(db.Float, nullable=False, default=0)
+    max_gap_seconds = db.Column(db.Float, nullable=False, default=0)
+
+class TruckHourlyStat(db.Model):
+    # Finished trips (load to unload) per truck and hour of loading, with the
+    # turnaround from the previous unload; see app/cycle_stats.py
+    truck_id = db.Column(db.Integer, db.ForeignKey('truck.id'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    trip_count = db.Column(db.Integer, nullable=False, default=0)
+    trip_seconds = db.Column(db.Float, nullable=False, default=0)
+    turnaround_count = db.Column(db.Integer, nullable=False, default=0)
+    turnaround_seconds = db.Column(db.Float, nullable=False, default=0)
+    max_turnaround_seconds = db.Column(db.Float, nullable=False, default=0)
+
 class Truck(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -95,8 +191,86 @@ class HarvestRig(TimestampMixin, db.Model):
     current_operator = db.relationship('User', backref='current_harvest_rig', lazy=True)
 
 class Truckload(TimestampMixin, db.Model):
+    # Columns the flush hooks compare before and after are active_history
+    # (deleted_at is redeclared from TimestampMixin for it): the old value is
+    # loaded before a set, also when a commit has expired it
     id = db.Column(db.Integer, primary_key=True)
-    load_date_time = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    load_date_time = db.column_property(db.Column(db.DateTime, default=datetime.utcnow, nullable=False), active_history=True)
+    unload_date_time = db.column_property(db.Column(db.DateTime), active_history=True)
+    harvest_rig_id = db.column_property(db.Column(db.Integer, db.ForeignKey('harvest_rig.id'), nullable=False), active_history=True)
+    operator_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    truck_id = db.column_property(db.Column(db.Integer, db.ForeignKey('truck.id'), nullable=False), active_history=True)
+    trucker_id = db.column_property(db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False), active_history=True)
+    field_id = db.column_property(db.Column(db.Integer, db.ForeignKey('farm_field.id'), nullable=False), active_history=True)
+    harvest_id = db.column_property(db.Column(db.Integer, db.ForeignKey('harvest.id'), nullable=False), active_history=True)
+    yield_amount = db.column_property(db.Column(db.Float), active_history=True)
+    yield_type = db.column_property(db.Column(db.String(80)), active_history=True)
+    deleted_at = db.column_property(db.Column(db.DateTime), active_history=True)
+    trucker_confirmation = db.Column(db.Integer, nullable=False) # 0: not confirmed, 1: confirmed
+
+    harvest_rig = db.relationship('HarvestRig', backref='truckloads', lazy=True)
+    operator = db.relationship('User', foreign_keys=[operator_id], backref='operator_truckloads', lazy=True)
+    truck = db.relationship('Truck', backref='truckloads', lazy=True)
+    trucker = db.relationship('User', foreign_keys=[trucker_id], backref='trucker_truckloads', lazy=True)
+    field = db.relationship('FarmField', backref='truckloads', lazy=True)
+    harvest = db.relationship('Harvest', backref='truckloads', lazy=True)
+
+    @classmethod
+    def unfinished(cls):
+        # Still waiting for the trucker or a yield; an operator has at most one
+        # such load at a time
+        return db.or_(cls.trucker_confirmation == 0, cls.yield_amount.is_(None), cls.yield_type.is_(None))
+
+    @classmethod
+    def query_with_relations(cls, truckloads=None):
+        # Every truckload table shows the rig, truck, people, field and harvest
+        # names; join them into the same SELECT instead of one lazy load per row.
+        # truckloads is an alias of this class to query instead, see
+        # app/archive.py.
+        truckloads = truckloads or cls
+        return db.session.query(truckloads).options(
+            db.joinedload(truckloads.harvest_rig),
+            db.joinedload(truckloads.operator),
+            db.joinedload(truckloads.truck),
+            db.joinedload(truckloads.trucker),
+            db.joinedload(truckloads.field),
+            db.joinedload(truckloads.harvest)
+        )
+
+    __table_args__ = (
+        # Operator's unfinished load (operator truckload page, rig selection)
+        db.Index(
+            'ix_truckload_operator_open', 'operator_id',
+            sqlite_where=db.text('trucker_confirmation = 0 OR yield_amount IS NULL OR yield_type IS NULL'),
+            postgresql_where=db.text('trucker_confirmation = 0 OR yield_amount IS NULL OR yield_type IS NULL')
+        ),
+        # Trucker's pending confirmation poll
+        db.Index('ix_truckload_trucker_status', 'trucker_id', 'trucker_confirmation'),
+        # Loads still waiting for a yield (office and trucker yield entry)
+        db.Index(
+            'ix_truckload_pending_yield', 'trucker_id',
+            sqlite_where=db.text('yield_amount IS NULL AND yield_type IS NULL'),
+            postgresql_where=db.text('yield_amount IS NULL AND yield_type IS NULL')
+        ),
+        # Keyset pagination of the truckload tables, newest first
+        db.Index('ix_truckload_live_load_date_time_id', 'load_date_time', 'id', sqlite_where=LIVE_ROWS, postgresql_where=LIVE_ROWS),
+        # Matching scale tickets to loads on import
+        db.Index('ix_truckload_ticket', 'harvest_rig_id', 'truck_id', 'load_date_time'),
+        # A rig's and a truck's previous load (cycle statistics)
+        db.Index('ix_truckload_live_rig_load', 'harvest_rig_id', 'load_date_time', sqlite_where=LIVE_ROWS, postgresql_where=LIVE_ROWS),
+        db.Index('ix_truckload_live_truck_load', 'truck_id', 'load_date_time', sqlite_where=LIVE_ROWS, postgresql_where=LIVE_ROWS),
+        # Operator's latest truckload (form defaults)
+        db.Index('ix_truckload_operator_id', 'operator_id', 'id'),
+    )
+
+class TruckloadArchive(db.Model):
+    # Truckloads of archived harvests, column for column; read together with
+    # Truckload only by reports that reach back into archived seasons
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    deleted_at = db.Column(db.DateTime)
+    load_date_time = db.Column(db.DateTime, nullable=False)
     unload_date_time = db.Column(db.DateTime)
     harvest_rig_id = db.Column(db.Integer, db.ForeignKey('harvest_rig.id'), nullable=False)
     operator_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -106,11 +280,64 @@ class Truckload(TimestampMixin, db.Model):
     harvest_id = db.Column(db.Integer, db.ForeignKey('harvest.id'), nullable=False)
     yield_amount = db.Column(db.Float)
     yield_type = db.Column(db.String(80))
-    trucker_confirmation = db.Column(db.Integer, nullable=False) # 0: not confirmed, 1: confirmed
+    trucker_confirmation = db.Column(db.Integer, nullable=False)
 
-    harvest_rig = db.relationship('HarvestRig', backref='truckloads', lazy=True)
-    operator = db.relationship('User', foreign_keys=[operator_id], backref='operator_truckloads', lazy=True)
-    truck = db.relationship('Truck', backref='truckloads', lazy=True)
-    trucker = db.relationship('User', foreign_keys=[trucker_id], backref='trucker_truckloads', lazy=True)
-    field = db.relationship('FarmField', backref='truckloads', lazy=True)
-    harvest = db.relationship('Harvest', backref='truckloads', lazy=True)
\ No newline at end of file
+    __table_args__ = (
+        # Date ranges of the reports, and the archive's oldest and newest load
+        db.Index('ix_truckload_archive_load_date_time_id', 'load_date_time', 'id'),
+        db.Index('ix_truckload_archive_harvest_id', 'harvest_id'),
+    )
+
+class Event(db.Model):
+    # Outbox for the live-update channel, see app/events.py
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(80), nullable=False)
+    name = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_event_channel_id', 'channel', 'id'),
+    )
+
+class DataVersion(db.Model):
+    # Change counters that caches compare against, see app/versions.py
+    scope = db.Column(db.String(80), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class SyncEvent(db.Model):
+    # Idempotency keys of lifecycle events already applied through /api/sync
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    truckload_id = db.Column(db.Integer)
+    occurred_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_sync_event_user_key'),
+    )
+
+class Job(db.Model):
+    # Durable queue of background work run by `flask run-jobs`, see app/jobs.py
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = db.Column(db.String(120))
+    locked_at = db.Column(db.DateTime)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    company_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Next job of each kind, and how many of a kind are running
+        db.Index('ix_job_status_kind_id', 'status', 'kind', 'id'),
+    )
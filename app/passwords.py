@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from app.extensions import bcrypt, db
+
+
+class HasherBusy(RuntimeError):
+    pass
+
+
+def hash_rounds(password_hash):
+    # '$2b$12$<salt+digest>' -> 12
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _check(password_hash, password, rounds):
+    # Verify, and when the hash was made with another cost, hash the password
+    # again while it is at hand; returns (verified, new hash or None)
+    if not bcrypt.check_password_hash(password_hash, password):
+        return False, None
+    if hash_rounds(password_hash) == rounds:
+        return True, None
+    return True, bcrypt.generate_password_hash(password, rounds).decode('utf-8')
+
+
+class PasswordHasher:
+    # Login hashing on a few dedicated threads. bcrypt releases the GIL, so
+    # other requests keep being served while hashes are computed, and a burst
+    # of sign-ins can use at most `workers` cores. Beyond `queue` waiting
+    # logins new ones are turned away instead of piling up.
+
+    def __init__(self, app):
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE'])
+
+    def check(self, password_hash, password):
+        if self._executor is None:
+            return _check(password_hash, password, self.rounds)
+
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        future = self._executor.submit(_check, password_hash, password, self.rounds)
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Nobody is waiting for it any more; skip it if it has not started
+            future.cancel()
+            raise HasherBusy()
+
+
+def init_app(app):
+    app.extensions['password_hasher'] = PasswordHasher(app)
+
+
+def check_password(user, password):
+    # Returns whether the password is right, upgrading the stored hash to the
+    # configured cost when it is; raises HasherBusy when the pool is full
+    password_hash = user.password_hash
+    if not password_hash:
+        return False
+
+    # Hand the connection back to the pool for the duration of the hash. At a
+    # shift change dozens of logins wait here, and holding a connection each
+    # would leave none for the rest of the requests.
+    db.session.close()
+    verified, new_hash = current_app.extensions['password_hasher'].check(password_hash, password)
+    if new_hash:
+        db.session.add(user)
+        user.password_hash = new_hash
+        db.session.commit()
+    return verified
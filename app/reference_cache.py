@@ -0,0 +1,57 @@
+import threading
+from flask import current_app
+from app.extensions import db
+from app.models import Farm, FarmField, Harvest, Truck, HarvestRig, User
+from app.versions import reference_scope, current_versions
+
+
+def _load(company_id):
+    company_farm_ids = db.select(Farm.id).where(Farm.company_id == company_id)
+    harvests = Harvest.query.filter(Harvest.farm_id.in_(company_farm_ids)).all()
+    fields = FarmField.query.filter(FarmField.farm_id.in_(company_farm_ids)).all()
+    trucks = Truck.query.filter(Truck.company_id == company_id, Truck.current_driver_id.isnot(None)).all()
+    harvest_rigs = HarvestRig.query.filter_by(company_id=company_id).all()
+    users = User.query.filter_by(company_id=company_id).all()
+
+    # Plain values only, so nothing cached is tied to the session that loaded it
+    return {
+        'harvests': [{'id': harvest.id, 'name': harvest.name, 'farm_id': harvest.farm_id} for harvest in harvests],
+        'fields': [{'id': field.id, 'name': field.name, 'farm_id': field.farm_id, 'acreage': field.acreage} for field in fields],
+        'trucks': [{'id': truck.id, 'name': truck.name, 'current_driver_id': truck.current_driver_id} for truck in trucks],
+        'harvest_rigs': [
+            {'id': rig.id, 'name': rig.name, 'current_operator_id': rig.current_operator_id}
+            for rig in harvest_rigs
+        ],
+        'truckers': [{'id': user.id, 'username': user.username} for user in users]
+    }
+
+
+class ReferenceCache:
+    # Per-company reference data for this worker. Entries are tagged with the
+    # company's reference version, which every write to those tables bumps in
+    # the same transaction, so one version read tells whether an entry is current.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, company_id):
+        scope = reference_scope(company_id)
+        version = current_versions(scope)[scope]
+        with self._lock:
+            entry = self._entries.get(company_id)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        data = _load(company_id)
+        with self._lock:
+            self._entries[company_id] = (version, data)
+        return data
+
+
+def init_app(app):
+    app.extensions['reference_cache'] = ReferenceCache()
+
+
+def company_reference_data(company_id):
+    return current_app.extensions['reference_cache'].get(company_id)
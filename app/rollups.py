@@ -0,0 +1,168 @@
+from collections import defaultdict
+from sqlalchemy import inspect
+from app.database import upsert_insert
+from app.extensions import db
+from app.models import Customer, HarvestYieldTotal, Truckload
+from app.versions import bump, company_scopes, harvest_per_field_scope, yield_scope
+
+# Units are summed in a common base where a fixed conversion exists. Bushels
+# depend on the crop's test weight, so they stay a unit of their own.
+UNIT_CONVERSIONS = {
+    'bushels': ('bushels', 1),
+    'pounds': ('pounds', 1),
+    'tons': ('pounds', 2000),
+}
+
+
+def normalize_yield(yield_amount, yield_type):
+    unit = (yield_type or '').strip().lower()
+    base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, 1))
+    return base_unit, yield_amount * factor
+
+
+def yield_contribution(harvest_id, field_id, yield_amount, yield_type, deleted_at=None):
+    # ((harvest_id, field_id, unit), amount) a truckload adds to the totals, if any
+    if deleted_at is not None or yield_amount in (None, '') or not (yield_type or '').strip():
+        return None
+    try:
+        base_unit, amount = normalize_yield(float(yield_amount), yield_type)
+        return (int(harvest_id), int(field_id), base_unit), amount
+    except (TypeError, ValueError):
+        return None
+
+
+def _values(truckload, current):
+    # Column values after (current) or before this flush
+    state = inspect(truckload)
+    values = []
+    for name in ('harvest_id', 'field_id', 'yield_amount', 'yield_type', 'deleted_at'):
+        history = state.attrs[name].history
+        if current:
+            value = history.added[0] if history.added else None
+        else:
+            value = history.deleted[0] if history.deleted else None
+        if not history.added and not history.deleted:
+            value = history.unchanged[0] if history.unchanged else getattr(truckload, name)
+        values.append(value)
+    return values
+
+
+def add_to_total(session, key, amount, count, table=HarvestYieldTotal.__table__):
+    # Adds to the total at key of table (HarvestYieldTotal or its archive),
+    # creating it if need be
+    harvest_id, field_id, yield_unit = key
+    insert = upsert_insert(session, table)
+    if insert is not None:
+        statement = insert.values(
+            harvest_id=harvest_id, field_id=field_id, yield_unit=yield_unit,
+            yield_amount=amount, load_count=count
+        )
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['harvest_id', 'field_id', 'yield_unit'],
+            set_={
+                'yield_amount': table.c.yield_amount + statement.excluded.yield_amount,
+                'load_count': table.c.load_count + statement.excluded.load_count
+            }
+        ))
+        return
+
+    updated = session.execute(table.update().where(
+        table.c.harvest_id == harvest_id,
+        table.c.field_id == field_id,
+        table.c.yield_unit == yield_unit
+    ).values(
+        yield_amount=table.c.yield_amount + amount,
+        load_count=table.c.load_count + count
+    ))
+    if updated.rowcount == 0:
+        session.execute(table.insert().values(
+            harvest_id=harvest_id, field_id=field_id, yield_unit=yield_unit,
+            yield_amount=amount, load_count=count
+        ))
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def track_yield_totals(session, flush_context, instances):
+    # Every truckload insert, yield edit, reassignment or delete adjusts the
+    # totals with an in-place increment, inside the same transaction
+    deltas = defaultdict(lambda: [0.0, 0])
+
+    def add(contribution, sign):
+        if contribution:
+            key, amount = contribution
+            deltas[key][0] += sign * amount
+            deltas[key][1] += sign
+
+    for truckload in session.new:
+        if isinstance(truckload, Truckload):
+            add(yield_contribution(*_values(truckload, current=True)), 1)
+    for truckload in session.dirty:
+        if isinstance(truckload, Truckload) and session.is_modified(truckload):
+            add(yield_contribution(*_values(truckload, current=False)), -1)
+            add(yield_contribution(*_values(truckload, current=True)), 1)
+    for truckload in session.deleted:
+        if isinstance(truckload, Truckload):
+            add(yield_contribution(*_values(truckload, current=False)), -1)
+
+    apply_yield_deltas(session, deltas)
+
+
+def apply_yield_deltas(session, deltas):
+    # deltas: {(harvest_id, field_id, unit): [amount, load_count]}. Used directly
+    # by bulk paths that write truckloads with Core statements.
+    table = HarvestYieldTotal.__table__
+    for key, (amount, count) in deltas.items():
+        if amount or count:
+            add_to_total(session, key, amount, count)
+        if count < 0:
+            harvest_id, field_id, yield_unit = key
+            session.execute(table.delete().where(
+                table.c.harvest_id == harvest_id,
+                table.c.field_id == field_id,
+                table.c.yield_unit == yield_unit,
+                table.c.load_count <= 0
+            ))
+
+
+def yield_totals(*criteria):
+    # {(harvest_id, field_id, yield_unit): HarvestYieldTotal} in one query
+    totals = HarvestYieldTotal.query.filter(*criteria).all()
+    return {(total.harvest_id, total.field_id, total.yield_unit): total for total in totals}
+
+
+def rebuild_yield_totals():
+    # Recompute every total from Truckload with a single INSERT ... SELECT.
+    # Core statements skip the flush hooks, so the pages showing totals are
+    # invalidated here, for every company.
+    unit = db.func.lower(db.func.trim(Truckload.yield_type))
+    base_unit = db.case(
+        {name: base for name, (base, factor) in UNIT_CONVERSIONS.items()},
+        value=unit, else_=unit
+    )
+    factor = db.case(
+        {name: factor for name, (base, factor) in UNIT_CONVERSIONS.items()},
+        value=unit, else_=1
+    )
+    totals = db.select(
+        Truckload.harvest_id,
+        Truckload.field_id,
+        base_unit,
+        db.func.sum(Truckload.yield_amount * factor),
+        db.func.count()
+    ).where(
+        Truckload.yield_amount.isnot(None),
+        unit != '',
+        Truckload.deleted_at.is_(None)
+    ).group_by(Truckload.harvest_id, Truckload.field_id, base_unit)
+
+    db.session.execute(HarvestYieldTotal.__table__.delete())
+    db.session.execute(HarvestYieldTotal.__table__.insert().from_select(
+        ['harvest_id', 'field_id', 'yield_unit', 'yield_amount', 'load_count'], totals
+    ))
+    companies = db.session.scalars(db.select(Customer.id).execution_options(include_deleted=True)).all()
+    bump(db.session, [
+        *company_scopes(yield_scope, companies),
+        *company_scopes(harvest_per_field_scope, companies)
+    ])
+    db.session.commit()
+    return HarvestYieldTotal.query.count()
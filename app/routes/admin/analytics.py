@@ -0,0 +1,37 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
+from flask_login import login_required, current_user
+from app.models import Customer
+from app.analytics import company_analytics, parse_season
+from app.reference_cache import company_reference_data
+
+admin_analytics_bp = Blueprint('admin_analytics_bp', __name__)
+
+@admin_analytics_bp.route('/admin/analytics')
+@login_required
+def index():
+    if current_user.permission != 0:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    companies = Customer.query.filter(Customer.status == 'active').order_by(Customer.name).all()
+    company_id = request.args.get('company_id', type=int) or (companies[0].id if companies else None)
+    harvest_id = request.args.get('harvest_id', type=int)
+    season = parse_season(request.args)
+
+    analytics = company_analytics(company_id, harvest_id, season) if company_id else None
+    harvests = company_reference_data(company_id)['harvests'] if company_id else []
+    return render_template('admin/analytics.html', current_user=current_user, analytics=analytics, companies=companies, company_id=company_id, harvests=harvests, harvest_id=harvest_id, season=season)
+
+@admin_analytics_bp.route('/admin/analytics.json')
+@login_required
+def data():
+    if current_user.permission != 0:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    company_id = request.args.get('company_id', type=int)
+    if not company_id:
+        return jsonify({'error': 'company_id is required'}), 400
+
+    harvest_id = request.args.get('harvest_id', type=int)
+    season = parse_season(request.args)
+    return jsonify(company_analytics(company_id, harvest_id, season))
@@ -1,7 +1,10 @@
+from datetime import datetime
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
-from app.models import Customer
+from app.conditional import conditional, all_reference_scopes
+from app.models import Customer, User
 from app.extensions import db
+from app.jobs import enqueue
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SubmitField
 from wtforms.validators import DataRequired
@@ -17,11 +20,12 @@ admin_company_bp = Blueprint('company', __name__, url_prefix='/admin/company')
 
 @admin_company_bp.route('/')
 @login_required
+@conditional(all_reference_scopes)
 def index():
     if current_user.permission != 0:
         flash('Unauthorized access', 'danger')
         return redirect(url_for('authentication.login'))
-    children = Customer.query.filter(Customer.deleted_at == None).all()
+    children = Customer.query.all()
     form = CompanyForm()  # Create instance of form to pass CSRF token
     return render_template('admin/company.html', current_user=current_user, children=children, form=form)
 
@@ -39,7 +43,7 @@ def add_company():
         status = form.status.data
 
         # Check for existing company with the same name that is not soft deleted
-        existing_company = Customer.query.filter_by(name=name, deleted_at=None).first()
+        existing_company = Customer.query.filter_by(name=name).first()
         if existing_company:
             flash('Company with this name already exists!', 'danger')
         else:
@@ -68,7 +72,7 @@ def edit_company(company_id):
         status = form.status.data
 
         # Check for existing company with the same name that is not soft deleted
-        existing_company = Customer.query.filter(Customer.name == name, Customer.id != company_id, Customer.deleted_at == None).first()
+        existing_company = Customer.query.filter(Customer.name == name, Customer.id != company_id).first()
         if existing_company:
             flash('Another company with this name already exists!', 'danger')
         else:
@@ -91,7 +95,17 @@ def delete_company(company_id):
 
     company = Customer.query.get(company_id)
     if company:
-        company.soft_delete()  # Soft delete the company
+        # The company and its users are gone at once, so nobody of it can sign
+        # in or stay signed in; one UPDATE, however many users it has. Freeing
+        # the trucks and rigs they held is left to a background job.
+        company.deleted_at = datetime.utcnow()
+        db.session.execute(
+            db.update(User)
+            .where(User.company_id == company.id, User.deleted_at.is_(None))
+            .values(deleted_at=company.deleted_at)
+            .execution_options(synchronize_session=False)
+        )
+        enqueue('soft_delete_company', {'company_id': company.id}, user_id=current_user.id)
         db.session.commit()
         flash('Company deleted successfully', 'success')
         print(f"Company {company_id} soft deleted.")
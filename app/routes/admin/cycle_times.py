@@ -0,0 +1,32 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
+from flask_login import login_required, current_user
+from app.models import Customer
+from app.cycle_stats import company_cycle_stats
+from app.routes.auth.cycle_times import window_hours
+
+admin_cycle_times_bp = Blueprint('admin_cycle_times_bp', __name__)
+
+@admin_cycle_times_bp.route('/admin/cycle_times')
+@login_required
+def index():
+    if current_user.permission != 0:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    companies = Customer.query.filter(Customer.status == 'active').order_by(Customer.name).all()
+    company_id = request.args.get('company_id', type=int) or (companies[0].id if companies else None)
+    hours = window_hours()
+    stats = company_cycle_stats(company_id, hours) if company_id else None
+    return render_template('admin/cycle_times.html', current_user=current_user, stats=stats, companies=companies, company_id=company_id, hours=hours)
+
+@admin_cycle_times_bp.route('/admin/cycle_times.json')
+@login_required
+def data():
+    if current_user.permission != 0:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    company_id = request.args.get('company_id', type=int)
+    if not company_id:
+        return jsonify({'error': 'company_id is required'}), 400
+
+    return jsonify(company_cycle_stats(company_id, window_hours()))
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, all_reference_scopes
 from app.models import FarmField, Farm, Customer
 from app.extensions import db, bcrypt
 
@@ -8,13 +9,14 @@ admin_field_bp = Blueprint('admin_field_bp', __name__)
 
 @admin_field_bp.route('/admin/field')
 @login_required
+@conditional(all_reference_scopes)
 def index():
     if current_user.permission != 0:  # Suppose 0 and 1 are permissions for superadmin and admin
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.deleted_at == None, Customer.status == 'active').all()]
-    children_2 = Farm.query.join(Customer, Customer.status == "active").filter(Farm.deleted_at == None, Farm.company_id.in_(active_customer_ids)).all()
+    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.status == 'active').all()]
+    children_2 = Farm.query.join(Customer, Customer.status == "active").filter(Farm.company_id.in_(active_customer_ids)).all()
     active_farm_ids = [farm.id for farm in children_2]
     children_1 = FarmField.query.filter(FarmField.farm_id.in_(active_farm_ids)).all()
     
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, all_reference_scopes
 from app.models import Harvest, Farm, Customer
 from app.extensions import db
 from datetime import datetime
@@ -8,13 +9,14 @@ admin_harvest_bp = Blueprint('admin_harvest_bp', __name__)
 
 @admin_harvest_bp.route('/admin/harvest')
 @login_required
+@conditional(all_reference_scopes)
 def index():
     if current_user.permission != 0:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.deleted_at == None, Customer.status == 'active').all()]
-    farms = Farm.query.join(Customer, Customer.status == "active").filter(Farm.deleted_at == None, Farm.company_id.in_(active_customer_ids)).all()
+    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.status == 'active').all()]
+    farms = Farm.query.join(Customer, Customer.status == "active").filter(Farm.company_id.in_(active_customer_ids)).all()
     active_farm_ids = [farm.id for farm in farms]
     harvests = Harvest.query.filter(Harvest.farm_id.in_(active_farm_ids)).all()
     
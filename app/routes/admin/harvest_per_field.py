@@ -1,18 +1,24 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
 from flask_login import login_required, current_user
-from app.models import HarvestPerField, Harvest, FarmField, Customer, Farm
+from app.conditional import conditional, all_yield_scopes
+from app.models import HarvestPerField, HarvestYieldTotal, Harvest, FarmField, Customer, Farm
 from app.extensions import db
+from app.rollups import yield_totals
+from app.truckload_listing import parse_filters
+from app.exporter import YIELD_HEADER, yield_export_query, export_response
+from app.jobs import accepted, enqueue_export
 
 admin_harvest_per_field_bp = Blueprint('admin_harvest_per_field_bp', __name__)
 
 @admin_harvest_per_field_bp.route('/admin/harvest_per_field')
 @login_required
+@conditional(all_yield_scopes)
 def index():
     if current_user.permission != 0: 
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
-    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.deleted_at == None, Customer.status == 'active').all()]
-    farms = Farm.query.join(Customer, Customer.status == "active").filter(Farm.deleted_at == None, Farm.company_id.in_(active_customer_ids)).all()
+    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.status == 'active').all()]
+    farms = Farm.query.join(Customer, Customer.status == "active").filter(Farm.company_id.in_(active_customer_ids)).all()
     active_farm_ids = [farm.id for farm in farms]
     farm_fields = FarmField.query.filter(FarmField.farm_id.in_(active_farm_ids)).all()
     active_farm_fields = [field.id for field in farm_fields]
@@ -23,8 +29,25 @@ def index():
     # Create dictionaries to map harvest_id and field_id to their names
     harvest_map = {harvest.id: harvest.name for harvest in harvests}
     field_map = {field.id: field.name for field in farm_fields}
+    totals = yield_totals(HarvestYieldTotal.field_id.in_(active_farm_fields))
     
-    return render_template('admin/harvest_per_field.html', current_user=current_user, children_1=children_1, harvest_map=harvest_map, field_map=field_map, harvests=harvests, farm_fields=active_farm_fields)
+    return render_template('admin/harvest_per_field.html', current_user=current_user, children_1=children_1, harvest_map=harvest_map, field_map=field_map, harvests=harvests, farm_fields=active_farm_fields, totals=totals)
+
+@admin_harvest_per_field_bp.route('/admin/harvest_per_field/export')
+@login_required
+def export():
+    if current_user.permission != 0:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    if request.args.get('background') == '1':
+        # Written to a file by `flask run-jobs`; poll the returned job for it
+        job = enqueue_export('harvest_yields', request.args, user_id=current_user.id)
+        db.session.commit()
+        return accepted(job)
+
+    statement = yield_export_query(parse_filters(request.args))
+    return export_response('harvest_yields', YIELD_HEADER, statement, request.args.get('format'))
 
 @admin_harvest_per_field_bp.route('/add_harvest_per_field_modal', methods=['POST'])
 @login_required
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, all_reference_scopes
 from app.models import HarvestRig, Customer, User # Import your models accordingly
 from app.extensions import db
 
@@ -7,15 +8,16 @@ admin_harvest_rig_bp = Blueprint('admin_harvest_rig_bp', __name__)
 
 @admin_harvest_rig_bp.route('/admin/harvest_rig')
 @login_required
+@conditional(all_reference_scopes)
 def index():
     if current_user.permission != 0:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    companies = Customer.query.filter(Customer.deleted_at.is_(None), Customer.status == 'active').all()
+    companies = Customer.query.filter(Customer.status == 'active').all()
     # Create a dictionary to map company_id to company.name
     company_map = {customer.id: customer.name for customer in companies}
-    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.deleted_at == None, Customer.status == 'active').all()]
+    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.status == 'active').all()]
     operators = User.query.filter(User.permission == 2).all()
      # Convert operators to a list of dictionaries for JSON serialization
     operators_data = [{'id': operator.id, 'name': operator.username, 'company_id': operator.company_id} for operator in operators]
@@ -35,7 +37,7 @@ def add_harvest_rig_modal():
     name = request.form['name']
     year = request.form['year']
     serial_number = request.form['serial_number']
-    operator = request.form['operator']
+    operator = request.form['operator'] or None
 
     if not name or not year or not serial_number:
         flash('All fields are required.')
@@ -64,7 +66,7 @@ def edit_harvest_rig(harvest_rig_id):
     name = request.form['name']
     year = request.form['year']
     serial_number = request.form['serial_number']
-    operator = request.form['operator']
+    operator = request.form['operator'] or None
 
     if not name or not year or not serial_number:
         flash('All fields are required.')
@@ -0,0 +1,44 @@
+import os
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app, jsonify
+from flask_login import login_required, current_user
+
+admin_profiler_bp = Blueprint('admin_profiler_bp', __name__)
+
+@admin_profiler_bp.route('/admin/profiler')
+@login_required
+def index():
+    if current_user.permission != 0:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    profiler = current_app.extensions.get('request_profiler')
+    if profiler is None:
+        flash('Request profiling is disabled. Set PROFILE_REQUESTS=1 to enable it.')
+        return redirect(url_for('main.home'))
+
+    return render_template('admin/profiler.html', current_user=current_user, endpoints=profiler.summary(), started_at=profiler.started_at, worker_pid=os.getpid())
+
+@admin_profiler_bp.route('/admin/profiler.json')
+@login_required
+def stats():
+    if current_user.permission != 0:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    profiler = current_app.extensions.get('request_profiler')
+    if profiler is None:
+        return jsonify({'error': 'Request profiling is disabled'}), 404
+
+    return jsonify({'worker_pid': os.getpid(), 'started_at': profiler.started_at, 'endpoints': profiler.summary()})
+
+@admin_profiler_bp.route('/admin/profiler/reset', methods=['POST'])
+@login_required
+def reset():
+    if current_user.permission != 0:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    profiler = current_app.extensions.get('request_profiler')
+    if profiler is not None:
+        profiler.reset()
+        flash('Profiler statistics reset.')
+    return redirect(url_for('admin_profiler_bp.index'))
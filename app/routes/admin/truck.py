@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, all_reference_scopes
 from app.models import Truck, Customer, User
 from app.extensions import db
 
@@ -7,15 +8,16 @@ admin_truck_bp = Blueprint('admin_truck_bp', __name__)
 
 @admin_truck_bp.route('/admin/truck')
 @login_required
+@conditional(all_reference_scopes)
 def index():
     if current_user.permission != 0:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    companies = Customer.query.filter(Customer.deleted_at.is_(None), Customer.status == 'active').all()
+    companies = Customer.query.filter(Customer.status == 'active').all()
     # Create a dictionary to map company_id to company.name
     company_map = {customer.id: customer.name for customer in companies}
-    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.deleted_at == None, Customer.status == 'active').all()]
+    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.status == 'active').all()]
     trucks = Truck.query.filter(Truck.company_id.in_(active_customer_ids)).all()
     truckers = User.query.filter(User.permission == 4).all()
     # Convert truckers to a list of dictionaries for JSON serialization
@@ -38,7 +40,7 @@ def add_truck_modal():
     name = request.form['name']
     year = request.form['year']
     vin = request.form['vin']
-    driver = request.form['driver']
+    driver = request.form['driver'] or None
 
     if not name or not year or not vin:
         flash('All fields are required.')
@@ -68,7 +70,7 @@ def edit_truck(truck_id):
     name = request.form['name']
     year = request.form['year']
     vin = request.form['vin']
-    driver = request.form['driver']
+    driver = request.form['driver'] or None
 
     if not name or not year or not vin:
         flash('All fields are required.')
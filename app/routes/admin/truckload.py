@@ -1,25 +1,93 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from app.models import Truckload, Customer, Truck, HarvestRig, Harvest, HarvestPerField
+from app.conditional import conditional, all_truckload_scopes
+from app.models import Truckload, User, Truck, HarvestRig, Harvest, FarmField
 from app.extensions import db
+from app.instrumentation import query_budget
+from app.archive import truckloads_for
+from app.truckload_listing import parse_filters, apply_filters, keyset_page, serialize_truckload
+from app.exporter import TRUCKLOAD_HEADER, truckload_export_query, export_response
+from app.jobs import accepted, enqueue_export
 
 admin_truckload_bp = Blueprint('admin_truckload_bp', __name__)
 
+def reference_data():
+    users = User.query.filter(User.permission > 0).all()
+    return {
+        'trucks': Truck.query.all(),
+        'harvest_rigs': HarvestRig.query.all(),
+        'harvests': Harvest.query.all(),
+        'fields': FarmField.query.all(),
+        'operators': [user for user in users if user.permission == 2],
+        'truckers': [user for user in users if user.permission == 4]
+    }
+
 @admin_truckload_bp.route('/admin/truckload')
+@query_budget(9)
 @login_required
+@conditional(all_truckload_scopes)
 def index():
     if current_user.permission != 0:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    truckloads = Truckload.query.all()
-    customers = Customer.query.filter(Customer.deleted_at.is_(None), Customer.status == 'active').all()
-    trucks = Truck.query.all()
-    rigs = HarvestRig.query.all()
-    harvests = Harvest.query.all()
-    fields = HarvestPerField.query.all()
-    
-    return render_template('admin/truckload.html', current_user=current_user, truckloads=truckloads, customers=customers, trucks=trucks, rigs=rigs, harvests=harvests, fields=fields)
+    filters = parse_filters(request.args)
+    source = truckloads_for(filters)
+    truckloads, next_cursor = keyset_page(
+        apply_filters(Truckload.query_with_relations(source), filters, source),
+        request.args.get('cursor'), truckloads=source
+    )
+    page_args = {key: value for key, value in request.args.items() if key != 'cursor'}
+
+    return render_template(
+        'admin/truckload.html',
+        current_user=current_user,
+        truckloads=truckloads,
+        next_cursor=next_cursor,
+        filters=filters,
+        page_url=url_for('admin_truckload_bp.page', **page_args),
+        export_urls={
+            'CSV': url_for('admin_truckload_bp.export', format='csv', **page_args),
+            'Excel': url_for('admin_truckload_bp.export', format='xlsx', **page_args)
+        },
+        **reference_data()
+    )
+
+@admin_truckload_bp.route('/admin/truckload/page')
+@query_budget(9)
+@login_required
+@conditional(all_truckload_scopes)
+def page():
+    if current_user.permission != 0:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    filters = parse_filters(request.args)
+    source = truckloads_for(filters)
+    truckloads, next_cursor = keyset_page(
+        apply_filters(Truckload.query_with_relations(source), filters, source),
+        request.args.get('cursor'), truckloads=source
+    )
+    return jsonify({
+        'truckloads': [serialize_truckload(truckload) for truckload in truckloads],
+        'next_cursor': next_cursor,
+        'html': render_template('admin/truckload_rows.html', truckloads=truckloads, **reference_data())
+    })
+
+@admin_truckload_bp.route('/admin/truckload/export')
+@login_required
+def export():
+    if current_user.permission != 0:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    if request.args.get('background') == '1':
+        # Written to a file by `flask run-jobs`; poll the returned job for it
+        job = enqueue_export('truckloads', request.args, user_id=current_user.id)
+        db.session.commit()
+        return accepted(job)
+
+    statement = truckload_export_query(parse_filters(request.args))
+    return export_response('truckloads', TRUCKLOAD_HEADER, statement, request.args.get('format'))
 
 @admin_truckload_bp.route('/add_truckload_modal', methods=['POST'])
 @login_required
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, all_reference_scopes
 from app.models import User, Customer
 from app.extensions import db, bcrypt
 
@@ -8,14 +9,15 @@ admin_user_bp = Blueprint('admin_user_bp', __name__)
 
 @admin_user_bp.route('/admin/user')
 @login_required
+@conditional(all_reference_scopes)
 def index():
     if current_user.permission != 0:  #superadmin role for user management
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.deleted_at == None, Customer.status == 'active').all()]
+    active_customer_ids = [customer.id for customer in Customer.query.filter(Customer.status == 'active').all()]
     children_1 = User.query.filter(User.permission > 0, User.company_id.in_(active_customer_ids)).all()
-    children_2 = Customer.query.filter(Customer.deleted_at == None, Customer.status == 'active').all()
+    children_2 = Customer.query.filter(Customer.status == 'active').all()
     
     # Create a dictionary to map company_id to company.name
     company_map = {customer.id: customer.name for customer in children_2}
@@ -0,0 +1,29 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
+from flask_login import login_required, current_user
+from app.analytics import company_analytics, parse_season
+from app.reference_cache import company_reference_data
+
+auth_analytics_bp = Blueprint('auth_analytics_bp', __name__)
+
+@auth_analytics_bp.route('/auth/analytics')
+@login_required
+def index():
+    if current_user.permission != 1:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    harvest_id = request.args.get('harvest_id', type=int)
+    season = parse_season(request.args)
+    analytics = company_analytics(current_user.company_id, harvest_id, season)
+    harvests = company_reference_data(current_user.company_id)['harvests']
+    return render_template('auth/analytics.html', current_user=current_user, analytics=analytics, harvests=harvests, harvest_id=harvest_id, season=season)
+
+@auth_analytics_bp.route('/auth/analytics.json')
+@login_required
+def data():
+    if current_user.permission != 1:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    harvest_id = request.args.get('harvest_id', type=int)
+    season = parse_season(request.args)
+    return jsonify(company_analytics(current_user.company_id, harvest_id, season))
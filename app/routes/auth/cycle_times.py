@@ -0,0 +1,31 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
+from flask_login import login_required, current_user
+from app.cycle_stats import company_cycle_stats
+
+auth_cycle_times_bp = Blueprint('auth_cycle_times_bp', __name__)
+
+# Dashboard windows, in hours
+DEFAULT_HOURS = 12
+MAX_HOURS = 7 * 24
+
+def window_hours():
+    return min(max(request.args.get('hours', DEFAULT_HOURS, type=int), 1), MAX_HOURS)
+
+@auth_cycle_times_bp.route('/auth/cycle_times')
+@login_required
+def index():
+    if current_user.permission != 1:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    hours = window_hours()
+    stats = company_cycle_stats(current_user.company_id, hours)
+    return render_template('auth/cycle_times.html', current_user=current_user, stats=stats, hours=hours)
+
+@auth_cycle_times_bp.route('/auth/cycle_times.json')
+@login_required
+def data():
+    if current_user.permission != 1:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    return jsonify(company_cycle_stats(current_user.company_id, window_hours()))
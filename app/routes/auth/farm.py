@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, company_reference_scopes
 from app.models import Farm, Customer
 from app.extensions import db, bcrypt
 
@@ -8,13 +9,14 @@ auth_farm_bp = Blueprint('auth_farm_bp', __name__)
 
 @auth_farm_bp.route('/auth/farm')
 @login_required
+@conditional(company_reference_scopes)
 def index():
     if current_user.permission !=1 :  # Assuming 0 and 1 are permissions for superauth and auth
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    children_1 = Farm.query.filter(Farm.company_id == current_user.company_id, Farm.deleted_at == None).all()
-    children_2 = Customer.query.filter(Customer.id == current_user.company_id, Customer.deleted_at == None)
+    children_1 = Farm.query.filter(Farm.company_id == current_user.company_id).all()
+    children_2 = Customer.query.filter(Customer.id == current_user.company_id)
     # Create a dictionary to map company_id to company.name
     company_map = {customer.id: customer.name for customer in children_2}
     
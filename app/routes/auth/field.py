@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, company_reference_scopes
 from app.models import FarmField, Farm
 from app.extensions import db, bcrypt
 
@@ -8,6 +9,7 @@ auth_field_bp = Blueprint('auth_field_bp', __name__)
 
 @auth_field_bp.route('/auth/field')
 @login_required
+@conditional(company_reference_scopes)
 def index():
     if current_user.permission != 1:  
         flash('Unauthorized access')
@@ -17,7 +19,7 @@ def index():
                             .filter(Farm.company_id == current_user.company_id) \
                             .all()
 
-    children_2 = Farm.query.filter(Farm.company_id == current_user.company_id, Farm.deleted_at == None).all()
+    children_2 = Farm.query.filter(Farm.company_id == current_user.company_id).all()
     
     # Create a dictionary to map farm_id to farm.name
     farm_map = {farm.id: farm.name for farm in children_2}
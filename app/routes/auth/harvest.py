@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, company_reference_scopes
 from app.models import Harvest, Farm
 from app.extensions import db
 from datetime import datetime
@@ -8,6 +9,7 @@ auth_harvest_bp = Blueprint('auth_harvest_bp', __name__)
 
 @auth_harvest_bp.route('/auth/harvest')
 @login_required
+@conditional(company_reference_scopes)
 def index():
     if current_user.permission != 1:  # Suppose 0 and 1 are permissions for superauth and auth
         flash('Unauthorized access')
@@ -15,7 +17,7 @@ def index():
     children_1 = Harvest.query.join(Farm, Harvest.farm_id == Farm.id) \
                         .filter(Farm.company_id == current_user.company_id) \
                         .all()
-    children_2 = Farm.query.filter(Farm.company_id == current_user.company_id, Farm.deleted_at == None).all()
+    children_2 = Farm.query.filter(Farm.company_id == current_user.company_id).all()
     
     # Create a dictionary to map farm_id to farm.name
     farm_map = {farm.id: farm.name for farm in children_2}
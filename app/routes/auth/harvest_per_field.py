@@ -1,12 +1,18 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
 from flask_login import login_required, current_user
-from app.models import HarvestPerField, Harvest, FarmField, Farm
+from app.conditional import conditional, company_yield_scopes
+from app.models import HarvestPerField, HarvestYieldTotal, Harvest, FarmField, Farm
 from app.extensions import db
+from app.rollups import yield_totals
+from app.truckload_listing import parse_filters
+from app.exporter import YIELD_HEADER, yield_export_query, export_response
+from app.jobs import accepted, enqueue_export
 
 auth_harvest_per_field_bp = Blueprint('auth_harvest_per_field_bp', __name__)
 
 @auth_harvest_per_field_bp.route('/auth/harvest_per_field')
 @login_required
+@conditional(company_yield_scopes)
 def index():
     if current_user.permission != 1:
         flash('Unauthorized access')
@@ -24,8 +30,25 @@ def index():
 
     harvest_map = {harvest.id: harvest.name for harvest in children_2}
     field_map = {field.id: field.name for field in children_3}
+    totals = yield_totals(HarvestYieldTotal.harvest_id.in_(children_2_ids))
 
-    return render_template('auth/harvest_per_field.html', current_user=current_user, children_1=children_1, harvest_map=harvest_map, field_map=field_map, children_2=children_2, children_3=children_3)
+    return render_template('auth/harvest_per_field.html', current_user=current_user, children_1=children_1, harvest_map=harvest_map, field_map=field_map, children_2=children_2, children_3=children_3, totals=totals)
+
+@auth_harvest_per_field_bp.route('/auth/harvest_per_field/export')
+@login_required
+def export():
+    if current_user.permission != 1:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    if request.args.get('background') == '1':
+        # Written to a file by `flask run-jobs`; poll the returned job for it
+        job = enqueue_export('harvest_yields', request.args, company_id=current_user.company_id, user_id=current_user.id)
+        db.session.commit()
+        return accepted(job)
+
+    statement = yield_export_query(parse_filters(request.args), company_id=current_user.company_id)
+    return export_response('harvest_yields', YIELD_HEADER, statement, request.args.get('format'))
 
 @auth_harvest_per_field_bp.route('/auth/add_harvest_per_field_modal', methods=['POST'])
 @login_required
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, company_reference_scopes
 from app.models import HarvestRig, Customer, User  # Import your models accordingly
 from app.extensions import db
 
@@ -7,13 +8,14 @@ auth_harvest_rig_bp = Blueprint('auth_harvest_rig_bp', __name__)
 
 @auth_harvest_rig_bp.route('/auth/harvest_rig')
 @login_required
+@conditional(company_reference_scopes)
 def index():
     if current_user.permission != 1:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
     harvest_rigs = HarvestRig.query.filter(HarvestRig.company_id == current_user.company_id).all()
-    companies = Customer.query.filter(Customer.deleted_at.is_(None), Customer.status == 'active', Customer.id == current_user.company_id).all()
+    companies = Customer.query.filter(Customer.status == 'active', Customer.id == current_user.company_id).all()
     
     # Create a dictionary to map company_id to company.name
     company_map = {customer.id: customer.name for customer in companies}
@@ -39,7 +41,7 @@ def add_harvest_rig_modal():
     name = request.form['name']
     year = request.form['year']
     serial_number = request.form['serial_number']
-    operator = request.form['operator']
+    operator = request.form['operator'] or None
 
     if not name or not year or not serial_number:
         flash('All fields are required.')
@@ -68,7 +70,7 @@ def edit_harvest_rig(harvest_rig_id):
     name = request.form['name']
     year = request.form['year']
     serial_number = request.form['serial_number']
-    operator = request.form['operator']
+    operator = request.form['operator'] or None
 
     if not name or not year or not serial_number:
         flash('All fields are required.')
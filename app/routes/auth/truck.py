@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, company_reference_scopes
 from app.models import Truck, Customer, User
 from app.extensions import db
 
@@ -7,13 +8,14 @@ auth_truck_bp = Blueprint('auth_truck_bp', __name__)
 
 @auth_truck_bp.route('/auth/truck')
 @login_required
+@conditional(company_reference_scopes)
 def index():
     if current_user.permission != 1:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
     trucks = Truck.query.filter(Truck.company_id == current_user.company_id).all()
-    companies = Customer.query.filter(Customer.deleted_at.is_(None), Customer.status == 'active', Customer.id == current_user.company_id).all()
+    companies = Customer.query.filter(Customer.status == 'active', Customer.id == current_user.company_id).all()
     # Create a dictionary to map company_id to company.name
     company_map = {customer.id: customer.name for customer in companies}
     truckers = User.query.filter(User.company_id == current_user.company_id, User.permission ==4).all()
@@ -38,7 +40,7 @@ def add_truck_modal():
     name = request.form['name']
     year = request.form['year']
     vin = request.form['vin']
-    driver = request.form['driver']
+    driver = request.form['driver'] or None
 
     if not name or not year or not vin:
         flash('All fields are required.')
@@ -68,7 +70,7 @@ def edit_truck(truck_id):
     name = request.form['name']
     year = request.form['year']
     vin = request.form['vin']
-    driver = request.form['driver']
+    driver = request.form['driver'] or None
 
     if not name or not year or not vin:
         flash('All fields are required.')
@@ -1,20 +1,98 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from app.models import Truckload
+from app.conditional import conditional, company_truckload_scopes
+from app.models import Truckload, User, Truck, HarvestRig, Harvest, FarmField, Farm
 from app.extensions import db
+from app.instrumentation import query_budget
+from app.archive import truckloads_for
+from app.truckload_listing import parse_filters, apply_filters, keyset_page, serialize_truckload
+from app.exporter import TRUCKLOAD_HEADER, truckload_export_query, export_response
+from app.jobs import accepted, enqueue_export
 
 auth_truckload_bp = Blueprint('auth_truckload_bp', __name__)
 
+def company_truckloads(source=Truckload):
+    # Truckloads belong to a company through the harvest rig that loaded them
+    company_rig_ids = db.select(HarvestRig.id).where(HarvestRig.company_id == current_user.company_id)
+    return Truckload.query_with_relations(source).filter(source.harvest_rig_id.in_(company_rig_ids))
+
+def reference_data():
+    company_farm_ids = db.select(Farm.id).where(Farm.company_id == current_user.company_id)
+    users = User.query.filter(User.company_id == current_user.company_id, User.permission > 1).all()
+    return {
+        'trucks': Truck.query.filter_by(company_id=current_user.company_id).all(),
+        'harvest_rigs': HarvestRig.query.filter_by(company_id=current_user.company_id).all(),
+        'harvests': Harvest.query.filter(Harvest.farm_id.in_(company_farm_ids)).all(),
+        'fields': FarmField.query.filter(FarmField.farm_id.in_(company_farm_ids)).all(),
+        'operators': [user for user in users if user.permission == 2],
+        'truckers': [user for user in users if user.permission == 4]
+    }
+
 @auth_truckload_bp.route('/auth/truckload')
+@query_budget(9)
 @login_required
+@conditional(company_truckload_scopes)
 def index():
     if current_user.permission != 1:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    truckloads = Truckload.query.all()
-    
-    return render_template('auth/truckload.html', current_user=current_user, truckloads=truckloads)
+    filters = parse_filters(request.args)
+    source = truckloads_for(filters)
+    truckloads, next_cursor = keyset_page(
+        apply_filters(company_truckloads(source), filters, source), request.args.get('cursor'), truckloads=source
+    )
+    page_args = {key: value for key, value in request.args.items() if key != 'cursor'}
+
+    return render_template(
+        'auth/truckload.html',
+        current_user=current_user,
+        truckloads=truckloads,
+        next_cursor=next_cursor,
+        filters=filters,
+        page_url=url_for('auth_truckload_bp.page', **page_args),
+        export_urls={
+            'CSV': url_for('auth_truckload_bp.export', format='csv', **page_args),
+            'Excel': url_for('auth_truckload_bp.export', format='xlsx', **page_args)
+        },
+        **reference_data()
+    )
+
+@auth_truckload_bp.route('/auth/truckload/page')
+@query_budget(9)
+@login_required
+@conditional(company_truckload_scopes)
+def page():
+    if current_user.permission != 1:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    filters = parse_filters(request.args)
+    source = truckloads_for(filters)
+    truckloads, next_cursor = keyset_page(
+        apply_filters(company_truckloads(source), filters, source),
+        request.args.get('cursor'), truckloads=source
+    )
+    return jsonify({
+        'truckloads': [serialize_truckload(truckload) for truckload in truckloads],
+        'next_cursor': next_cursor,
+        'html': render_template('auth/truckload_rows.html', truckloads=truckloads, **reference_data())
+    })
+
+@auth_truckload_bp.route('/auth/truckload/export')
+@login_required
+def export():
+    if current_user.permission != 1:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    if request.args.get('background') == '1':
+        # Written to a file by `flask run-jobs`; poll the returned job for it
+        job = enqueue_export('truckloads', request.args, company_id=current_user.company_id, user_id=current_user.id)
+        db.session.commit()
+        return accepted(job)
+
+    statement = truckload_export_query(parse_filters(request.args), company_id=current_user.company_id)
+    return export_response('truckloads', TRUCKLOAD_HEADER, statement, request.args.get('format'))
 
 @auth_truckload_bp.route('/auth/add_truckload_modal', methods=['POST'])
 @login_required
@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from app.conditional import conditional, company_reference_scopes
 from app.models import User, Customer
 from app.extensions import db, bcrypt
+from app.identity_cache import current_company
 
 # Change the blueprint name to 'auth_user_bp'
 auth_user_bp = Blueprint('auth_user_bp', __name__)
@@ -9,13 +11,15 @@ auth_user_bp = Blueprint('auth_user_bp', __name__)
 # auth user table
 @auth_user_bp.route('/auth/user')
 @login_required
+@conditional(company_reference_scopes)
 def index():
     if current_user.permission != 1:  # Assuming 0 and 1 are permissions for superadmin and admin
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
     children_1 = User.query.filter(User.permission > 1, current_user.company_id == User.company_id).all()
-    children_2 = Customer.query.filter(Customer.id == current_user.company_id, Customer.deleted_at == None)
+    company = current_company()
+    children_2 = [company] if company and company.deleted_at is None else []
     
     # Create a dictionary to map company_id to company.name
     company_map = {customer.id: customer.name for customer in children_2}
@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from app.forms.auth_forms import LoginForm
 from app.models import User, Truck, HarvestRig, Customer
 from app.extensions import db
+from app.passwords import HasherBusy, check_password
 
 auth_bp = Blueprint('authentication', __name__)
 
@@ -15,12 +16,18 @@ def login():
             # Fetch the company using company_id
             company = Customer.query.get(user.company_id)
 
-            # Check if company exists and its status is 'disabled'
-            if company and company.status == 'disable':
+            # Refuse users of a disabled or deleted company
+            if user.company_id and (company is None or company.status == 'disable'):
                 flash('Your company is not allowed to access this service.')
                 return render_template('login.html', form=form)
 
-        if user and user.verify_password(form.password.data.strip()):
+        try:
+            verified = user is not None and check_password(user, form.password.data.strip())
+        except HasherBusy:
+            flash('Too many sign-ins right now, please try again in a moment.')
+            return render_template('login.html', form=form), 503
+
+        if verified:
             login_user(user)
             return redirect(url_for('main.home'))
         else:
@@ -34,12 +41,12 @@ def login():
 def logout():
     trucks = Truck.query.filter_by(current_driver_id=current_user.id).all()
     for truck in trucks:
-        truck.current_driver_id = ''
+        truck.current_driver_id = None
     db.session.commit()
     
     rigs = HarvestRig.query.filter_by(current_operator_id=current_user.id).all()
     for rig in rigs:
-        rig.current_operator_id = ''
+        rig.current_operator_id = None
     db.session.commit()
     
     logout_user()
@@ -0,0 +1,28 @@
+from flask import Blueprint, jsonify, request
+from flask_login import login_required, current_user
+from app.events import event_stream, company_channel
+from app.fleet import fleet_status
+
+fleet_bp = Blueprint('fleet', __name__)
+
+# Company users: admins, operators, office and truckers
+FLEET_PERMISSIONS = (1, 2, 3, 4)
+
+@fleet_bp.route('/fleet/status')
+@login_required
+def status():
+    # Poll with ?since=<version from the last response>; while nothing has
+    # been assigned or released the answer is only the version
+    if current_user.permission not in FLEET_PERMISSIONS:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    return jsonify(fleet_status(current_user.company_id, request.args.get('since', type=int)))
+
+@fleet_bp.route('/fleet/events')
+@login_required
+def events():
+    # truck_assignment and rig_assignment as they happen
+    if current_user.permission not in FLEET_PERMISSIONS:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    return event_stream([company_channel(current_user.company_id)])
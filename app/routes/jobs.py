@@ -0,0 +1,53 @@
+import json
+import os
+from flask import Blueprint, jsonify, send_file
+from flask_login import login_required, current_user
+from app.exporter import EXPORT_FORMATS
+from app.extensions import db
+from app.jobs import DONE, ROLLUPS, accepted, enqueue, export_dir, job_status
+from app.models import Job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def visible_job(job_id):
+    # Superadmins see every job, everyone else the jobs they queued
+    job = db.session.get(Job, job_id)
+    if job is None or (current_user.permission != 0 and job.user_id != current_user.id):
+        return None
+    return job
+
+@jobs_bp.route('/jobs/<int:job_id>')
+@login_required
+def status(job_id):
+    # Poll until status is done or failed
+    job = visible_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(job_status(job))
+
+@jobs_bp.route('/jobs/<int:job_id>/download')
+@login_required
+def download(job_id):
+    job = visible_job(job_id)
+    if job is None or job.kind != 'export' or job.status != DONE:
+        return jsonify({'error': 'Job not found'}), 404
+
+    result = json.loads(job.result)
+    path = os.path.join(export_dir(), result['file'])
+    if not os.path.exists(path):
+        return jsonify({'error': 'Export has expired'}), 410
+    file_format = result['file'].rsplit('.', 1)[1]
+    return send_file(path, mimetype=EXPORT_FORMATS[file_format], as_attachment=True, download_name=result['name'])
+
+@jobs_bp.route('/jobs/rollups/<kind>', methods=['POST'])
+@login_required
+def rollup(kind):
+    if current_user.permission != 0:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    if kind not in ROLLUPS:
+        return jsonify({'error': 'Unknown rollup'}), 404
+
+    job = enqueue(kind, user_id=current_user.id)
+    db.session.commit()
+    return accepted(job)
@@ -1,18 +1,22 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import io
+from flask import Blueprint, render_template, redirect, url_for, flash, request, Response
 from flask_login import login_required, current_user
 from app.models import Truckload, HarvestPerField
 from app.extensions import db
+from app.importer import import_scale_tickets
+from app.instrumentation import query_budget
 
 office_truckloads_bp = Blueprint('office_truckloads_bp', __name__)
 
 @office_truckloads_bp.route('/office/truckload')
+@query_budget(2)
 @login_required
 def index():
     if current_user.permission != 3:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    truckloads = Truckload.query.filter(
+    truckloads = Truckload.query_with_relations().filter(
         Truckload.yield_amount.is_(None),
         Truckload.yield_type.is_(None)
     ).all()
@@ -56,3 +60,28 @@ def edit_truckload(truckload_id):
     db.session.commit()
     flash('Truckload successfully updated!')
     return redirect(url_for('office_truckloads_bp.index'))
+
+@office_truckloads_bp.route('/office/import_truckloads', methods=['POST'])
+@login_required
+def import_truckloads():
+    if current_user.permission != 3:
+        flash('Unauthorized access')
+        return redirect(url_for('main.home'))
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename.lower().endswith(('.csv', '.xlsx')):
+        flash('Please choose a .csv or .xlsx scale-ticket file.')
+        return redirect(url_for('office_truckloads_bp.index'))
+
+    error_report = io.StringIO()
+    counts = import_scale_tickets(upload.stream, upload.filename, error_report, company_id=current_user.company_id)
+    if counts['errors']:
+        # Matched rows are already saved; hand back the rejected ones to fix and re-upload
+        return Response(
+            error_report.getvalue(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=import_errors.csv'}
+        )
+
+    flash(f"{counts['imported']} truckloads imported.")
+    return redirect(url_for('office_truckloads_bp.index'))
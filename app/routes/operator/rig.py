@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort
 from flask_login import login_required, logout_user, current_user
 from app.models import HarvestRig, Customer, Truckload
 from app.extensions import db
-from datetime import datetime
+from app.events import publish, company_channel
+from app.fleet import toggle_assignment, TAKEN
 
 operator_rig_bp = Blueprint('operator_rig_bp', __name__)
 
@@ -15,11 +16,10 @@ def index():
 
     children_1 = HarvestRig.query.filter(
         (HarvestRig.company_id == current_user.company_id) &
-        ((HarvestRig.current_operator_id == '') | (HarvestRig.current_operator_id == current_user.id))
+        (HarvestRig.current_operator_id.is_(None) | (HarvestRig.current_operator_id == current_user.id))
     ).all()
     children_2 = Customer.query.filter(
-        Customer.deleted_at.is_(None),
-        Customer.status == 0,  # Assuming status 0 means 'active'
+        Customer.status == 'active',
         Customer.id == current_user.company_id
     ).all()
 
@@ -28,6 +28,29 @@ def index():
 
     return render_template('operator/rig.html', current_user=current_user, children_1=children_1, children_2=children_2, company_map=company_map)
 
+def publish_rig_assignment(rig):
+    publish(company_channel(rig.company_id), 'rig_assignment', {
+        'rig_id': rig.id,
+        'name': rig.name,
+        'current_operator_id': rig.current_operator_id or None,
+        'current_operator_name': current_user.username if rig.current_operator_id == current_user.id else ''
+    })
+
+def toggle_rig():
+    # (rig, message, conflict) for the rig in the form, or a 404
+    rig_id = request.form.get('rig_id', type=int)
+    outcome = toggle_assignment(HarvestRig, rig_id, current_user.company_id, current_user.id)
+    if outcome is None:
+        abort(404)
+
+    rig = db.session.get(HarvestRig, rig_id, populate_existing=True)
+    if outcome == TAKEN:
+        return rig, f'Rig {rig.name} has just been selected by another operator.', True
+
+    publish_rig_assignment(rig)
+    db.session.commit()
+    return rig, f'Rig {rig.name} successfully {outcome} by {current_user.username}!', False
+
 @operator_rig_bp.route('/select_rig', methods=['POST'])
 @login_required
 def select_rig():
@@ -38,33 +61,16 @@ def select_rig():
     # Check for unfinished truckloads
     unfinished_truckload = Truckload.query.filter(
         Truckload.operator_id == current_user.id,
-        db.or_(
-            Truckload.trucker_confirmation == 0,
-            Truckload.yield_amount == None,
-            Truckload.yield_type == None
-        )
+        Truckload.unfinished()
     ).first()
 
-    # Debug statement
-    print(f"Unfinished Truckload: {unfinished_truckload}")
+    current_app.logger.debug(f"Unfinished Truckload: {unfinished_truckload}")
 
     if unfinished_truckload:
         flash("You have unfinished truckloads. Please complete them before selecting a new rig.")
         return redirect(url_for('operator_truckload_bp.show_truckload', truckload_id=unfinished_truckload.id))
 
-    rig_id = request.form['rig_id']
-    rig = HarvestRig.query.get_or_404(rig_id)
-
-    # If the rig is already selected by the current user, cancel the selection
-    if rig.current_operator_id == current_user.id:
-        rig.current_operator_id = ''
-        message = f'Rig {rig.name} successfully deselected by {current_user.username}!'
-    else:
-        # Update the rig's current operator to the current user
-        rig.current_operator_id = current_user.id
-        message = f'Rig {rig.name} successfully selected by {current_user.username}!'
-
-    db.session.commit()
+    rig, message, conflict = toggle_rig()
     flash(message)
 
     return redirect(url_for('operator_rig_bp.index'))
@@ -78,30 +84,17 @@ def select_rig_ajax():
     # Check for unfinished truckloads
     unfinished_truckload = Truckload.query.filter(
         Truckload.operator_id == current_user.id,
-        db.or_(
-            Truckload.trucker_confirmation == 0,
-            Truckload.yield_amount == None,
-            Truckload.yield_type == None
-        )
+        Truckload.unfinished()
     ).first()
 
-    # Debug statement
-    print(f"Unfinished Truckload (AJAX): {unfinished_truckload}")
+    current_app.logger.debug(f"Unfinished Truckload (AJAX): {unfinished_truckload}")
 
     if unfinished_truckload:
         return jsonify({'error': 'You have unfinished truckloads. Please complete them before selecting a new rig.'}), 403
 
-    rig_id = request.form['rig_id']
-    rig = HarvestRig.query.get_or_404(rig_id)
-
-    if rig.current_operator_id == current_user.id:
-        # If the rig is already selected by the current user, deselect it
-        rig.current_operator_id = ''
-    else:
-        # Otherwise, select the rig for the current user
-        rig.current_operator_id = current_user.id
-
-    db.session.commit()
+    rig, message, conflict = toggle_rig()
+    if conflict:
+        return jsonify({'error': message, 'rig_id': rig.id}), 409
     return jsonify({
         'rig_id': rig.id,
         'current_operator_id': rig.current_operator_id,
@@ -113,7 +106,7 @@ def select_rig_ajax():
 def logout():
     rigs = HarvestRig.query.filter_by(current_operator_id=current_user.id).all()
     for rig in rigs:
-        rig.current_operator_id = ''
+        rig.current_operator_id = None
     db.session.commit()
 
     logout_user()
@@ -1,7 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, logout_user, current_user
 from app.models import HarvestRig, Customer, Farm, User, Truck, Truckload, HarvestPerField, Harvest, FarmField
+from app.reference_cache import company_reference_data
 from app.extensions import db
+from app.instrumentation import query_budget
+from app.events import publish, event_stream, trucker_channel, truckload_channel
 from datetime import datetime
 
 operator_truckload_bp = Blueprint('operator_truckload_bp', __name__)
@@ -13,16 +16,17 @@ def index():
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
     
-    unfinished_truckload = Truckload.query.filter(
-        Truckload.operator_id == current_user.id,
-        db.or_(
-            Truckload.trucker_confirmation == 0,
-            Truckload.yield_amount == None,
-            Truckload.yield_type == None
-        )
+    # The operator's unfinished truckload if there is one, otherwise their
+    # latest, which also gives the form its default harvest and field
+    unfinished = Truckload.unfinished()
+    latest_truckload = db.session.execute(
+        db.select(Truckload.id, Truckload.harvest_id, Truckload.field_id, unfinished.label('unfinished'))
+        .where(Truckload.operator_id == current_user.id)
+        .order_by(db.case((unfinished, 1), else_=0).desc(), Truckload.id.desc())
+        .limit(1)
     ).first()
-    if unfinished_truckload:
-        return redirect(url_for('operator_truckload_bp.show_truckload', truckload_id=unfinished_truckload.id))
+    if latest_truckload and latest_truckload.unfinished:
+        return redirect(url_for('operator_truckload_bp.show_truckload', truckload_id=latest_truckload.id))
 
     if request.method == 'POST':
         harvest_rig_id = request.form.get('harvest_rig_id')
@@ -46,47 +50,41 @@ def index():
             trucker_confirmation=0  # Assuming it's not confirmed initially
         )
         db.session.add(new_truckload)
+        db.session.flush()
+
+        # Push the confirmation request to the trucker's open page
+        publish(trucker_channel(new_truckload.trucker_id), 'truckload_created', {
+            'truckload_id': new_truckload.id,
+            'harvest_name': new_truckload.harvest.name,
+            'field_name': new_truckload.field.name,
+            'load_date_time': new_truckload.load_date_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
         db.session.commit()
         flash("New truckload created successfully!")
         return redirect(url_for('operator_truckload_bp.show_truckload', truckload_id=new_truckload.id))
 
-    # Data fetching for GET request
-    farms = Farm.query.filter_by(company_id=current_user.company_id).all()
-    farm_ids = [farm.id for farm in farms]
-    
-    harvests = Harvest.query.filter(Harvest.farm_id.in_(farm_ids)).all()
-    harvests_list = [{'id': harvest.id, 'name': harvest.name, 'farm_id': harvest.farm_id} for harvest in harvests]
-    
-    fields = FarmField.query.filter(FarmField.farm_id.in_(farm_ids)).all()
-    fields_list = [{'id': field.id, 'name': field.name, 'farm_id': field.farm_id} for field in fields]
-    
-    trucks = Truck.query.filter(Truck.company_id == current_user.company_id, Truck.current_driver_id != "").all()
-    trucks_list = [{'id': truck.id, 'name': truck.name, 'current_driver_id': truck.current_driver_id} for truck in trucks]
-    
-    harvest_rigs = HarvestRig.query.filter_by(company_id=current_user.company_id).all()
-    
-    truckers = User.query.filter_by(company_id=current_user.company_id).all()
-    truckers_list = [{'id': trucker.id, 'username': trucker.username} for trucker in truckers]
-
-    # Fetch the last record of harvest_id and field_id from Truckload table for default values
-    last_truckload = Truckload.query.order_by(Truckload.id.desc()).first()
-    default_harvest_id = last_truckload.harvest_id if last_truckload else None
-    default_field_id = last_truckload.field_id if last_truckload else None
-    
-    # Get optional harvest_ids from HarvestPerField table
-    harvest_per_field_ids = [hpf.harvest_id for hpf in HarvestPerField.query.all()]
+    # Reference data for GET request, cached per company
+    reference = company_reference_data(current_user.company_id)
+    harvests_list = reference['harvests']
+    fields_list = reference['fields']
+    trucks_list = reference['trucks']
+    harvest_rigs = reference['harvest_rigs']
+    truckers_list = reference['truckers']
 
     # Fetch harvest names for the dropdown
-    harvest_names = {harvest.id: harvest.name for harvest in harvests}
+    harvest_names = {harvest['id']: harvest['name'] for harvest in harvests_list}
     
-    field_names = {field.id: field.name for field in fields}
+    field_names = {field['id']: field['name'] for field in fields_list}
+
+    default_harvest_id = latest_truckload.harvest_id if latest_truckload and latest_truckload.harvest_id in harvest_names else None
+    default_field_id = latest_truckload.field_id if latest_truckload and latest_truckload.field_id in field_names else None
 
     # Filter fields based on the last harvest_id
     if default_harvest_id:
-        default_harvest = Harvest.query.get(default_harvest_id)
-        related_fields = FarmField.query.filter_by(farm_id=default_harvest.farm_id).all()
+        default_farm_id = next(harvest['farm_id'] for harvest in harvests_list if harvest['id'] == default_harvest_id)
+        related_fields = [field for field in fields_list if field['farm_id'] == default_farm_id]
     else:
-        related_fields = fields
+        related_fields = fields_list
 
     # Determine default truck and trucker for first load
     if trucks_list:
@@ -112,17 +110,33 @@ def index():
         default_truck_id=default_truck_id, 
         default_trucker_id=default_trucker_id,
         default_trucker_name=default_trucker_name,
-        harvest_per_field_ids=harvest_per_field_ids,
         harvest_names=harvest_names,
         field_names=field_names
     )
 
 @operator_truckload_bp.route('/truckload/in_progress/<int:truckload_id>', methods=['GET'])
+@query_budget(2)
 @login_required
 def show_truckload(truckload_id):
-    truckload = Truckload.query.get_or_404(truckload_id)
+    truckload = Truckload.query_with_relations().filter_by(id=truckload_id).first_or_404()
     return render_template('operator/truckloads.html', truckload=truckload)
 
+@operator_truckload_bp.route('/truckload/in_progress/<int:truckload_id>/events', methods=['GET'])
+@login_required
+def truckload_events(truckload_id):
+    truckload = Truckload.query.get_or_404(truckload_id)
+    if truckload.operator_id != current_user.id:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    def confirmed():
+        # A confirmation made before the stream started is not in it
+        trucker_confirmation = db.session.scalar(db.select(Truckload.trucker_confirmation).where(Truckload.id == truckload.id))
+        if not trucker_confirmation:
+            return []
+        return [('truckload_confirmed', {'truckload_id': truckload.id, 'trucker_confirmation': trucker_confirmation})]
+
+    return event_stream([truckload_channel(truckload.id)], initial=confirmed)
+
 
 @operator_truckload_bp.route('/truckload/finish/<int:truckload_id>', methods=['POST'])
 @login_required
@@ -150,6 +164,7 @@ def finish_truckload(truckload_id):
 @login_required
 def cancel_truckload(truckload_id):
     truckload = Truckload.query.get_or_404(truckload_id)
+    publish(trucker_channel(truckload.trucker_id), 'truckload_cancelled', {'truckload_id': truckload.id})
     db.session.delete(truckload)
     db.session.commit()
     flash("Truckload canceled successfully!")
@@ -160,7 +175,7 @@ def cancel_truckload(truckload_id):
 def logout():
     rigs = HarvestRig.query.filter_by(current_operator_id=current_user.id).all()
     for rig in rigs:
-        rig.current_operator_id = ''
+        rig.current_operator_id = None
     db.session.commit()
 
     logout_user()
@@ -0,0 +1,41 @@
+from datetime import datetime
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.sync import apply_events, changes_since, encode_cursor, serialize_sync_truckload
+
+sync_bp = Blueprint('sync', __name__)
+
+@sync_bp.route('/api/sync', methods=['POST'])
+@login_required
+def sync():
+    # One round trip per reconnect: apply the device's queued events, then
+    # return what changed on the server since its last cursor
+    if current_user.permission not in (2, 4):
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('events', []), list):
+        return jsonify({'error': 'Expected a JSON object with an events list.'}), 400
+    events = data.get('events', [])
+    if len(events) > current_app.config['SYNC_MAX_EVENTS']:
+        return jsonify({'error': f"At most {current_app.config['SYNC_MAX_EVENTS']} events per sync."}), 413
+
+    synced_at = datetime.utcnow()
+    results = apply_events(current_user, events)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The same batch is being applied by another request; nothing from
+        # this one was kept, and a retry reports its events as duplicates
+        db.session.rollback()
+        return jsonify({'error': 'Sync already in progress, retry.'}), 409
+
+    truckloads, removed = changes_since(current_user, data.get('cursor'), data.get('open_truckload_ids') or [])
+    return jsonify({
+        'results': results,
+        'truckloads': [serialize_sync_truckload(truckload) for truckload in truckloads],
+        'removed': removed,
+        'cursor': encode_cursor(synced_at)
+    })
@@ -1,7 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_required, logout_user, current_user
+from app.conditional import conditional
 from app.models import Truck, Customer, Truckload
 from app.extensions import db
+from app.fleet import toggle_assignment, TAKEN
+from app.versions import confirmation_scope, reference_scope
+from app.events import publish, event_stream, trucker_channel, company_channel, truckload_channel
 
 trucker_bp = Blueprint('trucker_bp', __name__)
 
@@ -14,12 +18,11 @@ def index():
 
     children_1 = Truck.query.filter(
         (Truck.company_id == current_user.company_id) &
-        ((Truck.current_driver_id == '') | (Truck.current_driver_id == current_user.id))
+        (Truck.current_driver_id.is_(None) | (Truck.current_driver_id == current_user.id))
     ).all()
 
     children_2 = Customer.query.filter(
-        Customer.deleted_at.is_(None),
-        Customer.status == 0,
+        Customer.status == 'active',
         Customer.id == current_user.company_id
     ).all()
 
@@ -28,6 +31,39 @@ def index():
 
     return render_template('trucker/trucker.html', current_user=current_user, children_1=children_1, children_2=children_2, company_map=company_map)
 
+@trucker_bp.route('/trucker/events')
+@login_required
+def events():
+    if current_user.permission != 4:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    return event_stream([trucker_channel(current_user.id), company_channel(current_user.company_id)])
+
+def publish_truck_assignment(truck):
+    publish(company_channel(truck.company_id), 'truck_assignment', {
+        'truck_id': truck.id,
+        'name': truck.name,
+        'year': truck.year,
+        'vin': truck.vin,
+        'current_driver_id': truck.current_driver_id or None,
+        'current_driver_name': current_user.username if truck.current_driver_id == current_user.id else ''
+    })
+
+def toggle_truck():
+    # (truck, message, conflict) for the truck in the form, or a 404
+    truck_id = request.form.get('truck_id', type=int)
+    outcome = toggle_assignment(Truck, truck_id, current_user.company_id, current_user.id)
+    if outcome is None:
+        abort(404)
+
+    truck = db.session.get(Truck, truck_id, populate_existing=True)
+    if outcome == TAKEN:
+        return truck, f'Truck {truck.name} has just been selected by another driver.', True
+
+    publish_truck_assignment(truck)
+    db.session.commit()
+    return truck, f'Truck {truck.name} successfully {outcome} by {current_user.username}!', False
+
 @trucker_bp.route('/select_truck', methods=['POST'])
 @login_required
 def select_truck():
@@ -35,19 +71,7 @@ def select_truck():
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    truck_id = request.form['truck_id']
-    truck = Truck.query.get_or_404(truck_id)
-
-    # If the truck is already selected by the current user, cancel the selection
-    if truck.current_driver_id == current_user.id:
-        truck.current_driver_id = ''
-        message = f'Truck {truck.name} successfully deselected by {current_user.username}!'
-    else:
-        # Update the truck's current driver to the current user
-        truck.current_driver_id = current_user.id
-        message = f'Truck {truck.name} successfully selected by {current_user.username}!'
-
-    db.session.commit()
+    truck, message, conflict = toggle_truck()
     flash(message)
 
     return redirect(url_for('trucker_bp.index'))
@@ -58,23 +82,18 @@ def select_truck_ajax():
     if current_user.permission != 4:
         return jsonify({'error': 'Unauthorized access'}), 403
 
-    truck_id = request.form['truck_id']
-    truck = Truck.query.get_or_404(truck_id)
-
-    # If the truck is already selected by the current user, cancel the selection
-    if truck.current_driver_id == current_user.id:
-        truck.current_driver_id = ''
-        message = f'Truck {truck.name} successfully deselected by {current_user.username}!'
-    else:
-        # Update the truck's current driver to the current user
-        truck.current_driver_id = current_user.id
-        message = f'Truck {truck.name} successfully selected by {current_user.username}!'
-
-    db.session.commit()
+    truck, message, conflict = toggle_truck()
+    if conflict:
+        return jsonify({'error': message, 'truck_id': truck.id}), 409
     return jsonify({'message': message, 'truck_id': truck.id, 'current_driver_name': current_user.username})
 
+def confirmation_scopes():
+    # The load awaiting this trucker, and the harvest and field names shown with it
+    return [confirmation_scope(current_user.id), reference_scope(current_user.company_id)]
+
 @trucker_bp.route('/check_unconfirmed_truckloads', methods=['GET'])
 @login_required
+@conditional(confirmation_scopes)
 def check_unconfirmed_truckloads():
     truckload = Truckload.query.filter_by(trucker_id=current_user.id, trucker_confirmation=0).first()
 
@@ -103,6 +122,10 @@ def confirm_truckload():
 
     if truckload.trucker_id == current_user.id:
         truckload.trucker_confirmation = 1
+        publish(truckload_channel(truckload.id), 'truckload_confirmed', {
+            'truckload_id': truckload.id,
+            'trucker_confirmation': truckload.trucker_confirmation
+        })
         db.session.commit()
         return jsonify({'success': True})
     else:
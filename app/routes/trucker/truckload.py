@@ -2,17 +2,19 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app.models import Truckload, HarvestPerField
 from app.extensions import db
+from app.instrumentation import query_budget
 
 trucker_truckloads_bp = Blueprint('trucker_truckloads_bp', __name__)
 
 @trucker_truckloads_bp.route('/trucker/truckload')
+@query_budget(2)
 @login_required
 def index():
     if current_user.permission != 4:
         flash('Unauthorized access')
         return redirect(url_for('main.home'))
 
-    truckloads = Truckload.query.filter(
+    truckloads = Truckload.query_with_relations().filter(
         Truckload.yield_amount.is_(None),
         Truckload.yield_type.is_(None),
         Truckload.trucker_id == current_user.id
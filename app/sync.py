@@ -0,0 +1,241 @@
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from app.extensions import db
+from app.models import HarvestRig, SyncEvent, Truck, Truckload
+from app.events import publish, trucker_channel, truckload_channel
+from app.reference_cache import company_reference_data
+from app.truckload_listing import serialize_truckload
+
+
+class SyncRejected(ValueError):
+    pass
+
+
+def _parse_timestamp(value):
+    # Device clock, ISO 8601; stored as naive UTC and never in the future
+    now = datetime.utcnow()
+    if not value:
+        return now
+    try:
+        timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise SyncRejected('Invalid timestamp.')
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(timestamp, now)
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise SyncRejected(f'Invalid {name}.')
+
+
+def _truckload(event, applied):
+    # Events refer to a truckload by id, or by the key of the create event
+    # that made it, which may be earlier in the same batch
+    if event.get('truckload_key'):
+        record = applied.get(str(event['truckload_key']))
+        if record is None:
+            record = SyncEvent.query.filter_by(user_id=applied.user_id, key=str(event['truckload_key'])).first()
+        truckload_id = record.truckload_id if record else None
+    else:
+        truckload_id = _int(event.get('truckload_id'), 'truckload id')
+
+    truckload = db.session.get(Truckload, truckload_id) if truckload_id else None
+    if truckload is None:
+        raise SyncRejected('No matching truckload.')
+    return truckload
+
+
+def _create(user, event, occurred_at, applied):
+    reference = company_reference_data(user.company_id)
+    harvest_id = _int(event.get('harvest_id'), 'harvest')
+    field_id = _int(event.get('field_id'), 'field')
+    harvest_rig_id = _int(event.get('harvest_rig_id'), 'harvest rig')
+    truck_id = _int(event.get('truck_id'), 'truck')
+    trucker_id = _int(event.get('trucker_id'), 'trucker')
+
+    harvests = {harvest['id']: harvest for harvest in reference['harvests']}
+    fields = {field['id']: field for field in reference['fields']}
+    if harvest_id not in harvests or field_id not in fields:
+        raise SyncRejected('Unknown harvest or field.')
+    if trucker_id not in {trucker['id'] for trucker in reference['truckers']}:
+        raise SyncRejected('Unknown trucker.')
+    if not Truck.query.filter_by(id=truck_id, company_id=user.company_id).first():
+        raise SyncRejected('Unknown truck.')
+
+    # The rules of the /truckload form: the operator loads with the rig they
+    # hold, and finishes one load before starting the next. A create earlier
+    # in the batch is flushed, so it counts.
+    rig = HarvestRig.query.filter_by(id=harvest_rig_id, company_id=user.company_id).first()
+    if rig is None:
+        raise SyncRejected('Unknown harvest rig.')
+    if rig.current_operator_id != user.id:
+        raise SyncRejected('Select this harvest rig before loading with it.')
+    if Truckload.query.filter(Truckload.operator_id == user.id, Truckload.unfinished()).first():
+        raise SyncRejected('You have unfinished truckloads. Please complete them before starting a new one.')
+
+    load_date_time = _parse_timestamp(event.get('load_date_time')) if event.get('load_date_time') else occurred_at
+    truckload = Truckload(
+        operator_id=user.id,
+        harvest_rig_id=harvest_rig_id,
+        harvest_id=harvest_id,
+        field_id=field_id,
+        truck_id=truck_id,
+        trucker_id=trucker_id,
+        load_date_time=load_date_time,
+        trucker_confirmation=0
+    )
+    db.session.add(truckload)
+    db.session.flush()
+    publish(trucker_channel(trucker_id), 'truckload_created', {
+        'truckload_id': truckload.id,
+        'harvest_name': harvests[harvest_id]['name'],
+        'field_name': fields[field_id]['name'],
+        'load_date_time': load_date_time.strftime('%Y-%m-%d %H:%M:%S')
+    })
+    return truckload.id
+
+
+def _confirm(user, event, occurred_at, applied):
+    truckload = _truckload(event, applied)
+    if truckload.trucker_id != user.id:
+        raise SyncRejected('Unauthorized access')
+    if truckload.trucker_confirmation == 0:
+        truckload.trucker_confirmation = 1
+        publish(truckload_channel(truckload.id), 'truckload_confirmed', {
+            'truckload_id': truckload.id,
+            'trucker_confirmation': truckload.trucker_confirmation
+        })
+    return truckload.id
+
+
+def _finish(user, event, occurred_at, applied):
+    truckload = _truckload(event, applied)
+    if truckload.operator_id != user.id:
+        raise SyncRejected('Unauthorized access')
+    if truckload.trucker_confirmation == 0:
+        raise SyncRejected('Ensure trucker confirmation is done.')
+    if truckload.trucker_confirmation != 2:
+        truckload.unload_date_time = occurred_at
+        truckload.trucker_confirmation = 2
+    return truckload.id
+
+
+def _cancel(user, event, occurred_at, applied):
+    truckload = _truckload(event, applied)
+    if truckload.operator_id != user.id:
+        raise SyncRejected('Unauthorized access')
+    publish(trucker_channel(truckload.trucker_id), 'truckload_cancelled', {'truckload_id': truckload.id})
+    db.session.delete(truckload)
+    db.session.flush()
+    return truckload.id
+
+
+# kind: (permission allowed to send it, handler)
+EVENT_HANDLERS = {
+    'create': (2, _create),
+    'finish': (2, _finish),
+    'cancel': (2, _cancel),
+    'confirm': (4, _confirm),
+}
+
+
+class AppliedEvents(dict):
+    # key -> SyncEvent for this user, seeded with keys applied by earlier syncs
+    def __init__(self, user_id, records):
+        super().__init__((record.key, record) for record in records)
+        self.user_id = user_id
+
+
+def apply_events(user, events):
+    # Apply queued lifecycle events in order inside the caller's transaction.
+    # Replayed keys are reported as duplicates with their original truckload;
+    # invalid events are rejected without writing anything, so the device can
+    # fix or drop them and the rest of the batch still goes through.
+    keys = [str(event.get('key')) for event in events if isinstance(event, dict) and event.get('key')]
+    applied = AppliedEvents(user.id, SyncEvent.query.filter(
+        SyncEvent.user_id == user.id,
+        SyncEvent.key.in_(keys)
+    ).all() if keys else [])
+
+    results = []
+    for event in events:
+        if not isinstance(event, dict):
+            results.append({'key': None, 'status': 'rejected', 'error': 'Invalid event.'})
+            continue
+
+        key = str(event.get('key') or '')
+        if not key or len(key) > 64:
+            results.append({'key': key or None, 'status': 'rejected', 'error': 'Missing or invalid idempotency key.'})
+            continue
+        if key in applied:
+            results.append({'key': key, 'status': 'duplicate', 'truckload_id': applied[key].truckload_id})
+            continue
+
+        kind = event.get('kind')
+        permission, handler = EVENT_HANDLERS.get(kind, (None, None))
+        try:
+            if handler is None or permission != user.permission:
+                raise SyncRejected('Unsupported event.')
+            occurred_at = _parse_timestamp(event.get('timestamp'))
+            truckload_id = handler(user, event, occurred_at, applied)
+        except SyncRejected as error:
+            results.append({'key': key, 'status': 'rejected', 'error': str(error)})
+            continue
+
+        record = SyncEvent(user_id=user.id, key=key, kind=kind, truckload_id=truckload_id, occurred_at=occurred_at)
+        db.session.add(record)
+        applied[key] = record
+        results.append({'key': key, 'status': 'applied', 'truckload_id': truckload_id})
+    return results
+
+
+def encode_cursor(moment):
+    return moment.isoformat()
+
+
+def decode_cursor(cursor):
+    try:
+        return datetime.fromisoformat(cursor)
+    except (TypeError, ValueError):
+        return None
+
+
+def serialize_sync_truckload(truckload):
+    return dict(
+        serialize_truckload(truckload),
+        harvest_rig_id=truckload.harvest_rig_id,
+        truck_id=truckload.truck_id,
+        trucker_id=truckload.trucker_id,
+        operator_id=truckload.operator_id,
+        harvest_id=truckload.harvest_id,
+        field_id=truckload.field_id,
+        trucker_confirmation=truckload.trucker_confirmation,
+        updated_at=truckload.updated_at.isoformat() if truckload.updated_at else None
+    )
+
+
+def changes_since(user, cursor, open_truckload_ids):
+    # Truckloads of this user changed since the cursor (all in-progress ones
+    # without a cursor), plus which of the device's open truckloads are gone.
+    # The cursor is re-read with an overlap so a write that committed late
+    # with an earlier updated_at is still picked up; devices upsert by id.
+    mine = db.or_(Truckload.operator_id == user.id, Truckload.trucker_id == user.id)
+    query = Truckload.query_with_relations().filter(mine)
+    since = decode_cursor(cursor) if cursor else None
+    if since:
+        overlap = timedelta(seconds=current_app.config['SYNC_CURSOR_OVERLAP'])
+        query = query.filter(Truckload.updated_at >= since - overlap)
+    else:
+        query = query.filter(Truckload.trucker_confirmation != 2)
+    truckloads = query.order_by(Truckload.updated_at, Truckload.id).all()
+
+    removed = []
+    open_truckload_ids = {value for value in open_truckload_ids if isinstance(value, int)}
+    if open_truckload_ids:
+        existing = set(db.session.scalars(db.select(Truckload.id).where(Truckload.id.in_(open_truckload_ids), mine)))
+        removed = sorted(open_truckload_ids - existing)
+    return truckloads, removed
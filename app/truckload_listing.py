@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models import Truckload
+
+YIELD_STATUSES = ('pending', 'entered')
+
+
+def parse_filters(args):
+    # Read the truckload table filters from the query string, dropping bad values
+    filters = {}
+    for name in ('harvest_id', 'field_id', 'harvest_rig_id', 'truck_id'):
+        value = args.get(name, type=int)
+        if value:
+            filters[name] = value
+
+    for name in ('date_from', 'date_to'):
+        try:
+            filters[name] = datetime.strptime(args.get(name, ''), '%Y-%m-%d')
+        except ValueError:
+            pass
+    # date_to runs up to the next midnight, which the last day has not got
+    if 'date_to' in filters and filters['date_to'].date() == date.max:
+        del filters['date_to']
+
+    if args.get('yield_status') in YIELD_STATUSES:
+        filters['yield_status'] = args['yield_status']
+    return filters
+
+
+def apply_filters(query, filters, truckloads=Truckload):
+    # truckloads is the entity the query reads, see truckloads_for()
+    for name in ('harvest_id', 'field_id', 'harvest_rig_id', 'truck_id'):
+        if name in filters:
+            query = query.filter(getattr(truckloads, name) == filters[name])
+
+    if 'date_from' in filters:
+        query = query.filter(truckloads.load_date_time >= filters['date_from'])
+    if 'date_to' in filters:
+        query = query.filter(truckloads.load_date_time < filters['date_to'] + timedelta(days=1))
+
+    if filters.get('yield_status') == 'pending':
+        query = query.filter(truckloads.yield_amount.is_(None), truckloads.yield_type.is_(None))
+    elif filters.get('yield_status') == 'entered':
+        query = query.filter(db.or_(truckloads.yield_amount.isnot(None), truckloads.yield_type.isnot(None)))
+    return query
+
+
+def encode_cursor(truckload):
+    return f'{truckload.load_date_time.isoformat()}_{truckload.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        load_date_time, _, truckload_id = cursor.rpartition('_')
+        return datetime.fromisoformat(load_date_time), int(truckload_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(query, cursor=None, page_size=None, truckloads=Truckload):
+    # Newest first, seeking past the last (load_date_time, id) seen instead of
+    # using OFFSET, so every page costs the same however deep it is
+    page_size = page_size or current_app.config['TRUCKLOAD_PAGE_SIZE']
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        query = query.filter(db.tuple_(truckloads.load_date_time, truckloads.id) < position)
+
+    page = query.order_by(
+        truckloads.load_date_time.desc(),
+        truckloads.id.desc()
+    ).limit(page_size + 1).all()
+
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1])
+    return page, next_cursor
+
+
+def serialize_truckload(truckload):
+    return {
+        'id': truckload.id,
+        'load_date_time': truckload.load_date_time.isoformat(),
+        'unload_date_time': truckload.unload_date_time.isoformat() if truckload.unload_date_time else None,
+        'harvest_rig': truckload.harvest_rig.name,
+        'operator': truckload.operator.username,
+        'truck': truckload.truck.name,
+        'trucker': truckload.trucker.username,
+        'harvest': truckload.harvest.name,
+        'field': truckload.field.name,
+        'yield_amount': truckload.yield_amount,
+        'yield_type': truckload.yield_type
+    }
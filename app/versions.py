@@ -0,0 +1,210 @@
+from sqlalchemy import inspect
+from app.database import upsert_insert
+from app.extensions import db
+from app.models import DataVersion, Customer, User, Farm, FarmField, Harvest, HarvestPerField, Truck, HarvestRig, Truckload
+
+# Stands in for a company id in scopes that change along with any company's,
+# for superadmin pages that span companies. Such a scope is never bumped along
+# with a company's (every writer would queue on its row); its version is the
+# sum of all the scope's rows, see current_versions(). Only writes that
+# belong to no company bump it directly.
+ALL_COMPANIES = 'all'
+
+
+def reference_scope(company_id):
+    # Farms, fields, harvests, trucks (with drivers), rigs and users of a company
+    return f'reference:{company_id}'
+
+
+def fleet_scope(company_id):
+    # Which driver has which truck and which operator which rig
+    return f'fleet:{company_id}'
+
+
+def yield_scope(company_id):
+    # Loads and yields of a company's truckloads (harvest analytics)
+    return f'yields:{company_id}'
+
+
+def truckload_scope(company_id):
+    # Any column of a company's truckloads (truckload list pages)
+    return f'truckloads:{company_id}'
+
+
+def harvest_per_field_scope(company_id):
+    # Yield entries per harvest and field of a company
+    return f'harvest_per_field:{company_id}'
+
+
+def confirmation_scope(user_id):
+    # A trucker's loads awaiting confirmation (the trucker page's poll)
+    return f'confirmations:{user_id}'
+
+
+def company_scopes(scope, company_ids):
+    # scope(company) for each company, in a fixed order
+    company_ids = sorted({company_id for company_id in company_ids if company_id not in (None, '')}, key=str)
+    return [scope(company_id) for company_id in company_ids]
+
+
+# Truckload columns the analytics read
+YIELD_COLUMNS = ('load_date_time', 'harvest_id', 'field_id', 'harvest_rig_id', 'yield_amount', 'yield_type', 'deleted_at')
+
+# Truckload columns check_unconfirmed_truckloads reads
+CONFIRMATION_COLUMNS = ('trucker_id', 'trucker_confirmation', 'load_date_time', 'harvest_id', 'field_id', 'deleted_at')
+
+
+def bump(session, scopes):
+    table = DataVersion.__table__
+    insert = upsert_insert(session, table)
+    for scope in scopes:
+        if insert is not None:
+            statement = insert.values(scope=scope, version=1)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['scope'],
+                set_={'version': table.c.version + 1}
+            ))
+            continue
+
+        updated = session.execute(table.update().where(table.c.scope == scope).values(version=table.c.version + 1))
+        if updated.rowcount == 0:
+            session.execute(table.insert().values(scope=scope, version=1))
+
+
+def current_versions(*scopes):
+    # {scope: version} in one query; scopes never bumped are at 0. A scope of
+    # ALL_COMPANIES reads as the sum over every row of that scope, which goes
+    # up whenever any of them does.
+    spanning = [scope for scope in scopes if scope.endswith(f':{ALL_COMPANIES}')]
+    selects = [
+        db.select(DataVersion.scope, DataVersion.version)
+        .where(DataVersion.scope.in_([scope for scope in scopes if scope not in spanning]))
+    ]
+    for scope in spanning:
+        prefix = scope[:-len(ALL_COMPANIES)]
+        selects.append(
+            db.select(db.cast(db.literal(scope), DataVersion.scope.type), db.func.coalesce(db.func.sum(DataVersion.version), 0))
+            .where(DataVersion.scope.startswith(prefix, autoescape=True))
+        )
+    rows = db.session.execute(db.union_all(*selects) if len(selects) > 1 else selects[0])
+    versions = dict.fromkeys(scopes, 0)
+    versions.update(rows.all())
+    return versions
+
+
+def _company_ids(session, instance):
+    # Company (before and after this flush) that a reference row belongs to
+    if isinstance(instance, Customer):
+        return {instance.id}
+    if isinstance(instance, (User, Farm, Truck, HarvestRig)):
+        attribute = 'company_id'
+    else:
+        attribute = 'farm_id'
+
+    history = inspect(instance).attrs[attribute].history
+    values = {*history.added, *history.unchanged, *history.deleted} or {getattr(instance, attribute)}
+    if attribute == 'company_id':
+        return values
+
+    with session.no_autoflush:
+        return {farm.company_id for farm in (session.get(Farm, farm_id) for farm_id in values if farm_id) if farm}
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def track_reference_changes(session, flush_context, instances):
+    touched = False
+    companies = set()
+    fleets = set()
+    changed = (*session.new, *[instance for instance in session.dirty if session.is_modified(instance)], *session.deleted)
+    for instance in changed:
+        if isinstance(instance, (Customer, User, Farm, FarmField, Harvest, Truck, HarvestRig)):
+            touched = True
+            company_ids = _company_ids(session, instance)
+            companies |= company_ids
+            if isinstance(instance, (Truck, HarvestRig)):
+                fleets |= company_ids
+
+    fleets -= {None, ''}
+    scopes = company_scopes(reference_scope, companies)
+    if touched and not scopes:
+        # A new company has no id yet, and superadmins have no company
+        scopes.append(reference_scope(ALL_COMPANIES))
+    scopes += [fleet_scope(company_id) for company_id in sorted(fleets, key=str)]
+    if scopes:
+        bump(session, scopes)
+
+
+def _ids(values):
+    # Form handlers assign ids as strings; compare them as integers
+    return {int(value) for value in values if value not in (None, '')}
+
+
+def rig_companies(session, harvest_rig_ids):
+    # {harvest_rig_id: company_id}, deleted rigs included
+    harvest_rig_ids = _ids(harvest_rig_ids)
+    if not harvest_rig_ids:
+        return {}
+    with session.no_autoflush:
+        return dict(session.execute(
+            db.select(HarvestRig.id, HarvestRig.company_id).where(HarvestRig.id.in_(harvest_rig_ids)).execution_options(include_deleted=True)
+        ).all())
+
+
+def rig_company_ids(session, harvest_rig_ids):
+    return set(rig_companies(session, harvest_rig_ids).values())
+
+
+def _history(state, name):
+    history = state.attrs[name].history
+    return {*history.added, *history.unchanged, *history.deleted}
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def track_truckload_changes(session, flush_context, instances):
+    # Every truckload write bumps its company's truckload scope; yield columns
+    # also the yield scope, and confirmation columns the trucker's scope
+    rig_ids = set()
+    yield_rig_ids = set()
+    trucker_ids = set()
+    for truckload in (*session.new, *session.deleted):
+        if isinstance(truckload, Truckload):
+            rig_ids.add(truckload.harvest_rig_id)
+            yield_rig_ids.add(truckload.harvest_rig_id)
+            trucker_ids.add(truckload.trucker_id)
+    for truckload in session.dirty:
+        if isinstance(truckload, Truckload) and session.is_modified(truckload):
+            state = inspect(truckload)
+            truckload_rig_ids = _history(state, 'harvest_rig_id')
+            rig_ids |= truckload_rig_ids
+            if any(state.attrs[name].history.has_changes() for name in YIELD_COLUMNS):
+                yield_rig_ids |= truckload_rig_ids
+            if any(state.attrs[name].history.has_changes() for name in CONFIRMATION_COLUMNS):
+                trucker_ids |= _history(state, 'trucker_id')
+
+    companies = rig_companies(session, rig_ids)
+    scopes = company_scopes(truckload_scope, companies.values())
+    scopes += company_scopes(yield_scope, {companies.get(rig_id) for rig_id in _ids(yield_rig_ids)})
+    scopes += [confirmation_scope(user_id) for user_id in sorted(_ids(trucker_ids))]
+    if scopes:
+        bump(session, scopes)
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def track_harvest_per_field_changes(session, flush_context, instances):
+    harvest_ids = set()
+    for entry in (*session.new, *session.deleted):
+        if isinstance(entry, HarvestPerField):
+            harvest_ids.add(entry.harvest_id)
+    for entry in session.dirty:
+        if isinstance(entry, HarvestPerField) and session.is_modified(entry):
+            harvest_ids |= _history(inspect(entry), 'harvest_id')
+
+    harvest_ids = _ids(harvest_ids)
+    if not harvest_ids:
+        return
+    with session.no_autoflush:
+        companies = session.scalars(
+            db.select(Farm.company_id).join(Harvest, Harvest.farm_id == Farm.id)
+            .where(Harvest.id.in_(harvest_ids)).execution_options(include_deleted=True)
+        ).all()
+    bump(session, company_scopes(harvest_per_field_scope, companies))
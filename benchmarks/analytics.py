@@ -0,0 +1,156 @@
+"""Harvest analytics benchmark.
+
+Seeds --loads truckloads for one company (skipped when --database already
+holds them) and times the pieces behind /auth/analytics.json: the daily
+aggregate query, the pandas breakdowns over its rows, and a cold and a warm
+request through the app. Medians over --runs are printed.
+
+    python benchmarks/analytics.py --loads 1000000 --database /tmp/analytics.db
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+UNITS = ['bushels', 'pounds', 'tons', 'Bushels', None]
+
+
+def make_app(database_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    from app import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    app.config.update(TESTING=True)
+    return app
+
+
+def seed(app, loads):
+    from app.extensions import db
+    from app.models import Customer, Farm, FarmField, Harvest, HarvestRig, Truck, Truckload, User
+
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Truckload.id).first() is not None:
+            return
+        company = Customer(name='Analytics', address='-', status='active')
+        db.session.add(company)
+        db.session.flush()
+        admin = User(username='admin', email='admin@example.com', permission=1, company_id=company.id, password_hash='-')
+        operator = User(username='operator', email='operator@example.com', permission=2, company_id=company.id, password_hash='-')
+        farm = Farm(company_id=company.id, name='Farm', email='-', address='-')
+        db.session.add_all([admin, operator, farm])
+        db.session.flush()
+        fields = [FarmField(farm_id=farm.id, name=f'Field {number}', acreage=f'{80 + number * 10} ac') for number in range(40)]
+        harvests = [Harvest(name=f'Harvest {number}', farm_id=farm.id, date=datetime(2026, 6, 1)) for number in range(4)]
+        rigs = [HarvestRig(company_id=company.id, name=f'Rig {number}', year='2024', serial_number=str(number)) for number in range(12)]
+        trucks = [Truck(company_id=company.id, name=f'Truck {number}', year='2024', vin=str(number)) for number in range(20)]
+        db.session.add_all(fields + harvests + rigs + trucks)
+        db.session.flush()
+
+        started = datetime(2026, 6, 1)
+        rng = random.Random(1)
+        rows = []
+        for number in range(loads):
+            unit = UNITS[number % len(UNITS)]
+            rows.append({
+                'load_date_time': started + timedelta(seconds=number * 7), 'harvest_rig_id': rigs[number % 12].id,
+                'operator_id': operator.id, 'truck_id': trucks[number % 20].id, 'trucker_id': operator.id,
+                'field_id': fields[number % 40].id, 'harvest_id': harvests[number % 4].id,
+                'yield_amount': None if unit is None else rng.uniform(500, 1200), 'yield_type': unit,
+                'trucker_confirmation': 2, 'created_at': started, 'updated_at': started,
+            })
+            if len(rows) == 50000:
+                db.session.execute(Truckload.__table__.insert(), rows)
+                rows = []
+        if rows:
+            db.session.execute(Truckload.__table__.insert(), rows)
+        db.session.commit()
+
+
+def timed(function, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def run(args, database_path):
+    from app.analytics import compute, daily_facts
+    from app.extensions import db
+    from app.models import User
+    from app.reference_cache import company_reference_data
+
+    app = make_app(database_path)
+    seed(app, args.loads)
+
+    with app.app_context():
+        admin = User.query.filter_by(permission=1).first()
+        company_id = admin.company_id
+        query_ms, rows = timed(lambda: db.session.execute(daily_facts(company_id)).all(), args.runs)
+        reference = company_reference_data(company_id)
+        compute_ms, _ = timed(lambda: compute(rows, reference), args.runs)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+        session['_fresh'] = True
+
+    def request():
+        response = client.get('/auth/analytics.json')
+        assert response.status_code == 200, response.status_code
+        return response
+
+    def cold():
+        app.extensions['analytics_cache']._entries.clear()
+        return request()
+
+    cold_ms, _ = timed(cold, args.runs)
+    warm_ms, _ = timed(request, args.runs)
+    return {
+        'loads': args.loads,
+        'fact_rows': len(rows),
+        'query_ms': query_ms,
+        'compute_ms': compute_ms,
+        'cold_request_ms': cold_ms,
+        'warm_request_ms': warm_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loads', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--database', help='SQLite file to seed, or reuse when it already has loads')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    if args.database:
+        results = run(args, args.database)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = run(args, os.path.join(directory, 'analytics.db'))
+
+    print(f"{results['loads']} loads -> {results['fact_rows']} daily rows")
+    print(f"daily aggregate query {results['query_ms']:8.1f} ms")
+    print(f"pandas breakdowns     {results['compute_ms']:8.1f} ms")
+    print(f"cold request          {results['cold_request_ms']:8.1f} ms")
+    print(f"warm request          {results['warm_request_ms']:8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
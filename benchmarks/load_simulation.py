@@ -0,0 +1,324 @@
+"""Harvest-day load simulation.
+
+Boots create_app() against a seeded temporary database, serves it on a local
+threaded server and drives concurrent sessions through the real routes:
+
+- operators select a rig, create loads and finish them once confirmed
+- truckers select a truck, poll for new loads and confirm them
+- office clerks enter yields for loads waiting on one
+- company admins browse the truckload, yield, truck and user tables
+
+Each request is timed at the client and attributed to the Flask endpoint that
+served it. Throughput and p50/p95/p99 latency are printed per endpoint and
+written as JSON so runs can be compared.
+
+    python benchmarks/load_simulation.py --operators 8 --truckers 8 --duration 60 --output before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'harvest-day'
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+OFFICE_TRUCKLOAD = re.compile(r'/office/edit_truckload/(\d+)')
+NEXT_CURSOR = re.compile(r'data-next-cursor="([^"]+)"')
+
+
+def make_app(database_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    from app import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        return create_app()
+
+
+def seed(app, args):
+    from app.extensions import db
+    from app.models import Customer, User, Farm, FarmField, Harvest, HarvestRig, Truck, Truckload
+
+    people = {'operator': args.operators, 'trucker': args.truckers, 'office': args.office, 'admin': args.admins}
+    permissions = {'admin': 1, 'operator': 2, 'office': 3, 'trucker': 4}
+    with app.app_context():
+        db.create_all()
+        company = Customer(name='Harvest Day', address='-', status='active')
+        db.session.add(company)
+        db.session.flush()
+
+        users = {}
+        for role, count in people.items():
+            for number in range(count):
+                user = User(username=f'{role}{number}', email=f'{role}{number}@example.com', permission=permissions[role], company_id=company.id)
+                user.set_password(PASSWORD)
+                db.session.add(user)
+                users[role, number] = user
+
+        farm = Farm(company_id=company.id, name='Home Farm', email='farm@example.com', address='-')
+        db.session.add(farm)
+        db.session.flush()
+        fields = [FarmField(farm_id=farm.id, name=f'Field {number}', acreage='160') for number in range(10)]
+        harvest = Harvest(name='Wheat', farm_id=farm.id, date=datetime.utcnow())
+        rigs = [HarvestRig(company_id=company.id, name=f'Rig {number}', year='2024', serial_number=str(number)) for number in range(args.operators)]
+        trucks = [Truck(company_id=company.id, name=f'Truck {number}', year='2024', vin=str(number)) for number in range(args.truckers)]
+        db.session.add_all([*fields, harvest, *rigs, *trucks])
+        db.session.flush()
+
+        # Earlier days of the season, so the tables admins browse are not empty
+        start = datetime.utcnow() - timedelta(days=30)
+        db.session.execute(Truckload.__table__.insert(), [
+            {
+                'load_date_time': start + timedelta(minutes=number),
+                'unload_date_time': start + timedelta(minutes=number + 40),
+                'harvest_rig_id': rigs[number % len(rigs)].id,
+                'operator_id': users['operator', number % args.operators].id,
+                'truck_id': trucks[number % len(trucks)].id,
+                'trucker_id': users['trucker', number % args.truckers].id,
+                'field_id': fields[number % len(fields)].id,
+                'harvest_id': harvest.id,
+                'yield_amount': 900 + number % 200,
+                'yield_type': 'bushels',
+                'trucker_confirmation': 2,
+                'created_at': start,
+                'updated_at': start
+            }
+            for number in range(args.history)
+        ])
+        db.session.commit()
+        return {
+            'harvest_id': harvest.id,
+            'field_ids': [field.id for field in fields],
+            'rig_ids': [rig.id for rig in rigs],
+            'truck_ids': [truck.id for truck in trucks],
+            'trucker_ids': [users['trucker', number].id for number in range(args.truckers)]
+        }
+
+
+class Recorder:
+    def __init__(self, app):
+        self._lock = threading.Lock()
+        self._adapter = app.url_map.bind('localhost')
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def endpoint(self, method, path):
+        # Routes serving both a page and its form are reported separately
+        try:
+            endpoint = self._adapter.match(path.split('?')[0], method=method)[0]
+        except Exception:
+            endpoint = 'unmatched'
+        return endpoint if method == 'GET' else f'{endpoint} ({method})'
+
+    def record(self, method, path, elapsed, failed):
+        endpoint = self.endpoint(method, path)
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if failed:
+                self.errors[endpoint] += 1
+
+
+class Session:
+    def __init__(self, base_url, recorder, think_time):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.think_time = think_time
+        self.http = requests.Session()
+
+    def request(self, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, allow_redirects=False, timeout=60, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(method, path, time.perf_counter() - started, True)
+            return None
+        self.recorder.record(method, path, time.perf_counter() - started, response.status_code >= 500)
+        return response
+
+    def login(self, email):
+        page = self.request('GET', '/login')
+        token = CSRF_TOKEN.search(page.text).group(1)
+        self.request('POST', '/login', data={'email': email, 'password': PASSWORD, 'csrf_token': token})
+
+    def think(self):
+        time.sleep(random.uniform(0.5, 1.5) * self.think_time)
+
+
+def operator(session, number, ids, deadline):
+    session.login(f'operator{number}@example.com')
+    session.request('GET', '/harvest_rig')
+    session.request('POST', '/select_rig', data={'rig_id': ids['rig_ids'][number]})
+    truck = number % len(ids['truck_ids'])
+    finished = set()
+    while time.monotonic() < deadline:
+        response = session.request('GET', '/truckload')
+        if response is None:
+            session.think()
+            continue
+        if response.status_code == 200:
+            session.request('POST', '/truckload', data={
+                'harvest_rig_id': ids['rig_ids'][number],
+                'harvest': ids['harvest_id'],
+                'field': random.choice(ids['field_ids']),
+                'truck': ids['truck_ids'][truck],
+                'trucker': ids['trucker_ids'][truck],
+                'load_date_time': datetime.utcnow().strftime('%Y-%m-%dT%H:%M')
+            })
+        elif response.status_code == 302 and '/truckload/in_progress/' in response.headers['Location']:
+            path = response.headers['Location'].split(session.base_url)[-1]
+            truckload_id = int(path.rsplit('/', 1)[-1])
+            session.request('GET', path)
+            if truckload_id not in finished:
+                # Confirmed loads finish back to the form, unconfirmed ones bounce to the page
+                finish = session.request('POST', f'/truckload/finish/{truckload_id}')
+                if finish is not None and finish.headers.get('Location', '').endswith('/truckload'):
+                    finished.add(truckload_id)
+        session.think()
+
+
+def trucker(session, number, ids, deadline):
+    session.login(f'trucker{number}@example.com')
+    session.request('GET', '/trucker')
+    session.request('POST', '/select_truck', data={'truck_id': ids['truck_ids'][number]})
+    while time.monotonic() < deadline:
+        response = session.request('GET', '/check_unconfirmed_truckloads')
+        if response is not None and response.status_code == 200 and response.json().get('unconfirmed'):
+            session.request('POST', '/confirm_truckload', json={'truckload_id': response.json()['truckload_id']})
+        session.think()
+
+
+def office(session, number, ids, deadline):
+    session.login(f'office{number}@example.com')
+    while time.monotonic() < deadline:
+        response = session.request('GET', '/office/truckload')
+        if response is not None and response.status_code == 200:
+            for truckload_id in set(OFFICE_TRUCKLOAD.findall(response.text)):
+                session.request('POST', f'/office/edit_truckload/{truckload_id}', data={
+                    'yield_amount': random.randint(800, 1100),
+                    'yield_type': 'bushels'
+                })
+        session.think()
+
+
+def admin(session, number, ids, deadline):
+    session.login(f'admin{number}@example.com')
+    pages = ['/auth/truckload', '/auth/harvest_per_field', '/auth/truck', '/auth/user', '/auth/harvest_rig']
+    while time.monotonic() < deadline:
+        path = random.choice(pages)
+        response = session.request('GET', path)
+        if path == '/auth/truckload' and response is not None and response.status_code == 200:
+            match = NEXT_CURSOR.search(response.text)
+            cursor = match.group(1) if match else None
+            for page in range(random.randint(0, 3)):
+                if not cursor:
+                    break
+                more = session.request('GET', '/auth/truckload/page', params={'cursor': cursor})
+                cursor = more.json().get('next_cursor') if more is not None and more.status_code == 200 else None
+        session.think()
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summarize(recorder, duration):
+    endpoints = {}
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        latencies = sorted(latencies)
+        endpoints[endpoint] = {
+            'blueprint': endpoint.split('.')[0],
+            'method': endpoint.rsplit('(', 1)[-1].rstrip(')') if endpoint.endswith(')') else 'GET',
+            'requests': len(latencies),
+            'errors': recorder.errors[endpoint],
+            'requests_per_second': len(latencies) / duration,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000
+        }
+    return endpoints
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operators', type=int, default=8)
+    parser.add_argument('--truckers', type=int, default=8)
+    parser.add_argument('--office', type=int, default=2)
+    parser.add_argument('--admins', type=int, default=2)
+    parser.add_argument('--history', type=int, default=20000, help='truckloads from earlier in the season')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--think-time', type=float, default=0.5, help='average pause between actions, seconds')
+    parser.add_argument('--output', default='load_results.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(os.path.join(directory, 'load.db'))
+        ids = seed(app, args)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        recorder = Recorder(app)
+        deadline = time.monotonic() + args.duration
+        roles = [(operator, args.operators), (trucker, args.truckers), (office, args.office), (admin, args.admins)]
+        threads = [
+            threading.Thread(target=role, args=(Session(base_url, recorder, args.think_time), number, ids, deadline))
+            for role, count in roles
+            for number in range(count)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.monotonic() - started
+        server.shutdown()
+
+    endpoints = summarize(recorder, duration)
+    print(f"{'endpoint':<52}{'requests':>9}{'req/s':>8}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, stats in endpoints.items():
+        print(
+            f"{endpoint:<52}{stats['requests']:>9}{stats['requests_per_second']:>8.1f}{stats['errors']:>7}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+        )
+    total = sum(stats['requests'] for stats in endpoints.values())
+    print(f'{total} requests in {duration:.1f}s, {total / duration:.1f} req/s')
+
+    with open(args.output, 'w') as output:
+        json.dump({
+            'started_at': datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'settings': vars(args),
+            'duration': duration,
+            'requests': total,
+            'endpoints': endpoints
+        }, output, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Shift-change login benchmark.
+
+Serves create_app() on a local threaded server in its own process and has --logins clients sign
+in and out as fast as they can while --pollers truckers, already signed in,
+keep polling /check_unconfirmed_truckloads. The burst is run once per
+PASSWORD_HASH_WORKERS setting (0 hashes in the request thread), and login
+throughput and the pollers' latency are printed for each.
+
+Stored hashes start at --old-rounds, so the first login of each user also
+shows the transparent upgrade to BCRYPT_LOG_ROUNDS.
+
+    python benchmarks/login_burst.py --logins 60 --pollers 8 --duration 20 --workers 0,2
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'shift-change'
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def make_app(database_path, workers, rounds):
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    os.environ['PASSWORD_HASH_WORKERS'] = str(workers)
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(rounds)
+    from app import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        return create_app()
+
+
+def seed(app, logins, pollers, old_rounds):
+    from app.extensions import bcrypt, db
+    from app.models import Customer, User
+
+    with app.app_context():
+        db.create_all()
+        company = Customer(name='Shift Change', address='-', status='active')
+        db.session.add(company)
+        db.session.flush()
+        old_hash = bcrypt.generate_password_hash(PASSWORD, old_rounds).decode('utf-8')
+        for number in range(logins):
+            # One hash for every driver keeps seeding fast
+            db.session.add(User(username=f'driver{number}', email=f'driver{number}@example.com', permission=4, company_id=company.id, password_hash=old_hash))
+        for number in range(pollers):
+            user = User(username=f'poller{number}', email=f'poller{number}@example.com', permission=4, company_id=company.id)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+
+
+def login(http, base_url, email):
+    page = http.get(base_url + '/login', timeout=120)
+    token = CSRF_TOKEN.search(page.text).group(1)
+    return http.post(base_url + '/login', data={'email': email, 'password': PASSWORD, 'csrf_token': token}, allow_redirects=False, timeout=120)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000 if values else None
+
+
+def serve(database_path, workers, args, ready):
+    # The server gets a process of its own so the client threads below do not
+    # compete with it for the GIL
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = make_app(database_path, workers, args.rounds)
+    seed(app, args.logins, args.pollers, args.old_rounds)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def run_burst(args, workers):
+    from app.passwords import hash_rounds
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'login.db')
+        ready = multiprocessing.Queue()
+        process = multiprocessing.Process(target=serve, args=(database_path, workers, args, ready))
+        process.start()
+        base_url = f'http://127.0.0.1:{ready.get(timeout=120)}'
+
+        pollers = []
+        for number in range(args.pollers):
+            http = requests.Session()
+            login(http, base_url, f'poller{number}@example.com')
+            pollers.append(http)
+
+        lock = threading.Lock()
+        results = defaultdict(list)
+        statuses = defaultdict(int)
+        deadline = time.monotonic() + args.duration
+
+        def driver(number):
+            http = requests.Session()
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = login(http, base_url, f'driver{number}@example.com')
+                elapsed = time.perf_counter() - started
+                with lock:
+                    statuses[response.status_code] += 1
+                    if response.status_code == 302:
+                        results['login'].append(elapsed)
+                if response.status_code == 302:
+                    http.get(base_url + '/logout', allow_redirects=False, timeout=120)
+
+        def poller(http):
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                http.get(base_url + '/check_unconfirmed_truckloads', timeout=120)
+                with lock:
+                    results['poll'].append(time.perf_counter() - started)
+                time.sleep(args.poll_interval)
+
+        threads = [threading.Thread(target=driver, args=(number,)) for number in range(args.logins)]
+        threads += [threading.Thread(target=poller, args=(http,)) for http in pollers]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        process.terminate()
+        process.join()
+
+        with sqlite3.connect(database_path) as connection:
+            hashes = [row[0] for row in connection.execute("SELECT password_hash FROM user WHERE username LIKE 'driver%'")]
+
+    return {
+        'workers': workers,
+        'logins_per_second': len(results['login']) / elapsed,
+        'login_p50_ms': percentile(results['login'], 0.50),
+        'login_p95_ms': percentile(results['login'], 0.95),
+        'rejected_503': statuses[503],
+        'polls_per_second': len(results['poll']) / elapsed,
+        'poll_p50_ms': percentile(results['poll'], 0.50),
+        'poll_p95_ms': percentile(results['poll'], 0.95),
+        'poll_p99_ms': percentile(results['poll'], 0.99),
+        'rehashed': sum(1 for password_hash in hashes if hash_rounds(password_hash) == args.rounds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=60)
+    parser.add_argument('--pollers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--poll-interval', type=float, default=0.25)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--old-rounds', type=int, default=10)
+    parser.add_argument('--workers', default='0,2', help='comma-separated PASSWORD_HASH_WORKERS settings to compare')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    runs = [run_burst(args, int(workers)) for workers in args.workers.split(',')]
+
+    print(f"{'workers':>7} {'logins/s':>9} {'login p50':>10} {'login p95':>10} {'503s':>5} "
+          f"{'polls/s':>8} {'poll p50':>9} {'poll p95':>9} {'poll p99':>9} {'rehashed':>9}")
+    for run in runs:
+        print(f"{run['workers']:>7} {run['logins_per_second']:>9.1f} {run['login_p50_ms'] or 0:>8.0f}ms {run['login_p95_ms'] or 0:>8.0f}ms "
+              f"{run['rejected_503']:>5} {run['polls_per_second']:>8.1f} {run['poll_p50_ms']:>7.0f}ms {run['poll_p95_ms']:>7.0f}ms "
+              f"{run['poll_p99_ms']:>7.0f}ms {run['rehashed']:>5}/{args.logins}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'runs': runs}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
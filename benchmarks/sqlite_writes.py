@@ -0,0 +1,160 @@
+"""Concurrent write benchmark for the SQLite engine profile.
+
+Starts one process per operator and per trucker, like gunicorn workers, all
+writing to a scratch database for a fixed time. Operators create truckloads;
+truckers select a truck and confirm their oldest pending load. The run is
+repeated with SQLITE_TUNING off (SQLite defaults) and on, and throughput,
+"database is locked" errors and commit latency are printed for both.
+
+    python benchmarks/sqlite_writes.py --operators 4 --truckers 4 --seconds 10
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_app(database_path, tuning):
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    os.environ['SQLITE_TUNING'] = '1' if tuning else '0'
+    from app import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        return create_app()
+
+
+def seed(database_path, tuning, operators, truckers):
+    from app.extensions import db
+    from app.models import Customer, User, Farm, FarmField, Harvest, HarvestRig, Truck
+
+    app = make_app(database_path, tuning)
+    with app.app_context():
+        db.create_all()
+        company = Customer(name='Benchmark', address='-', status='active')
+        db.session.add(company)
+        db.session.flush()
+        farm = Farm(company_id=company.id, name='Farm', email='farm@example.com', address='-')
+        db.session.add(farm)
+        db.session.flush()
+        db.session.add(FarmField(farm_id=farm.id, name='Field', acreage='100'))
+        db.session.add(Harvest(name='Harvest', farm_id=farm.id, date=datetime.utcnow()))
+        for number in range(operators):
+            operator = User(username=f'operator{number}', email=f'operator{number}@example.com', permission=2, company_id=company.id, password_hash='-')
+            db.session.add(operator)
+            db.session.flush()
+            db.session.add(HarvestRig(company_id=company.id, name=f'Rig {number}', year='2024', serial_number=str(number), current_operator_id=operator.id))
+        for number in range(truckers):
+            db.session.add(User(username=f'trucker{number}', email=f'trucker{number}@example.com', permission=4, company_id=company.id, password_hash='-'))
+            db.session.add(Truck(company_id=company.id, name=f'Truck {number}', year='2024', vin=str(number)))
+        db.session.commit()
+
+
+def operator_work(number, truckers):
+    from app.models import HarvestRig, Truck, Truckload, User
+
+    rig = HarvestRig.query.filter_by(name=f'Rig {number}').one()
+    trucker = User.query.filter_by(username=f'trucker{random.randrange(truckers)}').one()
+    truck = Truck.query.filter_by(name=f'Truck {random.randrange(truckers)}').one()
+    return Truckload(
+        harvest_rig_id=rig.id, operator_id=rig.current_operator_id, truck_id=truck.id,
+        trucker_id=trucker.id, field_id=1, harvest_id=1, trucker_confirmation=0
+    )
+
+
+def trucker_work(number, truckers):
+    from app.models import Truck, Truckload, User
+
+    trucker = User.query.filter_by(username=f'trucker{number}').one()
+    truck = Truck.query.filter_by(name=f'Truck {random.randrange(truckers)}').one()
+    truck.current_driver_id = trucker.id
+    truckload = Truckload.query.filter_by(trucker_id=trucker.id, trucker_confirmation=0).order_by(Truckload.id).first()
+    if truckload:
+        truckload.trucker_confirmation = 1
+    return None
+
+
+def worker(role, number, truckers, database_path, tuning, seconds, results):
+    from sqlalchemy.exc import OperationalError
+    from app.extensions import db
+
+    app = make_app(database_path, tuning)
+    work = operator_work if role == 'operator' else trucker_work
+    commits, locked, latencies = 0, 0, []
+    with app.app_context():
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                instance = work(number, truckers)
+                if instance is not None:
+                    db.session.add(instance)
+                db.session.commit()
+                commits += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as error:
+                db.session.rollback()
+                if 'locked' not in str(error) and 'busy' not in str(error):
+                    raise
+                locked += 1
+            finally:
+                db.session.remove()
+    results.put((commits, locked, latencies))
+
+
+def run(tuning, operators, truckers, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'benchmark.db')
+        seed(database_path, tuning, operators, truckers)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(role, number, truckers, database_path, tuning, seconds, results))
+            for role, count in (('operator', operators), ('trucker', truckers))
+            for number in range(count)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for process in processes]
+        for process in processes:
+            process.join()
+
+    commits = sum(result[0] for result in collected)
+    locked = sum(result[1] for result in collected)
+    latencies = sorted(latency for result in collected for latency in result[2]) or [0.0]
+    return {
+        'commits': commits,
+        'commits_per_second': commits / seconds,
+        'locked': locked,
+        'locked_rate': locked / max(commits + locked, 1),
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+        'max_ms': latencies[-1] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operators', type=int, default=4)
+    parser.add_argument('--truckers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f'{args.operators} operators, {args.truckers} truckers, {args.seconds:g}s per run')
+    print(f"{'profile':<10}{'commits':>9}{'commits/s':>11}{'locked':>8}{'locked %':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    for label, tuning in (('default', False), ('tuned', True)):
+        stats = run(tuning, args.operators, args.truckers, args.seconds)
+        print(
+            f"{label:<10}{stats['commits']:>9}{stats['commits_per_second']:>11.1f}{stats['locked']:>8}"
+            f"{stats['locked_rate'] * 100:>10.2f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
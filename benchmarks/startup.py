@@ -0,0 +1,127 @@
+"""Startup time benchmark.
+
+Every measurement runs in a fresh interpreter, so nothing is already
+imported: create_app() as a web worker builds it, create_app() as the flask
+command builds it, the wall time of a flask CLI invocation, the first and a
+second request to Flask-Admin, and the packages that take longest to
+import (python -X importtime). Medians over --runs are printed.
+
+    python benchmarks/startup.py --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CREATE_APP = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+finished = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': finished - imported, 'total': finished - started}))
+"""
+
+FIRST_ADMIN_REQUEST = """
+import json, time
+from app import create_app
+app = create_app()
+client = app.test_client()
+started = time.perf_counter()
+status = client.get('/admin/').status_code
+first = time.perf_counter()
+client.get('/admin/')
+second = time.perf_counter()
+print(json.dumps({'status': status, 'first': first - started, 'second': second - first}))
+"""
+
+
+def run_python(code, env, *options):
+    result = subprocess.run(
+        [sys.executable, *options, '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return result
+
+
+def measure(code, env, runs):
+    samples = [json.loads(run_python(code, env).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0] if key != 'status'}
+
+
+def measure_cli(env, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-m', 'flask', '--app', 'app:create_app', 'rebuild-yield-totals'],
+            cwd=ROOT, env=env, capture_output=True, check=True
+        )
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def top_imports(env, limit):
+    # Import time spent in each top-level package's own modules, from -X importtime
+    stderr = run_python(CREATE_APP, env, '-X', 'importtime').stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            own = int(fields[0])
+        except ValueError:
+            continue
+        package = fields[2].strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + own
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--imports', type=int, default=12, help='packages to list')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'startup.db')}")
+        env.pop('FLASK_RUN_FROM_CLI', None)
+        run_python('from app import create_app\nfrom app.extensions import db\napp = create_app()\n'
+                   'with app.app_context():\n    db.create_all()', env)
+        cli_env = dict(env, FLASK_RUN_FROM_CLI='true')
+
+        results = {
+            'web': measure(CREATE_APP, env, args.runs),
+            'cli': measure(CREATE_APP, cli_env, args.runs),
+            'cli_command': measure_cli(env, args.runs),
+            'admin_request': measure(FIRST_ADMIN_REQUEST, env, args.runs),
+            'imports': top_imports(env, args.imports),
+        }
+
+    for mode in ('web', 'cli'):
+        timings = results[mode]
+        print(f"create_app ({mode:3}): import {timings['import'] * 1000:7.1f} ms   "
+              f"create_app {timings['create_app'] * 1000:7.1f} ms   total {timings['total'] * 1000:7.1f} ms")
+    print(f"flask rebuild-yield-totals: {results['cli_command'] * 1000:7.1f} ms wall")
+    print(f"/admin/ first request {results['admin_request']['first'] * 1000:7.1f} ms   "
+          f"second {results['admin_request']['second'] * 1000:7.1f} ms")
+    print('\nimport time by package (web worker):')
+    for package, microseconds in results['imports']:
+        print(f'  {package:24} {microseconds / 1000:7.1f} ms')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
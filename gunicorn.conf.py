@@ -0,0 +1,24 @@
+import multiprocessing
+import os
+
+# Read by gunicorn when started from this directory: gunicorn run:app
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Live updates (/trucker/events, /fleet/events and the operator's in-progress
+# page) keep a request open for up to EVENT_STREAM_TIMEOUT seconds. Sync
+# workers would give each open tab a whole process, so a few truckers would
+# take every worker; threaded workers give it one thread, and EVENT_MAX_STREAMS
+# (config.py) keeps enough threads free for pages. gevent works as well
+# (GUNICORN_WORKER_CLASS=gevent, with gevent installed).
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+
+# Threaded workers heartbeat independently of requests, so this only catches a
+# hung worker, not a long stream
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+# Streams are cut at shutdown after this long; browsers reconnect to the new
+# workers
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '10'))
+keepalive = 5
@@ -0,0 +1,36 @@
+"""event table for live updates
+
+Revision ID: 3c1f0a7d9e21
+Revises: 81ea8b45571b
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f0a7d9e21'
+down_revision = '81ea8b45571b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel', sa.String(length=80), nullable=False),
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.create_index('ix_event_channel_id', ['channel', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_channel_id')
+
+    op.drop_table('event')
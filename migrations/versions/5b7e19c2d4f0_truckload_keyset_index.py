@@ -0,0 +1,26 @@
+"""truckload keyset pagination index
+
+Revision ID: 5b7e19c2d4f0
+Revises: a6d2e4b8c903
+Create Date: 2026-10-18 11:24:51.930127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e19c2d4f0'
+down_revision = 'a6d2e4b8c903'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.create_index('ix_truckload_load_date_time_id', ['load_date_time', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_load_date_time_id')
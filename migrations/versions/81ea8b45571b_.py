@@ -39,6 +39,7 @@ def downgrade():
         batch_op.alter_column('status',
                existing_type=sa.String(length=255),
                type_=sa.INTEGER(),
-               existing_nullable=False)
+               existing_nullable=False,
+               postgresql_using='status::integer')
 
     # ### end Alembic commands ###
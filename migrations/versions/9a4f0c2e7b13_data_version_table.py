@@ -0,0 +1,33 @@
+"""data version counters and operator truckload index
+
+Revision ID: 9a4f0c2e7b13
+Revises: e2c94b7a1f36
+Create Date: 2026-10-18 16:11:38.502374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f0c2e7b13'
+down_revision = 'e2c94b7a1f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+        sa.Column('scope', sa.String(length=80), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('scope')
+    )
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.create_index('ix_truckload_operator_id', ['operator_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_operator_id')
+
+    op.drop_table('data_version')
@@ -0,0 +1,35 @@
+"""truckload lifecycle indexes
+
+Revision ID: a6d2e4b8c903
+Revises: 3c1f0a7d9e21
+Create Date: 2026-10-18 10:02:17.503311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2e4b8c903'
+down_revision = '3c1f0a7d9e21'
+branch_labels = None
+depends_on = None
+
+OPEN_LOAD = 'trucker_confirmation = 0 OR yield_amount IS NULL OR yield_type IS NULL'
+PENDING_YIELD = 'yield_amount IS NULL AND yield_type IS NULL'
+
+
+def upgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.create_index('ix_truckload_operator_open', ['operator_id'], unique=False,
+                              sqlite_where=sa.text(OPEN_LOAD), postgresql_where=sa.text(OPEN_LOAD))
+        batch_op.create_index('ix_truckload_trucker_status', ['trucker_id', 'trucker_confirmation'], unique=False)
+        batch_op.create_index('ix_truckload_pending_yield', ['trucker_id'], unique=False,
+                              sqlite_where=sa.text(PENDING_YIELD), postgresql_where=sa.text(PENDING_YIELD))
+
+
+def downgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_pending_yield')
+        batch_op.drop_index('ix_truckload_trucker_status')
+        batch_op.drop_index('ix_truckload_operator_open')
@@ -0,0 +1,58 @@
+"""rig and truck hourly cycle statistics
+
+Revision ID: b5e1c9d3f702
+Revises: f3b8d2a6c415
+Create Date: 2026-10-18 21:05:37.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1c9d3f702'
+down_revision = 'f3b8d2a6c415'
+branch_labels = None
+depends_on = None
+
+LIVE_ROWS = 'deleted_at IS NULL'
+
+
+def upgrade():
+    # Populate afterwards with `flask rebuild-cycle-stats`
+    op.create_table('rig_hourly_stat',
+        sa.Column('harvest_rig_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('load_count', sa.Integer(), nullable=False),
+        sa.Column('gap_count', sa.Integer(), nullable=False),
+        sa.Column('gap_seconds', sa.Float(), nullable=False),
+        sa.Column('max_gap_seconds', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['harvest_rig_id'], ['harvest_rig.id'], ),
+        sa.PrimaryKeyConstraint('harvest_rig_id', 'hour')
+    )
+    op.create_table('truck_hourly_stat',
+        sa.Column('truck_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('trip_count', sa.Integer(), nullable=False),
+        sa.Column('trip_seconds', sa.Float(), nullable=False),
+        sa.Column('turnaround_count', sa.Integer(), nullable=False),
+        sa.Column('turnaround_seconds', sa.Float(), nullable=False),
+        sa.Column('max_turnaround_seconds', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['truck_id'], ['truck.id'], ),
+        sa.PrimaryKeyConstraint('truck_id', 'hour')
+    )
+
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.create_index('ix_truckload_live_rig_load', ['harvest_rig_id', 'load_date_time'], unique=False,
+                              sqlite_where=sa.text(LIVE_ROWS), postgresql_where=sa.text(LIVE_ROWS))
+        batch_op.create_index('ix_truckload_live_truck_load', ['truck_id', 'load_date_time'], unique=False,
+                              sqlite_where=sa.text(LIVE_ROWS), postgresql_where=sa.text(LIVE_ROWS))
+
+
+def downgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_live_truck_load')
+        batch_op.drop_index('ix_truckload_live_rig_load')
+
+    op.drop_table('truck_hourly_stat')
+    op.drop_table('rig_hourly_stat')
@@ -0,0 +1,35 @@
+"""sync event idempotency keys
+
+Revision ID: c71e5d3a9b84
+Revises: 9a4f0c2e7b13
+Create Date: 2026-10-18 17:03:52.118604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e5d3a9b84'
+down_revision = '9a4f0c2e7b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('truckload_id', sa.Integer(), nullable=True),
+        sa.Column('occurred_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'key', name='uq_sync_event_user_key')
+    )
+
+
+def downgrade():
+    op.drop_table('sync_event')
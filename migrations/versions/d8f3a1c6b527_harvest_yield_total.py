@@ -0,0 +1,34 @@
+"""harvest yield total rollup
+
+Revision ID: d8f3a1c6b527
+Revises: 5b7e19c2d4f0
+Create Date: 2026-10-18 12:40:06.214458
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3a1c6b527'
+down_revision = '5b7e19c2d4f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate afterwards with `flask rebuild-yield-totals`
+    op.create_table('harvest_yield_total',
+        sa.Column('harvest_id', sa.Integer(), nullable=False),
+        sa.Column('field_id', sa.Integer(), nullable=False),
+        sa.Column('yield_unit', sa.String(length=80), nullable=False),
+        sa.Column('yield_amount', sa.Float(), nullable=False),
+        sa.Column('load_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['field_id'], ['farm_field.id'], ),
+        sa.ForeignKeyConstraint(['harvest_id'], ['harvest.id'], ),
+        sa.PrimaryKeyConstraint('harvest_id', 'field_id', 'yield_unit')
+    )
+
+
+def downgrade():
+    op.drop_table('harvest_yield_total')
@@ -0,0 +1,26 @@
+"""truckload scale ticket index
+
+Revision ID: e2c94b7a1f36
+Revises: d8f3a1c6b527
+Create Date: 2026-10-18 15:02:17.448210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c94b7a1f36'
+down_revision = 'd8f3a1c6b527'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.create_index('ix_truckload_ticket', ['harvest_rig_id', 'truck_id', 'load_date_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_ticket')
@@ -0,0 +1,32 @@
+"""trucks and rigs nobody holds have a NULL holder
+
+Revision ID: e7c5a9d2b418
+Revises: d4a7c2e9f150
+Create Date: 2026-10-18 23:02:41.771064
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c5a9d2b418'
+down_revision = 'd4a7c2e9f150'
+branch_labels = None
+depends_on = None
+
+HOLDERS = (('truck', 'current_driver_id'), ('harvest_rig', 'current_operator_id'))
+
+
+def upgrade():
+    # Released trucks and rigs used to keep '' in their integer holder column,
+    # which only SQLite accepts; no other database can hold it
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table, column in HOLDERS:
+        op.execute(sa.text(f"UPDATE {table} SET {column} = NULL WHERE {column} = ''"))
+
+
+def downgrade():
+    # NULL reads as "nobody" to the previous code as well
+    pass
@@ -0,0 +1,52 @@
+"""partial indexes on live (not soft-deleted) rows
+
+Revision ID: f3b8d2a6c415
+Revises: c71e5d3a9b84
+Create Date: 2026-10-18 19:24:51.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2a6c415'
+down_revision = 'c71e5d3a9b84'
+branch_labels = None
+depends_on = None
+
+LIVE_ROWS = 'deleted_at IS NULL'
+
+
+def upgrade():
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_load_date_time_id')
+        batch_op.create_index('ix_truckload_live_load_date_time_id', ['load_date_time', 'id'], unique=False,
+                              sqlite_where=sa.text(LIVE_ROWS), postgresql_where=sa.text(LIVE_ROWS))
+
+    with op.batch_alter_table('harvest_per_field', schema=None) as batch_op:
+        batch_op.create_index('ix_harvest_per_field_live_harvest_field', ['harvest_id', 'field_id'], unique=False,
+                              sqlite_where=sa.text(LIVE_ROWS), postgresql_where=sa.text(LIVE_ROWS))
+
+    with op.batch_alter_table('harvest', schema=None) as batch_op:
+        batch_op.create_index('ix_harvest_live_farm_id', ['farm_id'], unique=False,
+                              sqlite_where=sa.text(LIVE_ROWS), postgresql_where=sa.text(LIVE_ROWS))
+
+    with op.batch_alter_table('farm_field', schema=None) as batch_op:
+        batch_op.create_index('ix_farm_field_live_farm_id', ['farm_id'], unique=False,
+                              sqlite_where=sa.text(LIVE_ROWS), postgresql_where=sa.text(LIVE_ROWS))
+
+
+def downgrade():
+    with op.batch_alter_table('farm_field', schema=None) as batch_op:
+        batch_op.drop_index('ix_farm_field_live_farm_id')
+
+    with op.batch_alter_table('harvest', schema=None) as batch_op:
+        batch_op.drop_index('ix_harvest_live_farm_id')
+
+    with op.batch_alter_table('harvest_per_field', schema=None) as batch_op:
+        batch_op.drop_index('ix_harvest_per_field_live_harvest_field')
+
+    with op.batch_alter_table('truckload', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_live_load_date_time_id')
+        batch_op.create_index('ix_truckload_load_date_time_id', ['load_date_time', 'id'], unique=False)
@@ -0,0 +1,105 @@
+"""season archive tables
+
+Revision ID: f3c8b1e5a702
+Revises: e7c5a9d2b418
+Create Date: 2026-10-18 23:41:27.518340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8b1e5a702'
+down_revision = 'e7c5a9d2b418'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('harvest', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+    op.create_table('truckload_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('load_date_time', sa.DateTime(), nullable=False),
+        sa.Column('unload_date_time', sa.DateTime(), nullable=True),
+        sa.Column('harvest_rig_id', sa.Integer(), nullable=False),
+        sa.Column('operator_id', sa.Integer(), nullable=False),
+        sa.Column('truck_id', sa.Integer(), nullable=False),
+        sa.Column('trucker_id', sa.Integer(), nullable=False),
+        sa.Column('field_id', sa.Integer(), nullable=False),
+        sa.Column('harvest_id', sa.Integer(), nullable=False),
+        sa.Column('yield_amount', sa.Float(), nullable=True),
+        sa.Column('yield_type', sa.String(length=80), nullable=True),
+        sa.Column('trucker_confirmation', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['field_id'], ['farm_field.id'], ),
+        sa.ForeignKeyConstraint(['harvest_id'], ['harvest.id'], ),
+        sa.ForeignKeyConstraint(['harvest_rig_id'], ['harvest_rig.id'], ),
+        sa.ForeignKeyConstraint(['operator_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['truck_id'], ['truck.id'], ),
+        sa.ForeignKeyConstraint(['trucker_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('truckload_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_truckload_archive_load_date_time_id', ['load_date_time', 'id'], unique=False)
+        batch_op.create_index('ix_truckload_archive_harvest_id', ['harvest_id'], unique=False)
+
+    op.create_table('harvest_per_field_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('harvest_id', sa.Integer(), nullable=False),
+        sa.Column('field_id', sa.Integer(), nullable=False),
+        sa.Column('yield_amount', sa.Float(), nullable=False),
+        sa.Column('yield_type', sa.String(length=80), nullable=False),
+        sa.ForeignKeyConstraint(['field_id'], ['farm_field.id'], ),
+        sa.ForeignKeyConstraint(['harvest_id'], ['harvest.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('harvest_per_field_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_harvest_per_field_archive_harvest_field', ['harvest_id', 'field_id'], unique=False)
+
+    op.create_table('harvest_yield_total_archive',
+        sa.Column('harvest_id', sa.Integer(), nullable=False),
+        sa.Column('field_id', sa.Integer(), nullable=False),
+        sa.Column('yield_unit', sa.String(length=80), nullable=False),
+        sa.Column('yield_amount', sa.Float(), nullable=False),
+        sa.Column('load_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['field_id'], ['farm_field.id'], ),
+        sa.ForeignKeyConstraint(['harvest_id'], ['harvest.id'], ),
+        sa.PrimaryKeyConstraint('harvest_id', 'field_id', 'yield_unit')
+    )
+
+
+def downgrade():
+    # Archived rows go back to the hot tables first, so nothing is lost; run
+    # `flask rebuild-yield-totals` afterwards for their totals
+    op.execute(
+        'INSERT INTO truckload (id, created_at, updated_at, deleted_at, load_date_time, unload_date_time, '
+        'harvest_rig_id, operator_id, truck_id, trucker_id, field_id, harvest_id, yield_amount, yield_type, '
+        'trucker_confirmation) SELECT id, created_at, updated_at, deleted_at, load_date_time, unload_date_time, '
+        'harvest_rig_id, operator_id, truck_id, trucker_id, field_id, harvest_id, yield_amount, yield_type, '
+        'trucker_confirmation FROM truckload_archive'
+    )
+    op.execute(
+        'INSERT INTO harvest_per_field (id, created_at, updated_at, deleted_at, harvest_id, field_id, yield_amount, '
+        'yield_type) SELECT id, created_at, updated_at, deleted_at, harvest_id, field_id, yield_amount, yield_type '
+        'FROM harvest_per_field_archive'
+    )
+    op.drop_table('harvest_yield_total_archive')
+    with op.batch_alter_table('harvest_per_field_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_harvest_per_field_archive_harvest_field')
+
+    op.drop_table('harvest_per_field_archive')
+    with op.batch_alter_table('truckload_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_truckload_archive_harvest_id')
+        batch_op.drop_index('ix_truckload_archive_load_date_time_id')
+
+    op.drop_table('truckload_archive')
+    with op.batch_alter_table('harvest', schema=None) as batch_op:
+        batch_op.drop_column('archived_at')
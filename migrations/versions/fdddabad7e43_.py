@@ -33,6 +33,7 @@ def downgrade():
         batch_op.alter_column('yield_type',
                existing_type=sa.String(length=80),
                type_=sa.FLOAT(),
-               existing_nullable=False)
+               existing_nullable=False,
+               postgresql_using='yield_type::double precision')
 
     # ### end Alembic commands ###
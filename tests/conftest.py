@@ -0,0 +1,120 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from app import create_app
+from app.extensions import db
+from app.models import Customer, Farm, FarmField, Harvest, HarvestRig, Truck, Truckload, User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # A fresh SQLite file per test, or the tables of TEST_DATABASE_URL (a
+    # scratch PostgreSQL database) dropped and created again; query budgets
+    # raise instead of logging
+    url = os.getenv('TEST_DATABASE_URL')
+    monkeypatch.setenv('DATABASE_URL', url or f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('QUERY_BUDGET_RAISE', '1')
+    monkeypatch.delenv('FLASK_RUN_FROM_CLI', raising=False)
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    # No app context is kept pushed: a request would share it, and with it g
+    # and the session, with the test
+    with app.app_context():
+        if url:
+            db.drop_all()
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    # One company with a user per role, a farm with two fields, two rigs, two
+    # trucks and loads at every stage: finished, awaiting a yield, awaiting
+    # the trucker's confirmation, plus another operator's and a deleted one.
+    # Returns the ids.
+    with app.app_context():
+        return _seed()
+
+
+def _seed():
+    company = Customer(name='Acme Harvesting', address='1 Main St', status='active')
+    db.session.add(company)
+    db.session.flush()
+
+    def user(username, permission):
+        user = User(username=username, email=f'{username}@test.com', password_hash='x', company_id=company.id, permission=permission)
+        db.session.add(user)
+        return user
+
+    users = {
+        'superadmin': User(username='superadmin', email='superadmin@test.com', password_hash='x', permission=0),
+        'admin': user('admin', 1),
+        'operator': user('operator', 2),
+        'other_operator': user('other_operator', 2),
+        'office': user('office', 3),
+        'trucker': user('trucker', 4),
+    }
+    db.session.add(users['superadmin'])
+    db.session.flush()
+
+    farm = Farm(company_id=company.id, name='North Farm', email='farm@test.com', address='2 Farm Rd')
+    db.session.add(farm)
+    db.session.flush()
+    fields = [FarmField(farm_id=farm.id, name=f'Field {number}', acreage='80') for number in (1, 2)]
+    harvest = Harvest(name='Wheat 2026', farm_id=farm.id, date=datetime(2026, 7, 1))
+    rig = HarvestRig(company_id=company.id, name='Rig 1', year='2020', serial_number='R1', current_operator_id=users['operator'].id)
+    other_rig = HarvestRig(company_id=company.id, name='Rig 2', year='2021', serial_number='R2')
+    trucks = [
+        Truck(company_id=company.id, name=f'Truck {number}', year='2019', vin=f'VIN{number}', current_driver_id=users['trucker'].id if number == 1 else None)
+        for number in (1, 2)
+    ]
+    db.session.add_all([*fields, harvest, rig, other_rig, *trucks])
+    db.session.flush()
+
+    start = datetime(2026, 7, 1, 8)
+    truckloads = []
+    for index in range(6):
+        finished = index < 3
+        truckloads.append(Truckload(
+            operator_id=users['operator'].id if index != 4 else users['other_operator'].id,
+            harvest_rig_id=rig.id,
+            truck_id=trucks[index % 2].id,
+            trucker_id=users['trucker'].id,
+            field_id=fields[index % 2].id,
+            harvest_id=harvest.id,
+            load_date_time=start + timedelta(minutes=40 * index),
+            unload_date_time=start + timedelta(minutes=40 * index + 30) if finished else None,
+            yield_amount=500.0 if finished else None,
+            yield_type='bushels' if finished else None,
+            trucker_confirmation=2 if finished else (1 if index == 3 else 0)
+        ))
+    truckloads[5].deleted_at = datetime(2026, 7, 2)
+    db.session.add_all(truckloads)
+    db.session.commit()
+    return {
+        'company': company.id,
+        'users': {name: user.id for name, user in users.items()},
+        'farm': farm.id,
+        'fields': [field.id for field in fields],
+        'harvest': harvest.id,
+        'rig': rig.id,
+        'other_rig': other_rig.id,
+        'trucks': [truck.id for truck in trucks],
+        'truckloads': [truckload.id for truckload in truckloads],
+    }
+
+
+@pytest.fixture
+def login(client):
+    def login(user_id):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    return login
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize('season', ['-1', '0', '9999', 'x'])
+@pytest.mark.parametrize('url', ['/auth/analytics', '/auth/analytics.json'])
+def test_out_of_range_season_is_ignored(client, seed, login, url, season):
+    login(seed['users']['admin'])
+    assert client.get(url, query_string={'season': season}).status_code == 200
+
+
+@pytest.mark.parametrize('url', ['/admin/analytics', '/admin/analytics.json'])
+def test_out_of_range_season_is_ignored_for_superadmins(client, seed, login, url):
+    login(seed['users']['superadmin'])
+    response = client.get(url, query_string={'company_id': seed['company'], 'season': '9999'})
+    assert response.status_code == 200
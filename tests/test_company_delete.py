@@ -0,0 +1,32 @@
+from app.extensions import db
+from app.jobs import DONE, Worker
+from app.models import HarvestRig, Job, Truck, User
+
+
+def test_deleted_company_users_are_signed_out_at_once(app, client, seed, login):
+    office = app.test_client()
+    with office.session_transaction() as session:
+        session['_user_id'] = str(seed['users']['office'])
+    assert office.get('/office/truckload').status_code == 200
+
+    login(seed['users']['superadmin'])
+    client.get(f"/admin/company/delete/{seed['company']}")
+
+    # Before any job has run
+    response = office.get('/office/truckload')
+    assert response.status_code == 302 and '/login' in response.headers['Location']
+    with app.app_context():
+        assert User.query.filter_by(company_id=seed['company']).count() == 0
+
+
+def test_delete_job_frees_trucks_and_rigs(app, client, seed, login):
+    login(seed['users']['superadmin'])
+    client.get(f"/admin/company/delete/{seed['company']}")
+
+    with app.app_context():
+        Worker(app, 'test', kinds=['soft_delete_company']).run(once=True)
+        assert Job.query.filter_by(kind='soft_delete_company').one().status == DONE
+        trucks = db.session.scalars(db.select(Truck).execution_options(include_deleted=True)).all()
+        rigs = db.session.scalars(db.select(HarvestRig).execution_options(include_deleted=True)).all()
+        assert all(truck.current_driver_id is None for truck in trucks)
+        assert all(rig.current_operator_id is None for rig in rigs)
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+import pytest
+from app.cycle_stats import rebuild_cycle_stats
+from app.extensions import db
+from app.models import RigHourlyStat, Truckload, TruckHourlyStat
+
+
+def buckets():
+    def rows(model):
+        return sorted(
+            tuple(round(value, 3) if isinstance(value, float) else value for value in row)
+            for row in db.session.execute(db.select(*model.__table__.columns))
+        )
+    return rows(RigHourlyStat), rows(TruckHourlyStat)
+
+
+def assert_matches_rebuild(app):
+    # The buckets kept as loads change equal a rebuild from scratch
+    with app.app_context():
+        kept = buckets()
+        rebuild_cycle_stats()
+        assert kept == buckets()
+        return kept
+
+
+def test_seeded_loads_match_rebuild(app, seed):
+    rigs, trucks = assert_matches_rebuild(app)
+    assert rigs and trucks
+
+
+@pytest.mark.parametrize('index', [0, 1, 2])
+def test_deleting_a_load_updates_its_and_the_next_loads_buckets(app, client, seed, login, index):
+    login(seed['users']['admin'])
+    client.get(f"/auth/delete_truckload/{seed['truckloads'][index]}")
+    assert_matches_rebuild(app)
+
+
+def test_soft_deleting_and_moving_loads(app, seed):
+    with app.app_context():
+        first, second = (db.session.get(Truckload, truckload_id) for truckload_id in seed['truckloads'][:2])
+        first.deleted_at = datetime.utcnow()
+        second.load_date_time -= timedelta(hours=2)
+        second.unload_date_time -= timedelta(hours=2)
+        db.session.commit()
+    assert_matches_rebuild(app)
+
+
+def test_finished_load_arriving_out_of_order(app, seed):
+    # An in-cab device syncs a load from before the ones already recorded
+    with app.app_context():
+        later = db.session.get(Truckload, seed['truckloads'][1])
+        db.session.add(Truckload(
+            operator_id=later.operator_id, harvest_rig_id=later.harvest_rig_id, truck_id=later.truck_id,
+            trucker_id=later.trucker_id, field_id=later.field_id, harvest_id=later.harvest_id,
+            load_date_time=later.load_date_time - timedelta(minutes=25),
+            unload_date_time=later.load_date_time - timedelta(minutes=5),
+            yield_amount=300.0, yield_type='bushels', trucker_confirmation=2
+        ))
+        db.session.commit()
+    assert_matches_rebuild(app)
+
+
+def test_edits_after_a_commit(app, seed):
+    # The commit expires the loads, so their old values are not in memory
+    # when they are set again
+    with app.app_context():
+        moved, finished = (db.session.get(Truckload, truckload_id) for truckload_id in seed['truckloads'][1:3])
+        db.session.commit()
+        moved.harvest_rig_id = seed['other_rig']
+        moved.load_date_time = datetime(2026, 7, 3, 8)
+        moved.unload_date_time = datetime(2026, 7, 3, 8, 30)
+        finished.unload_date_time = datetime(2026, 7, 1, 9, 50)
+        db.session.commit()
+    assert_matches_rebuild(app)
@@ -0,0 +1,58 @@
+import json
+import pytest
+from app.extensions import db
+from app.models import Event
+
+
+def test_late_commit_is_delivered(app):
+    # Two transactions insert events; the one with the lower id commits after
+    # the higher id has been read
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            pytest.skip('SQLite commits events in id order')
+        app.extensions['event_broker'].poll_interval = 0
+        table = Event.__table__
+        early = db.engine.connect()
+        early_transaction = early.begin()
+        early.execute(table.insert().values(channel='trucker:1', name='early', payload=json.dumps({})))
+        with db.engine.begin() as connection:
+            connection.execute(table.insert().values(channel='trucker:1', name='later', payload=json.dumps({})))
+
+        stream = app.extensions['event_broker'].listen(['trucker:1'], 0, 30)
+        later_id, name, data = next(stream)
+        assert name == 'later'
+
+        early_transaction.commit()
+        early.close()
+        event_id, name, data = next(stream)
+        assert name == 'early'
+        # The stream's position does not go back
+        assert event_id == later_id
+        stream.close()
+
+
+def test_events_seen_before_the_cursor_are_not_sent_again(app):
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            pytest.skip('SQLite commits events in id order')
+        app.extensions['event_broker'].poll_interval = 0
+        for name in ('first', 'second'):
+            db.session.add(Event(channel='trucker:1', name=name, payload=json.dumps({})))
+        db.session.commit()
+        first, second = [event.id for event in Event.query.order_by(Event.id)]
+
+        stream = app.extensions['event_broker'].listen(['trucker:1'], first, 30)
+        assert next(stream)[0] == second
+        stream.close()
+
+
+@pytest.mark.parametrize('index, confirmed', [(3, True), (4, False)])
+def test_confirmation_before_the_stream_starts_is_sent(app, client, seed, login, index, confirmed):
+    # The page was rendered while the load waited for the trucker; it was
+    # confirmed before the browser connected
+    app.config['EVENT_STREAM_TIMEOUT'] = 0
+    truckload_id = seed['truckloads'][index]
+    login(seed['users']['operator' if index == 3 else 'other_operator'])
+    response = client.get(f'/truckload/in_progress/{truckload_id}/events')
+    assert response.status_code == 200
+    assert (b'event: truckload_confirmed' in response.data) == confirmed
@@ -0,0 +1,33 @@
+import csv
+import io
+import pytest
+from app.extensions import db
+from app.importer import _parse_row, import_scale_tickets
+from app.models import Truckload
+
+
+@pytest.mark.parametrize('amount', ['nan', 'inf', '-inf', '-1', 'x'])
+def test_yield_amount_must_be_a_finite_non_negative_number(amount):
+    with pytest.raises(ValueError, match='Invalid yield amount'):
+        _parse_row({'truckload_id': '1', 'yield_amount': amount, 'yield_type': 'bushels'}, {}, {})
+
+
+def test_rejected_rows_are_reported_in_file_order(app, seed):
+    open_load, finished = seed['truckloads'][3], seed['truckloads'][0]
+    rows = [
+        ['truckload_id', 'yield_amount', 'yield_type'],
+        [open_load, 'nan', 'bushels'],
+        [999999, '10', 'bushels'],
+        [finished, 'inf', 'bushels'],
+        [open_load, '250', 'bushels'],
+    ]
+    source = io.StringIO()
+    csv.writer(source).writerows(rows)
+    errors = io.StringIO()
+    with app.app_context():
+        counts = import_scale_tickets(io.BytesIO(source.getvalue().encode()), 'tickets.csv', errors, batch_size=10)
+        assert counts == {'rows': 4, 'imported': 1, 'errors': 3}
+        assert db.session.get(Truckload, open_load).yield_amount == 250.0
+        assert db.session.get(Truckload, finished).yield_amount == 500.0
+    report = list(csv.reader(io.StringIO(errors.getvalue())))
+    assert [row[0] for row in report[1:]] == ['2', '3', '4']
@@ -0,0 +1,54 @@
+import pytest
+from app.extensions import db
+
+
+@pytest.fixture
+def statements(app):
+    # SELECTs on truckload run while the block is open, with their parameters
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT') and 'FROM truckload' in statement:
+            captured.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    db.event.listen(engine, 'before_cursor_execute', capture)
+    yield captured
+    db.event.remove(engine, 'before_cursor_execute', capture)
+
+
+def query_plan(app, statement, parameters):
+    with app.app_context():
+        rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[-1] for row in rows]
+
+
+# (user, method, url, indexes the truckload lookup may use). The office list
+# has no seek column; both partial indexes hold only open loads and, without
+# ANALYZE statistics, SQLite scans either.
+LIFECYCLE_QUERIES = [
+    ('operator', 'get', '/truckload', {'ix_truckload_operator_id'}),
+    ('operator', 'post', '/select_rig', {'ix_truckload_operator_open'}),
+    ('operator', 'post', '/select_rig_ajax', {'ix_truckload_operator_open'}),
+    ('trucker', 'get', '/check_unconfirmed_truckloads', {'ix_truckload_trucker_status'}),
+    ('office', 'get', '/office/truckload', {'ix_truckload_pending_yield', 'ix_truckload_operator_open'}),
+    ('trucker', 'get', '/trucker/truckload', {'ix_truckload_pending_yield'}),
+]
+
+
+@pytest.mark.parametrize('user, method, url, indexes', LIFECYCLE_QUERIES)
+def test_lifecycle_queries_use_truckload_indexes(app, client, seed, login, statements, user, method, url, indexes):
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('EXPLAIN QUERY PLAN is SQLite\'s')
+    login(seed['users'][user])
+    getattr(client, method)(url, data={'rig_id': seed['other_rig']})
+
+    assert statements, f'{url} did not query truckload'
+    for statement, parameters in statements:
+        plan = query_plan(app, statement, parameters)
+        truckload_steps = [step for step in plan if step.split()[1] == 'truckload']
+        assert truckload_steps, plan
+        for step in truckload_steps:
+            assert any(f'USING INDEX {index}' in step for index in indexes), f'{url}: {step}'
@@ -0,0 +1,60 @@
+import pytest
+from flask import url_for
+from app.archive import archive_harvest
+
+# Endpoint carrying @query_budget -> (user, URL arguments). Every budgeted
+# view needs a case here, see test_every_budget_is_covered.
+BUDGETED_VIEWS = {
+    'admin_truckload_bp.index': ('superadmin', {}),
+    'admin_truckload_bp.page': ('superadmin', {}),
+    'auth_truckload_bp.index': ('admin', {}),
+    'auth_truckload_bp.page': ('admin', {}),
+    'operator_truckload_bp.show_truckload': ('operator', {'truckload_id': 'open'}),
+    'office_truckloads_bp.index': ('office', {}),
+    'trucker_truckloads_bp.index': ('trucker', {}),
+}
+
+# Truckload tables again with filters, which read the archive when they
+# name an archived harvest or reach back to its dates
+FILTERED_VIEWS = [
+    'admin_truckload_bp.index', 'admin_truckload_bp.page', 'auth_truckload_bp.index', 'auth_truckload_bp.page'
+]
+
+
+def budgeted_endpoints(app):
+    return {endpoint for endpoint, view in app.view_functions.items() if hasattr(view, 'query_budget')}
+
+
+def url(app, endpoint, arguments, seed):
+    arguments = {
+        name: seed['truckloads'][3] if value == 'open' else value for name, value in arguments.items()
+    }
+    with app.test_request_context():
+        return url_for(endpoint, **arguments)
+
+
+def test_every_budget_is_covered(app):
+    assert budgeted_endpoints(app) == set(BUDGETED_VIEWS)
+
+
+@pytest.mark.parametrize('endpoint', sorted(BUDGETED_VIEWS))
+def test_view_stays_within_budget(app, client, seed, login, endpoint):
+    # QUERY_BUDGET_RAISE is set, so a view over its budget raises here
+    user, arguments = BUDGETED_VIEWS[endpoint]
+    login(seed['users'][user])
+    response = client.get(url(app, endpoint, arguments, seed))
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('archived', [False, True])
+@pytest.mark.parametrize('endpoint', FILTERED_VIEWS)
+def test_filtered_truckload_table_stays_within_budget(app, client, seed, login, endpoint, archived):
+    if archived:
+        with app.app_context():
+            archive_harvest(seed['harvest'])
+    user, arguments = BUDGETED_VIEWS[endpoint]
+    login(seed['users'][user])
+    filters = {'harvest_id': seed['harvest'], 'date_from': '2026-06-01', 'date_to': '2026-08-01'}
+    response = client.get(url(app, endpoint, dict(arguments, **filters), seed))
+    assert response.status_code == 200
+    assert b'Truck 1' in response.data
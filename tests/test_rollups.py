@@ -0,0 +1,37 @@
+from app.extensions import db
+from app.models import HarvestYieldTotal, Truckload
+from app.rollups import rebuild_yield_totals
+
+
+def test_rebuild_yield_totals_invalidates_cached_pages(app, client, seed, login):
+    # The rebuild writes with Core statements, which skip the flush hooks
+    login(seed['users']['admin'])
+    etag = client.get('/auth/harvest_per_field').headers['ETag']
+    assert client.get('/auth/harvest_per_field', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        rebuild_yield_totals()
+
+    assert client.get('/auth/harvest_per_field', headers={'If-None-Match': etag}).status_code == 200
+
+
+def _totals():
+    return sorted(tuple(row) for row in db.session.execute(db.select(
+        HarvestYieldTotal.harvest_id, HarvestYieldTotal.field_id, HarvestYieldTotal.yield_unit,
+        HarvestYieldTotal.yield_amount, HarvestYieldTotal.load_count
+    )))
+
+
+def test_editing_a_yield_after_a_commit_replaces_its_contribution(app, seed):
+    # The commit expires the load, so the old yield is not in memory when it
+    # is set again
+    with app.app_context():
+        truckload = db.session.get(Truckload, seed['truckloads'][0])
+        db.session.commit()
+        truckload.yield_amount = 1.0
+        db.session.commit()
+        kept = _totals()
+
+        rebuild_yield_totals()
+        assert kept == _totals()
+        assert (seed['harvest'], seed['fields'][0], 'bushels', 501.0, 2) in kept
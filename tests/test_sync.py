@@ -0,0 +1,42 @@
+from app.extensions import db
+from app.models import Truckload
+
+
+def create_event(seed, key, rig):
+    return {
+        'key': key, 'kind': 'create', 'harvest_id': seed['harvest'], 'field_id': seed['fields'][0],
+        'harvest_rig_id': seed[rig], 'truck_id': seed['trucks'][0], 'trucker_id': seed['users']['trucker']
+    }
+
+
+def finish_open_load(app, seed):
+    with app.app_context():
+        truckload = db.session.get(Truckload, seed['truckloads'][3])
+        truckload.yield_amount, truckload.yield_type = 400.0, 'bushels'
+        db.session.commit()
+
+
+def sync(client, events):
+    response = client.post('/api/sync', json={'events': events})
+    assert response.status_code == 200
+    return [(result['status'], result.get('error')) for result in response.get_json()['results']]
+
+
+def test_create_needs_the_operators_rig(app, client, seed, login):
+    finish_open_load(app, seed)
+    login(seed['users']['operator'])
+    assert sync(client, [create_event(seed, 'a', 'other_rig')]) == [
+        ('rejected', 'Select this harvest rig before loading with it.')
+    ]
+
+
+def test_create_waits_for_the_unfinished_load(app, client, seed, login):
+    login(seed['users']['operator'])
+    unfinished = ('rejected', 'You have unfinished truckloads. Please complete them before starting a new one.')
+    assert sync(client, [create_event(seed, 'a', 'rig')]) == [unfinished]
+
+    # One create goes through, the next in the same batch waits for it
+    finish_open_load(app, seed)
+    assert sync(client, [create_event(seed, 'b', 'rig'), create_event(seed, 'c', 'rig')]) == [
+        ('applied', None), unfinished
+    ]
@@ -0,0 +1,20 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+from app.archive import archive_harvest
+from app.truckload_listing import parse_filters
+
+
+def test_date_to_without_a_next_day_is_dropped():
+    filters = parse_filters(MultiDict({'date_from': '2026-01-01', 'date_to': '9999-12-31'}))
+    assert 'date_to' not in filters and 'date_from' in filters
+
+
+@pytest.mark.parametrize('archived', [False, True])
+def test_truckload_table_to_the_last_day(app, client, seed, login, archived):
+    if archived:
+        with app.app_context():
+            archive_harvest(seed['harvest'])
+    login(seed['users']['admin'])
+    response = client.get('/auth/truckload', query_string={'date_to': '9999-12-31'})
+    assert response.status_code == 200
+    assert b'Truck 1' in response.data
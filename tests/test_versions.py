@@ -0,0 +1,28 @@
+from app.extensions import db
+from app.models import DataVersion, Truckload
+from app.versions import confirmation_scope, current_versions
+
+
+def test_company_writes_leave_the_all_companies_rows_alone(app, client, seed, login):
+    # Superadmin pages still see them, through the sum of the company rows
+    login(seed['users']['superadmin'])
+    etag = client.get('/admin/truckload').headers['ETag']
+
+    with app.app_context():
+        db.session.get(Truckload, seed['truckloads'][3]).yield_amount = 250.0
+        db.session.commit()
+        scopes = db.session.scalars(db.select(DataVersion.scope)).all()
+        assert not [scope for scope in scopes if scope.endswith(':all') and not scope.startswith('reference:')]
+
+    assert client.get('/admin/truckload', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_reassigning_a_load_after_a_commit_bumps_the_old_truckers_scope(app, seed):
+    # The old trucker's poll must stop offering the load
+    with app.app_context():
+        truckload = db.session.get(Truckload, seed['truckloads'][4])
+        db.session.commit()
+        before = current_versions(confirmation_scope(seed['users']['trucker']))
+        truckload.trucker_id = seed['users']['operator']
+        db.session.commit()
+        assert current_versions(confirmation_scope(seed['users']['trucker'])) != before